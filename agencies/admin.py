@@ -4,15 +4,18 @@ from .models import Agency
 
 @admin.register(Agency)
 class AgencyAdmin(admin.ModelAdmin):
-    list_display = ['name', 'status', 'created_at', 'updated_at']
+    list_display = ['name', 'status', 'users_count', 'bookings_count', 'clients_count', 'created_at', 'updated_at']
     list_filter = ['status', 'created_at']
     search_fields = ['name']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['users_count', 'bookings_count', 'clients_count', 'created_at', 'updated_at']
     
     fieldsets = (
         ('Agency Information', {
             'fields': ('name', 'logo', 'status')
         }),
+        ('Counts', {
+            'fields': ('users_count', 'bookings_count', 'clients_count')
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
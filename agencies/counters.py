@@ -0,0 +1,75 @@
+"""
+Maintenance of the counter columns on Agency (users_count, bookings_count,
+clients_count).
+
+Creates and deletes apply a signed delta in the same transaction as the
+write: Booking, Client and User saves are atomic and Model.delete() runs in
+a transaction, so the post_save / post_delete receivers in agencies.signals
+commit or roll back with the row; bulk writers call `apply_delta` inside
+their own atomic block. The agency row is updated last, after the rows
+being counted, and Agency.save() never writes the counter columns, so an
+edit cannot overwrite concurrent deltas.
+
+`reconcile` recomputes the columns from the counted tables and fixes any
+drift, e.g. after raw SQL or queryset.update() moves that bypass signals.
+"""
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Agency
+
+# Counter column => model counted, by its `agency` foreign key
+COUNTED_MODELS = {
+    'users_count': 'users.User',
+    'bookings_count': 'bookings.Booking',
+    'clients_count': 'clients.Client',
+}
+
+
+def counter_for(model):
+    """The Agency counter column maintained for `model`, or None"""
+    label = model._meta.label
+    return next((field for field, counted in COUNTED_MODELS.items() if counted == label), None)
+
+
+def apply_delta(agency_id, field, delta):
+    """Add `delta` (negative on deletes) to one of the agency's counters."""
+    if agency_id is None or not delta:
+        return
+    Agency.objects.filter(pk=agency_id).update(**{field: F(field) + delta})
+
+
+def actual_counts():
+    """{counter column: correlated COUNT(*) subquery} for annotating agencies"""
+    counts = {}
+    for field, label in COUNTED_MODELS.items():
+        rows = apps.get_model(label).objects.filter(agency=OuterRef('pk')).order_by().values('agency')
+        counts[field] = Coalesce(Subquery(rows.annotate(total=Count('pk')).values('total')), 0)
+    return counts
+
+
+def reconcile(agency_id=None):
+    """Recompute the counters (optionally of one agency). Returns how many agencies had drifted."""
+    fields = list(COUNTED_MODELS)
+    agency_ids = Agency.objects.order_by('id').values_list('id', flat=True)
+    if agency_id is not None:
+        agency_ids = agency_ids.filter(pk=agency_id)
+
+    drifted = 0
+    for pk in list(agency_ids):
+        with transaction.atomic():
+            # Lock first so the counts below include every committed delta and
+            # writers still in flight apply theirs on top of the new values
+            list(Agency.objects.select_for_update().filter(pk=pk).values_list('pk'))
+            row = Agency.objects.filter(pk=pk).annotate(
+                **{f'actual_{field}': count for field, count in actual_counts().items()}
+            ).values(*fields, *(f'actual_{field}' for field in fields)).first()
+            if row is None:
+                continue
+            actual = {field: row[f'actual_{field}'] for field in fields}
+            if any(row[field] != value for field, value in actual.items()):
+                Agency.objects.filter(pk=pk).update(**actual)
+                drifted += 1
+    return drifted
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from agencies.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recompute agencies' users / bookings / clients counter columns and fix any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--agency', type=int, help='Only reconcile this agency id')
+
+    def handle(self, *args, **options):
+        drifted = reconcile(agency_id=options['agency'])
+        self.stdout.write(self.style.SUCCESS(f'Reconciled agency counters; {drifted} agencies had drifted'))
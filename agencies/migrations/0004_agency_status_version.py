@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-18 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0003_agency_address_agency_description_agency_email_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agency',
+            name='status_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.10 on 2026-10-18 07:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_agency_counters(apps, schema_editor):
+    """Count each agency's users, bookings and clients (one UPDATE per agency)."""
+    Agency = apps.get_model('agencies', 'Agency')
+    counted = {
+        'users_count': apps.get_model(*settings.AUTH_USER_MODEL.split('.')),
+        'bookings_count': apps.get_model('bookings', 'Booking'),
+        'clients_count': apps.get_model('clients', 'Client'),
+    }
+    totals = {
+        field: dict(model.objects.order_by().values('agency').annotate(total=models.Count('pk')).values_list('agency', 'total'))
+        for field, model in counted.items()
+    }
+    for agency_id in Agency.objects.values_list('id', flat=True):
+        Agency.objects.filter(pk=agency_id).update(
+            **{field: totals[field].get(agency_id, 0) for field in counted}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0004_agency_status_version'),
+        ('bookings', '0008_payment'),
+        ('clients', '0010_duplicate_client_suggestion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agency',
+            name='bookings_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='agency',
+            name='clients_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='agency',
+            name='users_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_agency_counters, migrations.RunPython.noop),
+    ]
@@ -15,6 +15,9 @@ class Agency(models.Model):
         ('pending', 'Pending'),
     ]
     
+    # Maintained by agencies.counters, never written by save()
+    COUNTER_FIELDS = ('users_count', 'bookings_count', 'clients_count')
+
     # ✅ EXISTING FIELDS
     name = models.CharField(max_length=255)
     logo = CloudinaryField('agency_logo', blank=True, null=True)
@@ -23,6 +26,14 @@ class Agency(models.Model):
         choices=STATUS_CHOICES, 
         default='active'
     )
+    # Bumped on every status change; access tokens carry the version they
+    # were issued under and are refused once it moves (users.authentication)
+    status_version = models.PositiveIntegerField(default=0, editable=False)
+    # Maintained on create / delete (agencies.counters); fix drift with
+    # `manage.py reconcile_agency_counters`
+    users_count = models.PositiveIntegerField(default=0, editable=False)
+    bookings_count = models.PositiveIntegerField(default=0, editable=False)
+    clients_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -39,6 +50,28 @@ class Agency(models.Model):
     
     def __str__(self):
         return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # Never write back the in-memory counters over concurrent F() deltas
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        loaded_status = getattr(self, '_loaded_status', None)
+        if loaded_status is not None and self.status != loaded_status:
+            self.status_version += 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'status_version'}
+        super().save(*args, **kwargs)
+        self._loaded_status = self.status
     
     @property
     def is_active(self):
@@ -24,8 +24,9 @@ class AgencySerializer(serializers.ModelSerializer):
     """
     FULL: Detailed agency info for admin users.
     """
-    user_count = serializers.SerializerMethodField()
-    booking_count = serializers.SerializerMethodField()
+    # Maintained counter columns (agencies.counters)
+    user_count = serializers.IntegerField(source='users_count', read_only=True)
+    booking_count = serializers.IntegerField(source='bookings_count', read_only=True)
     
     class Meta:
         model = Agency
@@ -40,16 +41,11 @@ class AgencySerializer(serializers.ModelSerializer):
             'description',   # ✅ Now exists
             'user_count',
             'booking_count',
+            'clients_count',
             'created_at',
             'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'user_count', 'booking_count']
-    
-    def get_user_count(self, obj):
-        return obj.users.count()
-    
-    def get_booking_count(self, obj):
-        return obj.bookings.count()
+        read_only_fields = ['id', 'created_at', 'updated_at', 'user_count', 'booking_count', 'clients_count']
 
 
 class AgencyUpdateSerializer(serializers.ModelSerializer):
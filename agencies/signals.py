@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from bookings.models import Booking
+from clients.models import Client
+
+from . import counters, status_cache
+from .models import Agency
+
+
+@receiver(post_save, sender=Agency)
+def refresh_cached_status(sender, instance, **kwargs):
+    """Suspensions apply to the next request, not when the cache expires"""
+    status_cache.forget(instance.pk)
+    agency_id, agency_status = instance.pk, instance.status
+    transaction.on_commit(lambda: status_cache.set_status(agency_id, agency_status))
+
+
+@receiver(post_delete, sender=Agency)
+def forget_cached_status(sender, instance, **kwargs):
+    status_cache.forget(instance.pk)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_save, sender=Booking)
+@receiver(post_save, sender=Client)
+def count_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    field = counters.counter_for(sender)
+    loaded_agency_id = None if created else getattr(instance, '_loaded_agency_id', instance.agency_id)
+    if loaded_agency_id != instance.agency_id:
+        # Created, or a user moved to another agency; agencies in id order
+        deltas = {loaded_agency_id: -1, instance.agency_id: 1}
+        for agency_id in sorted(pk for pk in deltas if pk is not None):
+            counters.apply_delta(agency_id, field, deltas[agency_id])
+    instance._loaded_agency_id = instance.agency_id
+
+
+@receiver(post_delete, sender=get_user_model())
+@receiver(post_delete, sender=Booking)
+@receiver(post_delete, sender=Client)
+def count_deleted(sender, instance, **kwargs):
+    counters.apply_delta(instance.agency_id, counters.counter_for(sender), -1)
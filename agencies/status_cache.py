@@ -0,0 +1,68 @@
+"""
+Cached agency status, checked on every authenticated API request.
+
+Statuses live in the default cache, so the check runs no database query
+once an agency's status is cached. Saving an agency deletes its entry
+immediately and writes the new status once the transaction commits (see
+agencies.signals). When REDIS_URL is set the cache is shared and every
+worker sees the change on its next request. With the per-process LocMem
+cache, other workers keep accepting requests for up to
+AGENCY_STATUS_CACHE_TIMEOUT seconds (5 by default) before they refuse a
+suspended agency. This is the gate that enforces suspensions: the token's
+status_version claim is only compared against the per-process auth cache.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import Agency
+
+KEY_PREFIX = 'agency-status'
+# Cached for agencies that no longer exist
+MISSING = 'missing'
+
+
+def _key(agency_id):
+    return f'{KEY_PREFIX}:{agency_id}'
+
+
+def get_status(agency_id):
+    """The agency's status ('active', 'suspended', ...) or MISSING."""
+    key = _key(agency_id)
+    agency_status = cache.get(key)
+    if agency_status is None:
+        agency_status = Agency.objects.filter(pk=agency_id).values_list('status', flat=True).first() or MISSING
+        cache.set(key, agency_status, settings.AGENCY_STATUS_CACHE_TIMEOUT)
+    return agency_status
+
+
+def set_status(agency_id, agency_status):
+    cache.set(_key(agency_id), agency_status, settings.AGENCY_STATUS_CACHE_TIMEOUT)
+
+
+def forget(agency_id):
+    cache.delete(_key(agency_id))
+
+
+class AgencyInactive(APIException):
+    status_code = status.HTTP_403_FORBIDDEN
+    default_code = 'agency_inactive'
+
+    def __init__(self, agency_status):
+        super().__init__({
+            'detail': f'Agency account is {agency_status.upper()}. Access is restricted.',
+            'agency_status': agency_status,
+        })
+
+
+def check_agency_status(user, view=None):
+    """
+    Raise AgencyInactive unless the user's agency is active. Users without an
+    agency and views with `agency_status_exempt = True` are not checked.
+    """
+    if user.agency_id is None or getattr(view, 'agency_status_exempt', False):
+        return
+    agency_status = get_status(user.agency_id)
+    if agency_status != 'active':
+        raise AgencyInactive(agency_status)
@@ -1,3 +1,163 @@
+import io
+import time
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
 from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from bookings.models import Booking
+from clients.models import Client
+from services.models import Service
+from users import auth_cache
+from users.models import User
+from .counters import reconcile
+from .models import Agency
+
+
+class AgencyStatusGateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        auth_cache.clear()
+        self.agency = Agency.objects.create(name='Test Agency', status='active')
+        self.user = User.objects.create_user(
+            username='agent', email='agent@example.com', password='pass',
+            agency=self.agency, role='agent'
+        )
+        self.api = APIClient()
+        # Without tenant claims, like tokens issued before they were added
+        self.api.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def set_status(self, agency_status):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.agency.status = agency_status
+            self.agency.save()
+
+    def test_inactive_agency_is_refused_on_every_request(self):
+        self.assertEqual(self.api.get('/api/clients/').status_code, 200)
+        self.set_status('suspended')
+        response = self.api.get('/api/clients/')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()['agency_status'], 'suspended')
+
+        self.set_status('active')
+        self.assertEqual(self.api.get('/api/clients/').status_code, 200)
+
+    def test_change_from_another_worker_applies_within_the_cache_timeout(self):
+        self.assertEqual(self.api.get('/api/clients/').status_code, 200)
+        # Another worker's save reaches neither this process's signals nor its LocMem cache
+        Agency.objects.filter(pk=self.agency.pk).update(status='suspended')
+        self.assertEqual(self.api.get('/api/clients/').status_code, 200)
+
+        later = time.time() + settings.AGENCY_STATUS_CACHE_TIMEOUT + 1
+        with mock.patch('time.time', return_value=later):
+            self.assertEqual(self.api.get('/api/clients/').status_code, 403)
+
+    def test_check_status_is_exempt_and_served_from_cache(self):
+        self.set_status('locked')
+        self.api.get('/api/agency/check-status/')
+        with self.assertNumQueries(0):
+            response = self.api.get('/api/agency/check-status/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            (response.json()['agency_status'], response.json()['has_access']), ('locked', False)
+        )
+
+
+class AgencyCounterTests(TestCase):
+    def setUp(self):
+        self.agency = Agency.objects.create(name='Test Agency', status='active')
+        self.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='pass',
+            agency=self.agency, role='agency_owner'
+        )
+        self.service = Service.objects.create(
+            agency=self.agency, service_name='Umrah Package', service_include=[],
+            service_base_cost=Decimal('1000.00'), service_profit=Decimal('200.00'),
+            service_duration='10 days', destination='Makkah'
+        )
+
+    def counts(self):
+        self.agency.refresh_from_db()
+        return self.agency.users_count, self.agency.bookings_count, self.agency.clients_count
+
+    def test_counters_follow_creates_moves_and_deletes(self):
+        client = Client.objects.create(agency=self.agency, name='Client', created_by=self.owner)
+        Booking.objects.create(agency=self.agency, client=client, service=self.service, created_by=self.owner)
+        agent = User.objects.create_user(
+            username='agent', email='agent@example.com', password='pass', agency=self.agency, role='agent'
+        )
+        self.assertEqual(self.counts(), (2, 1, 1))
+
+        other = Agency.objects.create(name='Other Agency')
+        agent = User.objects.get(pk=agent.pk)
+        agent.agency = other
+        agent.save()
+        other.refresh_from_db()
+        self.assertEqual((self.counts()[0], other.users_count), (1, 1))
+
+        client.delete()  # cascades to the booking
+        self.assertEqual(self.counts(), (1, 0, 0))
+
+    def test_saving_a_stale_agency_keeps_the_counters(self):
+        stale = Agency.objects.get(pk=self.agency.pk)
+        Client.objects.create(agency=self.agency, name='Client', created_by=self.owner)
+        stale.name = 'Renamed Agency'
+        stale.save()
+        self.assertEqual(self.counts(), (1, 0, 1))
+        self.assertEqual(self.agency.name, 'Renamed Agency')
+
+    def test_failed_write_rolls_back_its_counter_delta(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Client.objects.create(agency=self.agency, name='Client', created_by=self.owner)
+            raise RuntimeError
+        self.assertEqual(self.counts(), (1, 0, 0))
+
+    def test_agency_created_for_a_user_without_one_is_counted_once(self):
+        user = User.objects.create_user(
+            username='admin', email='admin@example.com', password='pass', role='agency_owner'
+        )
+        api = APIClient()
+        api.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        for _ in range(2):
+            self.assertEqual(api.get('/api/agency/').status_code, 200)
+        agency = Agency.objects.get(name="admin's Agency")
+        self.assertEqual(agency.users_count, 1)
+        self.assertEqual(auth_cache.get_user(user.pk).agency_id, agency.id)
+
+    def test_reconcile_fixes_drift(self):
+        Client.objects.create(agency=self.agency, name='Client', created_by=self.owner)
+        Agency.objects.filter(pk=self.agency.pk).update(users_count=7, clients_count=0)
+        self.assertEqual(reconcile(), 1)
+        self.assertEqual(self.counts(), (1, 0, 1))
+        call_command('reconcile_agency_counters', stdout=io.StringIO())
+        self.assertEqual(reconcile(agency_id=self.agency.pk), 0)
+
+    def test_staff_list_reads_users_with_their_agency_in_one_query(self):
+        for i in range(3):
+            User.objects.create_user(
+                username=f'agent{i}', email=f'agent{i}@example.com', password='pass',
+                agency=self.agency, role='agent'
+            )
+        api = APIClient()
+        api.force_authenticate(self.owner)
+        with self.assertNumQueries(2):  # page count, users with their agency
+            response = api.get('/api/users/')
+        self.assertEqual(len(response.json()['results']), 4)
+        self.assertEqual(response.json()['results'][0]['agency_details']['user_count'], 4)
 
-# Create your tests here.
+    def test_profile_embeds_the_full_agency(self):
+        Client.objects.create(agency=self.agency, name='Client', created_by=self.owner)
+        api = APIClient()
+        api.force_authenticate(User.objects.get(pk=self.owner.pk))
+        agency = api.get('/api/auth/profile/').json()['agency_details']
+        self.assertEqual(set(agency), {
+            'id', 'name', 'phone_number', 'email', 'address', 'status', 'logo_url', 'description',
+            'user_count', 'booking_count', 'clients_count', 'created_at', 'updated_at',
+        })
+        self.assertEqual((agency['user_count'], agency['booking_count'], agency['clients_count']), (1, 0, 1))
@@ -3,7 +3,9 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from .models import Agency
+from .status_cache import get_status
 from .serializers import AgencySerializer, AgencyUpdateSerializer, AgencyPublicSerializer
 from users.permissions import IsAgencyOwnerOrManager
 
@@ -17,6 +19,8 @@ class AgencyPublicView(generics.RetrieveAPIView):
     """
     serializer_class = AgencyPublicSerializer
     permission_classes = [IsAuthenticated]
+    # Also shown to users of a suspended / locked agency
+    agency_status_exempt = True
     
     def get_object(self):
         """Return the user's agency or default"""
@@ -76,10 +80,18 @@ class AgencyDetailView(generics.RetrieveUpdateAPIView):
                     'status': 'active'
                 }
             )
-            user.agency = agency
-            user.save()
-        
-        return user.agency
+            with transaction.atomic():
+                # Saved through the model so the agency counter and the
+                # cached principal (users.signals) follow the change
+                fresh = User.objects.select_for_update().get(pk=user.pk)
+                if fresh.agency_id is None:
+                    fresh.agency = agency
+                    fresh.save(update_fields=['agency'])
+            user.agency = fresh.agency
+            return user.agency
+
+        # request.user's agency comes from the auth cache; edit a fresh row
+        return Agency.objects.get(pk=user.agency_id)
     
     def get_serializer_class(self):
         if self.request.method == 'GET':
@@ -90,8 +102,11 @@ class AgencyDetailView(generics.RetrieveUpdateAPIView):
 class CheckAgencyStatusView(APIView):
     """
     ✅ Check agency status (used during login).
+    Polled by the frontend: the status comes from agencies.status_cache.
     """
     permission_classes = [IsAuthenticated]
+    # Must answer users of an inactive agency
+    agency_status_exempt = True
     
     def get(self, request):
         user = request.user
@@ -104,13 +119,14 @@ class CheckAgencyStatusView(APIView):
             }, status=status.HTTP_200_OK)  # Changed to 200 for frontend handling
         
         agency = user.agency
-        agency_status = agency.status.lower() if agency.status else 'inactive'
+        current_status = get_status(agency.id)
+        agency_status = current_status.lower() if current_status else 'inactive'
         
         response_data = {
             'agency_id': agency.id,
             'agency_name': agency.name,
             'agency_status': agency_status,
-            'status_display': agency.get_status_display(),
+            'status_display': dict(Agency.STATUS_CHOICES).get(current_status, current_status),
             'has_access': agency_status == 'active'
         }
         
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Booking, BookingNote
+from .models import Booking, BookingNote, Payment
 
 
 class BookingNoteInline(admin.TabularInline):
@@ -8,20 +8,37 @@ class BookingNoteInline(admin.TabularInline):
     readonly_fields = ['created_at', 'created_by']
 
 
+class PaymentInline(admin.TabularInline):
+    """Payments are append-only: recorded through the API, never edited"""
+    model = Payment
+    extra = 0
+    fields = ['amount', 'method', 'recorded_by', 'created_at']
+    readonly_fields = fields
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Booking)
 class BookingAdmin(admin.ModelAdmin):
     list_display = ['id', 'client', 'service', 'agency', 'booking_status', 'payment_status', 'total_amount', 'created_at']
     list_filter = ['booking_status', 'payment_status', 'agency', 'created_at']
     search_fields = ['client__name', 'service__service_name']
-    readonly_fields = ['created_at', 'updated_at', 'created_by', 'total_amount', 'remaining_amount']
-    inlines = [BookingNoteInline]
+    readonly_fields = [
+        'created_at', 'updated_at', 'created_by',
+        'unit_base_cost', 'unit_profit', 'total_amount',
+        # Ledger-maintained: payments are recorded through the API
+        'paid_amount', 'remaining_amount', 'payment_status', 'last_payment_date'
+    ]
+    inlines = [BookingNoteInline, PaymentInline]
     
     fieldsets = (
         ('Booking Information', {
             'fields': ('agency', 'client', 'service', 'booking_status')
         }),
         ('Pricing & Discount', {
-            'fields': ('discount', 'total_amount')
+            'fields': ('unit_base_cost', 'unit_profit', 'discount', 'total_amount')
         }),
         ('Payment Information', {
             'fields': ('paid_amount', 'remaining_amount', 'payment_status', 'payment_method', 'last_payment_date')
@@ -0,0 +1,87 @@
+"""
+Booking analytics served from the daily rollups and conditional aggregation.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+
+
+STAT_FIELDS = [
+    'bookings_count', 'sales_total', 'received_total', 'profit_total',
+    'pending_count', 'confirmed_count', 'rejected_count',
+    'paid_count', 'half_paid_count', 'payment_pending_count',
+]
+
+
+def summarize_missing_dates(bookings):
+    """Badge counts for bookings without travel/return dates, in one query."""
+    return bookings.aggregate(
+        missing_any=Count('id', filter=Q(arrival_date__isnull=True) | Q(departure_date__isnull=True)),
+        missing_arrival=Count('id', filter=Q(arrival_date__isnull=True)),
+        missing_departure=Count('id', filter=Q(departure_date__isnull=True)),
+    )
+
+
+def summarize_daily_stats(stats, bookings, clients=None):
+    """
+    Build the AnalyticsView payload. Amounts and counts are summed from
+    DailyBookingStats rows (one grouped query over days x agents).
+
+    Distinct-customer counts are not additive across days. For the whole
+    agency over its lifetime, pass `clients` (the agency's clients): the
+    total is then the number of clients whose maintained bookings_count is
+    positive, one count over clients. Otherwise the total is a distinct
+    count over `bookings` (the equally-filtered raw queryset), which should
+    be bounded by a date range or a single agent. The per-agent breakdown
+    is always one grouped distinct count over `bookings`.
+    """
+    per_agent = [
+        row for row in stats.values('agent__username').annotate(
+            **{field: Sum(field) for field in STAT_FIELDS}
+        ).order_by('-bookings_count')
+        if row['bookings_count']
+    ]
+    totals = {field: sum(row[field] for row in per_agent) for field in STAT_FIELDS}
+
+    customers = list(
+        bookings.values('created_by__username').annotate(
+            unique_clients=Count('client', distinct=True)
+        ).order_by('-unique_clients')
+    )
+    if clients is not None:
+        total_customers = clients.filter(bookings_count__gt=0).count()
+    elif len(customers) > 1:
+        total_customers = bookings.aggregate(total=Count('client', distinct=True))['total']
+    else:
+        # A single agent's distinct clients are the overall distinct clients
+        total_customers = customers[0]['unique_clients'] if customers else 0
+
+    total_sales = totals['sales_total'] or Decimal('0.00')
+    total_received = totals['received_total'] or Decimal('0.00')
+    total_profit = totals['profit_total'] or Decimal('0.00')
+
+    return {
+        'amounts': {
+            'total_sales': str(total_sales),
+            'total_received': str(total_received),
+            'total_remaining': str(total_sales - total_received),
+            'total_profit': str(total_profit),
+        },
+        'payment_breakdown': {
+            'paid': totals['paid_count'],
+            'half_paid': totals['half_paid_count'],
+            'pending': totals['payment_pending_count'],
+        },
+        'booking_status_breakdown': {
+            'pending': totals['pending_count'],
+            'confirmed': totals['confirmed_count'],
+            'rejected': totals['rejected_count'],
+        },
+        'agent_bookings_tracker': [
+            {'created_by__username': row['agent__username'], 'count': row['bookings_count']}
+            for row in per_agent
+        ],
+        'agent_customers_tracker': customers,
+        'total_bookings': totals['bookings_count'],
+        'total_customers': total_customers,
+    }
@@ -0,0 +1,130 @@
+"""
+Per-agency analytics response cache.
+
+Entries are tagged with a per-agency version number; any write to an
+agency's bookings, services or clients bumps the version (see
+bookings.signals), which invalidates every cached response of that agency
+without scanning keys. The version lives in the default cache: shared
+between workers with Redis, per process with LocMem, where other workers
+keep their entries until ANALYTICS_CACHE_TIMEOUT (5 s by default) expires. Concurrent misses are single-flighted through a
+cache lock: while one request recomputes, the others are served the
+previous response if it is within the stale-while-revalidate window, and
+otherwise poll for at most ANALYTICS_CACHE_WAIT_SECONDS before computing it
+themselves. The lock holds a per-request token and is only released by its
+owner, so a request whose lock expired never deletes another request's lock.
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+KEY_PREFIX = 'analytics'
+POLL_INTERVAL = 0.05
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _version_key(agency_id):
+    return f'{KEY_PREFIX}:version:{agency_id}'
+
+
+def _new_version():
+    # Time based, so an evicted counter never restarts at a number already used
+    return int(time.time() * 1000)
+
+
+def agency_version(agency_id):
+    key = _version_key(agency_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_agency_version(agency_id):
+    """Invalidate every cached analytics response of an agency."""
+    try:
+        cache.incr(_version_key(agency_id))
+    except ValueError:
+        cache.set(_version_key(agency_id), _new_version(), None)
+
+
+def _count(event):
+    key = f'{KEY_PREFIX}:stats:{event}'
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def cache_stats():
+    """Hit / miss / stale counters since the cache was last cleared."""
+    events = ['hit', 'miss', 'stale']
+    values = cache.get_many([f'{KEY_PREFIX}:stats:{event}' for event in events])
+    return {event: values.get(f'{KEY_PREFIX}:stats:{event}', 0) for event in events}
+
+
+def _release(lock_key, token):
+    # Compare, then delete: the lock may have expired and been taken since
+    if cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+def cached_analytics(agency_id, scope, compute):
+    """
+    Return (payload, outcome) for an agency/scope, where outcome is 'HIT',
+    'MISS' or 'STALE'. `scope` identifies the request (agent, range, dates);
+    `compute` builds the payload on a miss.
+    """
+    timeout = _setting('ANALYTICS_CACHE_TIMEOUT', 300)
+    stale_seconds = _setting('ANALYTICS_CACHE_STALE_SECONDS', 0)
+    lock_timeout = _setting('ANALYTICS_CACHE_LOCK_TIMEOUT', 10)
+    wait_seconds = _setting('ANALYTICS_CACHE_WAIT_SECONDS', 2)
+
+    key = f'{KEY_PREFIX}:{agency_id}:{scope}'
+    version = agency_version(agency_id)
+    entry = cache.get(key)
+    now = time.time()
+
+    if entry and entry['version'] == version and now < entry['fresh_until']:
+        _count('hit')
+        return entry['data'], 'HIT'
+
+    lock_key = f'{key}:lock'
+    token = uuid.uuid4().hex
+    locked = cache.add(lock_key, token, lock_timeout)
+    if not locked:
+        # Someone else is computing this response
+        if entry and stale_seconds and now < entry['fresh_until'] + stale_seconds:
+            _count('stale')
+            return entry['data'], 'STALE'
+
+        deadline = now + wait_seconds
+        while time.time() < deadline:
+            time.sleep(POLL_INTERVAL)
+            entry = cache.get(key)
+            if entry and entry['version'] == version and time.time() < entry['fresh_until']:
+                _count('hit')
+                return entry['data'], 'HIT'
+            if cache.get(lock_key) is None:
+                locked = cache.add(lock_key, token, lock_timeout)
+                break
+
+    try:
+        data = compute()
+        cache.set(key, {
+            'version': version,
+            'data': data,
+            'fresh_until': time.time() + timeout,
+        }, timeout + stale_seconds)
+    finally:
+        if locked:
+            _release(lock_key, token)
+
+    _count('miss')
+    return data, 'MISS'
@@ -0,0 +1,187 @@
+"""
+Set-based booking writes for group bookings and batch operations.
+
+These paths skip Booking.save() and its signals, so they keep the daily
+rollups, the client summaries, the payment ledger and the analytics cache
+in step themselves.
+"""
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Value, When
+from django.utils import timezone
+
+from agencies import counters
+from clients.models import Client
+from services.models import Service
+
+from . import client_summary, rollups
+from .analytics_cache import bump_agency_version
+from .models import Booking, Payment
+from .payments import MAX_PAID_AMOUNT, opening_payments, payment_status_expression
+from .validation import booking_errors
+
+BULK_BATCH_SIZE = 500
+BULK_MAX_ITEMS = 1000
+
+
+def apply_rollup_states(states, sign=1):
+    """Apply many bookings' rollup contributions, one UPDATE per bucket."""
+    buckets = defaultdict(lambda: defaultdict(int))
+    for key, values in states:
+        for field, value in values.items():
+            buckets[key][field] += value
+    for key, values in buckets.items():
+        rollups.apply_delta(key, dict(values), sign=sign)
+
+
+def bulk_create_bookings(items, agency, user):
+    """
+    Create bookings from already-parsed items (BookingBulkItemSerializer data).
+
+    Clients and services are fetched in one query each and every rule is
+    checked in memory. Nothing is written unless all items are valid.
+    Returns (bookings, errors) where errors lines up with `items` ({} for a
+    valid item).
+    """
+    clients = Client.objects.filter(agency=agency).in_bulk({item['client'] for item in items})
+    services = Service.objects.filter(agency=agency).in_bulk({item['service'] for item in items})
+
+    bookings, errors = [], []
+    for item in items:
+        item_errors = {}
+        client = clients.get(item['client'])
+        service = services.get(item['service'])
+        if client is None:
+            item_errors['client'] = 'Client not found'
+        if service is None:
+            item_errors['service'] = 'Service not found'
+        else:
+            item_errors.update(booking_errors(
+                service.service_profit, item.get('discount'), item.get('paid_amount'),
+                item.get('departure_date'), item.get('arrival_date'),
+            ))
+        errors.append(item_errors)
+        if item_errors:
+            continue
+
+        booking = Booking(
+            **{**item, 'client': client, 'service': service},
+            agency=agency, created_by=user,
+        )
+        booking.capture_pricing()
+        booking.update_payment_status()
+        bookings.append(booking)
+
+    if any(errors):
+        return [], errors
+
+    with transaction.atomic():
+        Booking.objects.bulk_create(bookings, batch_size=BULK_BATCH_SIZE)
+        Payment.objects.bulk_create(opening_payments(bookings, user), batch_size=BULK_BATCH_SIZE)
+        apply_rollup_states(booking.rollup_state() for booking in bookings)
+        client_summary.apply_deltas(booking.client_summary_state() for booking in bookings)
+        counters.apply_delta(agency.id, 'bookings_count', len(bookings))
+        transaction.on_commit(lambda: bump_agency_version(agency.id))
+    return bookings, errors
+
+
+
+def _refresh_buckets(keys):
+    """Recompute rollup buckets touched by a set-based UPDATE, bump caches on commit"""
+    rollups.refresh_buckets(keys)
+    agency_ids = {agency_id for agency_id, _, _ in keys}
+    transaction.on_commit(lambda: [bump_agency_version(pk) for pk in agency_ids])
+
+
+def bulk_set_status(queryset, ids, booking_status):
+    """
+    Move the bookings of `queryset` with the given ids to `booking_status`
+    in one UPDATE. Returns a summary dict.
+    """
+    targets = queryset.filter(pk__in=ids)
+    with transaction.atomic():
+        found = set(targets.order_by().values_list('pk', flat=True))
+        changing = targets.exclude(booking_status=booking_status)
+        # Status changes never move a booking to another bucket
+        keys = rollups.buckets_for(changing)
+        updated = changing.update(booking_status=booking_status, updated_at=timezone.now())
+        if updated:
+            _refresh_buckets(keys)
+    return {
+        'booking_status': booking_status,
+        'matched': len(found),
+        'updated': updated,
+        'not_found': sorted(set(ids) - found),
+    }
+
+
+def bulk_record_payments(queryset, amounts, method=None, user=None):
+    """
+    Record one payment per booking in a single transaction.
+
+    `amounts` maps booking id => amount, or None to pay the remaining
+    balance (nothing is recorded when none is left, never a refund). Rows
+    are locked in id order; paid_amount and payment_status are then
+    updated by one UPDATE. Returns (summary, errors) where errors
+    maps booking id => message; nothing is written when there are errors.
+    """
+    with transaction.atomic():
+        rows = list(
+            queryset.filter(pk__in=amounts).select_for_update().order_by('pk')
+            .values_list('pk', 'paid_amount', 'total_amount', 'client_id')
+        )
+        errors = {pk: 'Booking not found' for pk in set(amounts) - {row[0] for row in rows}}
+        payments = {}
+        clients = {}
+        for pk, paid, total, client_id in rows:
+            clients[pk] = client_id
+            amount = amounts[pk]
+            if amount is None:
+                # Settle the balance; paid-up and overpaid bookings are left alone
+                amount = max(total - paid, 0)
+            if amount and paid + amount < 0:
+                errors[pk] = 'Paid amount cannot be negative'
+            elif paid + amount > MAX_PAID_AMOUNT:
+                errors[pk] = f'Paid amount cannot exceed {MAX_PAID_AMOUNT}'
+            elif amount:
+                payments[pk] = amount
+        if errors:
+            return None, errors
+
+        if payments:
+            Payment.objects.bulk_create([
+                Payment(booking_id=pk, amount=amount, method=method, recorded_by=user)
+                for pk, amount in payments.items()
+            ], batch_size=BULK_BATCH_SIZE)
+
+            paying = Booking.objects.filter(pk__in=payments)
+            new_paid = F('paid_amount') + Case(
+                *[When(pk=pk, then=Value(amount)) for pk, amount in payments.items()],
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            )
+            now = timezone.now()
+            changes = {
+                'paid_amount': new_paid,
+                'payment_status': payment_status_expression(new_paid),
+                'last_payment_date': now,
+                'updated_at': now,
+            }
+            if method:
+                changes['payment_method'] = method
+            paying.update(**changes)
+            _refresh_buckets(rollups.buckets_for(paying))
+            client_summary.apply_deltas(
+                (clients[pk], {'total_paid': amount}) for pk, amount in payments.items()
+            )
+
+        statuses = Counter(
+            Booking.objects.filter(pk__in=amounts).order_by().values_list('payment_status', flat=True)
+        )
+    return {
+        'matched': len(rows),
+        'updated': len(payments),
+        'total_recorded': str(sum(payments.values(), Decimal('0.00'))),
+        'payment_status': dict(statuses),
+    }, {}
@@ -0,0 +1,133 @@
+"""
+Maintenance of the per-client financial summary columns on Client
+(bookings_count, total_billed, total_paid, outstanding, last_booking_at).
+
+Works like bookings.rollups: single booking writes apply a signed delta in
+the booking's transaction, set-based writes apply one delta per client, and
+`refresh_clients` / `rebuild` recompute the columns from raw bookings.
+Client rows are always updated after the booking rows they depend on, and
+in client id order, so concurrent writers do not deadlock.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from clients.models import Client
+
+from .models import Booking
+
+SUMMARY_AGGREGATES = {
+    'bookings_count': Count('id'),
+    'total_billed': Sum('total_amount'),
+    'total_paid': Sum('paid_amount'),
+    'last_booking_at': Max('created_at'),
+}
+EMPTY_SUMMARY = {
+    'bookings_count': 0,
+    'total_billed': Decimal('0.00'),
+    'total_paid': Decimal('0.00'),
+    'outstanding': Decimal('0.00'),
+    'last_booking_at': None,
+}
+
+
+def apply_delta(client_id, values, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) booking totals to a client's summary.
+    `values` holds any of bookings_count, total_billed, total_paid and
+    last_booking_at (state from Booking.client_summary_state).
+    """
+    if sign < 0 and values.get('bookings_count'):
+        # last_booking_at cannot be subtracted; recompute the client
+        refresh_clients([client_id])
+        return
+
+    billed = values.get('total_billed') or Decimal('0.00')
+    paid = values.get('total_paid') or Decimal('0.00')
+    changes = {
+        field: F(field) + sign * value
+        for field, value in [
+            ('bookings_count', values.get('bookings_count')),
+            ('total_billed', billed),
+            ('total_paid', paid),
+            ('outstanding', billed - paid),
+        ] if value
+    }
+    at = values.get('last_booking_at')
+    if at is not None:
+        changes['last_booking_at'] = Greatest(Coalesce('last_booking_at', Value(at)), Value(at))
+    if changes:
+        Client.objects.filter(pk=client_id).update(**changes)
+
+
+def apply_deltas(states):
+    """Apply many bookings' summary contributions, one UPDATE per client."""
+    clients = defaultdict(lambda: defaultdict(int))
+    for client_id, values in states:
+        totals = clients[client_id]
+        for field, value in values.items():
+            if field == 'last_booking_at':
+                totals[field] = max(totals.get(field) or value, value)
+            else:
+                totals[field] += value
+    for client_id in sorted(clients):
+        apply_delta(client_id, dict(clients[client_id]))
+
+
+def record_change(old, new):
+    """Move a saved booking's contribution from its old state to its new state."""
+    if old == new:
+        return
+    if old is None:
+        apply_delta(*new)
+        return
+    (old_client, old_values), (new_client, new_values) = old, new
+    if old_client == new_client:
+        apply_delta(new_client, {
+            'total_billed': new_values['total_billed'] - old_values['total_billed'],
+            'total_paid': new_values['total_paid'] - old_values['total_paid'],
+        })
+        return
+    for client_id in sorted([old_client, new_client]):
+        if client_id == old_client:
+            apply_delta(*old, sign=-1)
+        else:
+            apply_delta(*new)
+
+
+def refresh_clients(client_ids):
+    """Recompute the summary of the given clients from raw bookings (one aggregate query)."""
+    client_ids = sorted(set(client_ids))
+    rows = Booking.objects.filter(client_id__in=client_ids).order_by().values('client_id').annotate(
+        **SUMMARY_AGGREGATES
+    )
+    totals = {row.pop('client_id'): row for row in rows}
+    with transaction.atomic():
+        for client_id in client_ids:
+            row = totals.get(client_id)
+            if row is None:
+                summary = EMPTY_SUMMARY
+            else:
+                billed = row['total_billed'] or Decimal('0.00')
+                paid = row['total_paid'] or Decimal('0.00')
+                summary = {
+                    **row, 'total_billed': billed, 'total_paid': paid, 'outstanding': billed - paid,
+                }
+            Client.objects.filter(pk=client_id).update(**summary)
+
+
+def rebuild(agency_id=None, batch_size=1000):
+    """Recompute every client's summary (optionally for one agency), in id batches."""
+    clients = Client.objects.order_by('id').values_list('id', flat=True)
+    if agency_id is not None:
+        clients = clients.filter(agency_id=agency_id)
+
+    last_id, refreshed = 0, 0
+    while batch := list(clients.filter(id__gt=last_id)[:batch_size]):
+        refresh_clients(batch)
+        last_id = batch[-1]
+        refreshed += len(batch)
+    return refreshed
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from bookings.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the DailyBookingStats rollup table from raw bookings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--agency', type=int, help='Only rebuild this agency id')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rows = rebuild(agency_id=options['agency'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} daily stats rows'))
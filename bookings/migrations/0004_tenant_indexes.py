@@ -0,0 +1,46 @@
+# Generated by Django 5.2.10 on 2026-10-18 06:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+from travel_agency_saas.db import AddIndexConcurrentlyIfSupported
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('agencies', '0003_agency_address_agency_description_agency_email_and_more'),
+        ('bookings', '0003_initial'),
+        ('clients', '0002_initial'),
+        ('services', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfSupported(
+            model_name='booking',
+            index=models.Index(fields=['agency', '-created_at'], name='booking_agency_created_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='booking',
+            index=models.Index(fields=['agency', 'created_by', '-created_at'], name='booking_agency_agent_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='booking',
+            index=models.Index(fields=['agency', 'booking_status', '-created_at'], name='booking_agency_status_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='booking',
+            index=models.Index(fields=['agency', 'payment_status', '-created_at'], name='booking_agency_payment_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('booking_status', 'confirmed')), fields=['agency', 'arrival_date'], name='booking_confirmed_arrival_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('arrival_date__isnull', True), ('departure_date__isnull', True), _connector='OR'), fields=['agency', '-created_at'], name='booking_missing_dates_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.10 on 2026-10-18 06:32
+
+from decimal import Decimal
+from django.db import migrations, models
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def backfill_price_snapshot(apps, schema_editor):
+    """Copy current service prices onto existing bookings, one id range at a time."""
+    Booking = apps.get_model('bookings', 'Booking')
+    Service = apps.get_model('services', 'Service')
+    bounds = Booking.objects.aggregate(low=models.Min('id'), high=models.Max('id'))
+    if bounds['low'] is None:
+        return
+
+    service = Service.objects.filter(pk=models.OuterRef('service_id'))
+    price = service.annotate(
+        total=models.F('service_base_cost') + models.F('service_profit')
+    ).values('total')[:1]
+    for start in range(bounds['low'], bounds['high'] + 1, BACKFILL_BATCH_SIZE):
+        Booking.objects.filter(id__gte=start, id__lt=start + BACKFILL_BATCH_SIZE).update(
+            unit_base_cost=models.Subquery(service.values('service_base_cost')[:1]),
+            unit_profit=models.Subquery(service.values('service_profit')[:1]),
+            total_amount=models.Subquery(price) - models.F('discount'),
+        )
+
+
+class Migration(migrations.Migration):
+    # Backfill commits batch by batch instead of holding one long transaction
+    atomic = False
+
+    dependencies = [
+        ('bookings', '0004_tenant_indexes'),
+        ('services', '0003_service_name_trigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='total_amount',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='unit_base_cost',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='unit_profit',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=10),
+        ),
+        migrations.RunPython(backfill_price_snapshot, migrations.RunPython.noop),
+    ]
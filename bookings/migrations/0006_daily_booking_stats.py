@@ -0,0 +1,80 @@
+# Generated by Django 5.2.10 on 2026-10-18 06:36
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def build_daily_stats(apps, schema_editor):
+    """Populate the rollup from existing bookings (same as rebuild_booking_stats)"""
+    Booking = apps.get_model('bookings', 'Booking')
+    DailyBookingStats = apps.get_model('bookings', 'DailyBookingStats')
+
+    def count(**condition):
+        return models.Count('id', filter=models.Q(**condition)) if condition else models.Count('id')
+
+    rows = Booking.objects.order_by().annotate(day=TruncDate('created_at')).values(
+        'agency_id', 'created_by_id', 'day'
+    ).annotate(
+        bookings_count=count(),
+        sales_total=models.Sum('total_amount'),
+        received_total=models.Sum('paid_amount'),
+        profit_total=models.Sum('unit_profit'),
+        pending_count=count(booking_status='pending'),
+        confirmed_count=count(booking_status='confirmed'),
+        rejected_count=count(booking_status='rejected'),
+        paid_count=count(payment_status='PAID'),
+        half_paid_count=count(payment_status='HALF_PAID'),
+        payment_pending_count=count(payment_status='PENDING'),
+    )
+    batch = []
+    for row in rows.iterator(chunk_size=1000):
+        row['agent_id'] = row.pop('created_by_id')
+        for field in ['sales_total', 'received_total', 'profit_total']:
+            row[field] = row[field] or Decimal('0.00')
+        batch.append(DailyBookingStats(**row))
+        if len(batch) >= 1000:
+            DailyBookingStats.objects.bulk_create(batch)
+            batch = []
+    DailyBookingStats.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0003_agency_address_agency_description_agency_email_and_more'),
+        ('bookings', '0005_booking_price_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBookingStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('bookings_count', models.IntegerField(default=0)),
+                ('sales_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('received_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('profit_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('pending_count', models.IntegerField(default=0)),
+                ('confirmed_count', models.IntegerField(default=0)),
+                ('rejected_count', models.IntegerField(default=0)),
+                ('paid_count', models.IntegerField(default=0)),
+                ('half_paid_count', models.IntegerField(default=0)),
+                ('payment_pending_count', models.IntegerField(default=0)),
+                ('agency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_booking_stats', to='agencies.agency')),
+                ('agent', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Daily Booking Stats',
+                'verbose_name_plural': 'Daily Booking Stats',
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['agency', 'day'], name='booking_stats_agency_day_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('agent__isnull', False)), fields=('agency', 'agent', 'day'), name='booking_stats_agent_day_uniq'), models.UniqueConstraint(condition=models.Q(('agent__isnull', True)), fields=('agency', 'day'), name='booking_stats_no_agent_day_uniq')],
+            },
+        ),
+        migrations.RunPython(build_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.10 on 2026-10-18 06:41
+
+import django.db.models.expressions
+from decimal import Decimal
+from django.db import migrations, models
+
+from travel_agency_saas.db import AddCheckConstraintNotValidFirst
+
+MAX_DISCOUNT_SHARE = Decimal('0.50')
+
+
+def check_legacy_bookings(apps, schema_editor):
+    """
+    Refuse to add the constraints while existing rows break them.
+
+    Billing data is never rewritten here: the offending bookings are listed
+    so they can be corrected by hand, and the migration is run again. Rows
+    whose discount exceeds half their profit are typically older bookings
+    whose service profit was lowered after they were written (0005
+    snapshotted the service's current profit).
+    """
+    Booking = apps.get_model('bookings', 'Booking')
+    rules = [
+        ('negative amounts',
+         models.Q(discount__lt=0) | models.Q(paid_amount__lt=0)
+         | models.Q(unit_base_cost__lt=0) | models.Q(unit_profit__lt=0)),
+        ('a return before the travel date', models.Q(arrival_date__lt=models.F('departure_date'))),
+        ('a discount above half the profit', models.Q(discount__gt=models.F('unit_profit') * MAX_DISCOUNT_SHARE)),
+    ]
+    problems = []
+    for description, condition in rules:
+        ids = list(Booking.objects.filter(condition).order_by('id').values_list('id', flat=True)[:100])
+        if ids:
+            problems.append(f'{description} (first ids: {ids})')
+    if problems:
+        raise RuntimeError(
+            'Bookings with ' + '; '.join(problems)
+            + ' must be fixed before the check constraints can be added'
+        )
+
+
+class Migration(migrations.Migration):
+    # NOT VALID + VALIDATE must commit separately to avoid holding the table lock.
+    # A run that fails half-way can be retried: constraints already added are
+    # only validated again.
+    atomic = False
+
+    dependencies = [
+        ('bookings', '0006_daily_booking_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_legacy_bookings, migrations.RunPython.noop),
+        AddCheckConstraintNotValidFirst(
+            model_name='booking',
+            constraint=models.CheckConstraint(condition=models.Q(('discount__gte', 0), ('paid_amount__gte', 0), ('unit_base_cost__gte', 0), ('unit_profit__gte', 0)), name='booking_amounts_non_negative'),
+        ),
+        AddCheckConstraintNotValidFirst(
+            model_name='booking',
+            constraint=models.CheckConstraint(condition=models.Q(('departure_date__isnull', True), ('arrival_date__isnull', True), ('arrival_date__gte', models.F('departure_date')), _connector='OR'), name='booking_return_after_travel'),
+        ),
+        AddCheckConstraintNotValidFirst(
+            model_name='booking',
+            constraint=models.CheckConstraint(condition=models.Q(('discount__lte', django.db.models.expressions.CombinedExpression(models.F('unit_profit'), '*', models.Value(Decimal('0.50'))))), name='booking_discount_max_half_profit'),
+        ),
+    ]
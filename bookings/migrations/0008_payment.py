@@ -0,0 +1,63 @@
+# Generated by Django 5.2.10 on 2026-10-18 06:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def backfill_opening_payments(apps, schema_editor):
+    """One payment per already-paid booking, so the ledger sums to paid_amount."""
+    Booking = apps.get_model('bookings', 'Booking')
+    Payment = apps.get_model('bookings', 'Payment')
+    bounds = Booking.objects.aggregate(low=models.Min('id'), high=models.Max('id'))
+    if bounds['low'] is None:
+        return
+
+    paid_at = Booking.objects.filter(pk=models.OuterRef('booking_id')).values(
+        at=Coalesce('last_payment_date', 'updated_at')
+    )[:1]
+    for start in range(bounds['low'], bounds['high'] + 1, BACKFILL_BATCH_SIZE):
+        batch = Booking.objects.filter(
+            id__gte=start, id__lt=start + BACKFILL_BATCH_SIZE, paid_amount__gt=0
+        ).values_list('id', 'paid_amount', 'payment_method')
+        Payment.objects.bulk_create([
+            Payment(booking_id=booking_id, amount=amount, method=method)
+            for booking_id, amount, method in batch
+        ])
+        # created_at is auto_now_add; date the opening payments properly
+        Payment.objects.filter(
+            booking_id__gte=start, booking_id__lt=start + BACKFILL_BATCH_SIZE
+        ).update(created_at=models.Subquery(paid_at))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_booking_check_constraints'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Payment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('method', models.CharField(blank=True, max_length=100, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='bookings.booking')),
+                ('recorded_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recorded_payments', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Payment',
+                'verbose_name_plural': 'Payments',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['booking', '-created_at', '-id'], name='payment_booking_created_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('amount', 0), _negated=True), name='payment_amount_non_zero')],
+            },
+        ),
+        migrations.RunPython(backfill_opening_payments, migrations.RunPython.noop),
+    ]
@@ -156,10 +156,12 @@
 #         return f"Note for Booking #{self.booking.id} - {self.created_at.strftime('%Y-%m-%d')}"
 
 
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from decimal import Decimal
+from .validation import MAX_DISCOUNT_SHARE, booking_errors
 
 
 class Booking(models.Model):
@@ -205,6 +207,28 @@ class Booking(models.Model):
         default='pending'
     )
 
+    # Price snapshot taken from the service when the booking is created,
+    # so editing a service never rewrites historic totals.
+    unit_base_cost = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        editable=False
+    )
+    unit_profit = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        editable=False
+    )
+    # unit_base_cost + unit_profit - discount
+    total_amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        editable=False
+    )
+
     # Payment fields
     paid_amount = models.DecimalField(
         max_digits=10,
@@ -237,14 +261,96 @@ class Booking(models.Model):
         verbose_name = 'Booking'
         verbose_name_plural = 'Bookings'
         ordering = ['-created_at']
+        indexes = [
+            # Every list/analytics query is agency-scoped and newest-first
+            models.Index(fields=['agency', '-created_at'], name='booking_agency_created_idx'),
+            # Agents only ever see their own bookings
+            models.Index(fields=['agency', 'created_by', '-created_at'], name='booking_agency_agent_idx'),
+            models.Index(fields=['agency', 'booking_status', '-created_at'], name='booking_agency_status_idx'),
+            models.Index(fields=['agency', 'payment_status', '-created_at'], name='booking_agency_payment_idx'),
+            # Onboard module: confirmed bookings ordered by arrival date
+            models.Index(
+                fields=['agency', 'arrival_date'],
+                condition=models.Q(booking_status='confirmed'),
+                name='booking_confirmed_arrival_idx',
+            ),
+            # missing_dates filter + dates_summary badge counts
+            models.Index(
+                fields=['agency', '-created_at'],
+                condition=models.Q(arrival_date__isnull=True) | models.Q(departure_date__isnull=True),
+                name='booking_missing_dates_idx',
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    models.Q(discount__gte=0) & models.Q(paid_amount__gte=0)
+                    & models.Q(unit_base_cost__gte=0) & models.Q(unit_profit__gte=0)
+                ),
+                name='booking_amounts_non_negative',
+            ),
+            models.CheckConstraint(
+                condition=(
+                    models.Q(departure_date__isnull=True) | models.Q(arrival_date__isnull=True)
+                    | models.Q(arrival_date__gte=models.F('departure_date'))
+                ),
+                name='booking_return_after_travel',
+            ),
+            # Also keeps the total at or above the base cost
+            models.CheckConstraint(
+                condition=models.Q(discount__lte=models.F('unit_profit') * MAX_DISCOUNT_SHARE),
+                name='booking_discount_max_half_profit',
+            ),
+        ]
 
     def __str__(self):
         return f"Booking #{self.id} - {self.client.name} - {self.service.service_name}"
 
-    @property
-    def total_amount(self):
-        """Calculate total amount after discount"""
-        return self.service.service_total_price - self.discount
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Service the stored price snapshot was taken from
+        instance._priced_service_id = instance.__dict__.get('service_id')
+        # Contribution currently recorded in DailyBookingStats (see bookings.rollups)
+        instance._rollup_state = None if instance.get_deferred_fields() else instance.rollup_state()
+        # Contribution currently recorded in the client's summary (see bookings.client_summary)
+        instance._client_state = None if instance.get_deferred_fields() else instance.client_summary_state()
+        return instance
+
+    def capture_pricing(self):
+        """Snapshot the service price (new bookings, or when the service changes)"""
+        if self.service_id and self.service_id != getattr(self, '_priced_service_id', None):
+            self.unit_base_cost = self.service.service_base_cost
+            self.unit_profit = self.service.service_profit
+            self._priced_service_id = self.service_id
+        self.total_amount = self.unit_base_cost + self.unit_profit - (self.discount or Decimal('0.00'))
+
+    def rollup_state(self):
+        """(bucket key, values) this booking contributes to DailyBookingStats"""
+        created_at = timezone.localtime(self.created_at) if timezone.is_aware(self.created_at) else self.created_at
+        key = (self.agency_id, self.created_by_id, created_at.date())
+        values = {
+            'bookings_count': 1,
+            'sales_total': self.total_amount,
+            'received_total': self.paid_amount,
+            'profit_total': self.unit_profit,
+            'pending_count': int(self.booking_status == 'pending'),
+            'confirmed_count': int(self.booking_status == 'confirmed'),
+            'rejected_count': int(self.booking_status == 'rejected'),
+            'paid_count': int(self.payment_status == 'PAID'),
+            'half_paid_count': int(self.payment_status == 'HALF_PAID'),
+            'payment_pending_count': int(self.payment_status == 'PENDING'),
+        }
+        return key, values
+
+    def client_summary_state(self):
+        """(client id, values) this booking contributes to its client's summary"""
+        return self.client_id, {
+            'bookings_count': 1,
+            'total_billed': self.total_amount,
+            'total_paid': self.paid_amount,
+            'last_booking_at': self.created_at,
+        }
 
     @property
     def remaining_amount(self):
@@ -262,32 +368,23 @@ class Booking(models.Model):
 
     def clean(self):
         """Validate discount rules + date rules (dates optional)"""
-        if self.service:
-            max_discount = self.service.service_profit * Decimal('0.50')  # 50% of profit
-
-            if self.discount > max_discount:
-                raise ValidationError({
-                    'discount': f'Discount cannot exceed 50% of profit (max: {max_discount})'
-                })
-
-            # Ensure discount doesn't reduce price below base cost
-            if self.total_amount < self.service.service_base_cost:
-                raise ValidationError({
-                    'discount': 'Discount cannot reduce price below base cost'
-                })
-
-        # ✅ TRAVEL LOGIC: DEPARTURE DATE (travel) first, then ARRIVAL DATE (return)
-        # Return date must be AFTER travel date
-        if self.departure_date and self.arrival_date:
-            if self.arrival_date < self.departure_date:
-                raise ValidationError({
-                    'arrival_date': 'Return date must be after travel date'
-                })
+        if self.service_id:
+            self.capture_pricing()
+        errors = booking_errors(
+            self.unit_profit, self.discount, self.paid_amount,
+            self.departure_date, self.arrival_date,
+        )
+        if errors:
+            raise ValidationError(errors)
 
     def save(self, *args, **kwargs):
+        # Invariants are enforced by Meta.constraints; callers validate input
+        # up front (serializers, bookings.validation) instead of full_clean()
+        self.capture_pricing()
         self.update_payment_status()
-        self.full_clean()
-        super().save(*args, **kwargs)
+        # Atomic so the rollup update (post_save signal) commits with the booking
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
 
 
 class BookingNote(models.Model):
@@ -313,4 +410,102 @@ class BookingNote(models.Model):
         ordering = ['-created_at']
 
     def __str__(self):
-        return f"Note for Booking #{self.booking.id} - {self.created_at.strftime('%Y-%m-%d')}"
\ No newline at end of file
+        return f"Note for Booking #{self.booking.id} - {self.created_at.strftime('%Y-%m-%d')}"
+
+
+class Payment(models.Model):
+    """
+    One recorded payment (or correction) against a booking. Append-only:
+    the booking's paid_amount is the running total of its payments, see
+    bookings.payments.record_payment.
+    """
+    booking = models.ForeignKey(
+        Booking,
+        on_delete=models.CASCADE,
+        related_name='payments'
+    )
+    # Negative amounts are corrections / refunds
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    method = models.CharField(max_length=100, blank=True, null=True)
+    recorded_by = models.ForeignKey(
+        'users.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='recorded_payments'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Payment'
+        verbose_name_plural = 'Payments'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['booking', '-created_at', '-id'], name='payment_booking_created_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=~models.Q(amount=0), name='payment_amount_non_zero'),
+        ]
+
+    def __str__(self):
+        return f"Payment of {self.amount} for Booking #{self.booking_id}"
+
+
+class DailyBookingStats(models.Model):
+    """
+    Per agency / agent / day booking totals (day = booking created_at date).
+    Maintained transactionally on every booking write, so dashboard ranges are
+    answered from one row per day instead of scanning every booking.
+    """
+    agency = models.ForeignKey(
+        'agencies.Agency',
+        on_delete=models.CASCADE,
+        related_name='daily_booking_stats'
+    )
+    # Booking.created_by. Deleting a user drops their rows; their bookings
+    # are then re-bucketed under no agent (see bookings.signals).
+    agent = models.ForeignKey(
+        'users.User',
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='+'
+    )
+    day = models.DateField()
+
+    bookings_count = models.IntegerField(default=0)
+    sales_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    received_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    profit_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    # Booking status counts
+    pending_count = models.IntegerField(default=0)
+    confirmed_count = models.IntegerField(default=0)
+    rejected_count = models.IntegerField(default=0)
+
+    # Payment status counts
+    paid_count = models.IntegerField(default=0)
+    half_paid_count = models.IntegerField(default=0)
+    payment_pending_count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Daily Booking Stats'
+        verbose_name_plural = 'Daily Booking Stats'
+        ordering = ['-day']
+        constraints = [
+            # One bucket per (agency, agent, day); bookings without an agent share one
+            models.UniqueConstraint(
+                fields=['agency', 'agent', 'day'],
+                condition=models.Q(agent__isnull=False),
+                name='booking_stats_agent_day_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['agency', 'day'],
+                condition=models.Q(agent__isnull=True),
+                name='booking_stats_no_agent_day_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['agency', 'day'], name='booking_stats_agency_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.agency} - {self.day}"
@@ -0,0 +1,86 @@
+"""
+Recording payments against bookings.
+
+The booking row is locked for the duration of the write and the running
+balance is updated in SQL (F() + Case), so concurrent payments on the same
+booking serialize instead of overwriting each other. The client's summary
+totals are moved in the same transaction.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.lookups import Exact, GreaterThanOrEqual
+from django.utils import timezone
+
+from . import client_summary, rollups
+from .analytics_cache import bump_agency_version
+from .models import Booking, Payment
+
+
+class PaymentError(ValueError):
+    pass
+
+
+# Largest value Booking.paid_amount can hold (max_digits=10, decimal_places=2)
+MAX_PAID_AMOUNT = Decimal('99999999.99')
+
+
+def payment_status_expression(paid_amount, total_amount=F('total_amount')):
+    """SQL version of Booking.update_payment_status for UPDATE statements"""
+    return Case(
+        When(Exact(paid_amount, Decimal('0.00')), then=Value('PENDING')),
+        When(GreaterThanOrEqual(paid_amount, total_amount), then=Value('PAID')),
+        default=Value('HALF_PAID'),
+    )
+
+
+def opening_payments(bookings, recorded_by=None):
+    """Ledger rows for the amount new bookings were created with as already paid"""
+    return [
+        Payment(booking=booking, amount=booking.paid_amount, method=booking.payment_method, recorded_by=recorded_by)
+        for booking in bookings if booking.paid_amount
+    ]
+
+
+def record_payment(booking, amount=None, paid_amount=None, method=None, recorded_by=None):
+    """
+    Record a payment of `amount`, or the difference needed to bring the
+    booking's total paid to `paid_amount`, and refresh the payment fields of
+    `booking`. Returns the Payment, or None when the balance did not change.
+    """
+    booking_id = booking.pk
+    with transaction.atomic():
+        locked = Booking.objects.select_for_update().get(pk=booking_id)
+        if amount is None:
+            amount = paid_amount - locked.paid_amount
+        if locked.paid_amount + amount < 0:
+            raise PaymentError('Paid amount cannot be negative')
+        if locked.paid_amount + amount > MAX_PAID_AMOUNT:
+            raise PaymentError(f'Paid amount cannot exceed {MAX_PAID_AMOUNT}')
+
+        old_state = locked.rollup_state()
+        now = timezone.now()
+        payment = None
+        changes = {'last_payment_date': now, 'updated_at': now}
+        if method:
+            changes['payment_method'] = method
+        if amount:
+            payment = Payment.objects.create(
+                booking_id=booking_id, amount=amount, method=method, recorded_by=recorded_by
+            )
+            new_paid = F('paid_amount') + amount
+            changes.update(paid_amount=new_paid, payment_status=payment_status_expression(new_paid))
+        Booking.objects.filter(pk=booking_id).update(**changes)
+
+        booking.refresh_from_db(fields=[
+            'paid_amount', 'payment_status', 'payment_method', 'last_payment_date', 'updated_at'
+        ])
+        booking._rollup_state = booking.rollup_state()
+        rollups.record_change(old_state, booking._rollup_state)
+        if amount:
+            client_summary.apply_delta(locked.client_id, {'total_paid': amount})
+        booking._client_state = booking.client_summary_state()
+        agency_id = booking.agency_id
+        transaction.on_commit(lambda: bump_agency_version(agency_id))
+    return payment
@@ -0,0 +1,124 @@
+"""
+Maintenance of the DailyBookingStats rollup table.
+
+Single booking writes apply a signed delta to their (agency, agent, day)
+bucket; set-based writes (bulk create/update) recompute the affected buckets
+with `refresh_buckets`; `rebuild` recreates everything from raw bookings.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+
+from agencies.models import Agency
+
+from .analytics_cache import bump_agency_version
+from .models import Booking, DailyBookingStats
+
+# Aggregates over raw bookings, keyed by rollup column
+BUCKET_AGGREGATES = {
+    'bookings_count': Count('id'),
+    'sales_total': Sum('total_amount'),
+    'received_total': Sum('paid_amount'),
+    'profit_total': Sum('unit_profit'),
+    'pending_count': Count('id', filter=Q(booking_status='pending')),
+    'confirmed_count': Count('id', filter=Q(booking_status='confirmed')),
+    'rejected_count': Count('id', filter=Q(booking_status='rejected')),
+    'paid_count': Count('id', filter=Q(payment_status='PAID')),
+    'half_paid_count': Count('id', filter=Q(payment_status='HALF_PAID')),
+    'payment_pending_count': Count('id', filter=Q(payment_status='PENDING')),
+}
+
+
+def _bucket(key):
+    agency_id, agent_id, day = key
+    return DailyBookingStats.objects.filter(agency_id=agency_id, agent_id=agent_id, day=day)
+
+
+def apply_delta(key, values, sign=1):
+    """Add (sign=1) or remove (sign=-1) a booking's contribution to its bucket."""
+    changes = {field: F(field) + sign * value for field, value in values.items() if value}
+    if _bucket(key).update(**changes):
+        if sign < 0:
+            _bucket(key).filter(bookings_count__lte=0).delete()
+        return
+    if sign < 0:
+        # Nothing to subtract from: the bucket was never built, recompute it
+        refresh_buckets([key])
+        return
+    agency_id, agent_id, day = key
+    try:
+        with transaction.atomic():
+            DailyBookingStats.objects.create(agency_id=agency_id, agent_id=agent_id, day=day, **values)
+    except IntegrityError:
+        # Concurrent writer created the bucket first
+        _bucket(key).update(**changes)
+
+
+def record_change(old, new):
+    """Move a saved booking's contribution from its old state to its new state."""
+    if old == new:
+        return
+    if old is not None:
+        apply_delta(*old, sign=-1)
+    apply_delta(*new)
+
+
+def refresh_buckets(keys):
+    """Recompute the given (agency_id, agent_id, day) buckets from raw bookings."""
+    for key in set(keys):
+        agency_id, agent_id, day = key
+        totals = Booking.objects.filter(
+            agency_id=agency_id, created_by_id=agent_id, created_at__date=day
+        ).aggregate(**BUCKET_AGGREGATES)
+        with transaction.atomic():
+            if not totals['bookings_count']:
+                _bucket(key).delete()
+                continue
+            totals = {field: value or Decimal('0.00') for field, value in totals.items()}
+            DailyBookingStats.objects.update_or_create(
+                agency_id=agency_id, agent_id=agent_id, day=day, defaults=totals
+            )
+
+
+def buckets_for(bookings):
+    """Bucket keys touched by a booking queryset (one query)."""
+    rows = bookings.order_by().annotate(day=TruncDate('created_at')).values_list(
+        'agency_id', 'created_by_id', 'day'
+    ).distinct()
+    return list(rows)
+
+
+def rebuild(agency_id=None, batch_size=1000):
+    """Recreate the rollup table (optionally for one agency) from raw bookings."""
+    bookings = Booking.objects.all()
+    stats = DailyBookingStats.objects.all()
+    if agency_id is not None:
+        bookings = bookings.filter(agency_id=agency_id)
+        stats = stats.filter(agency_id=agency_id)
+
+    rows = bookings.order_by().annotate(day=TruncDate('created_at')).values(
+        'agency_id', 'created_by_id', 'day'
+    ).annotate(**BUCKET_AGGREGATES)
+
+    created = 0
+    with transaction.atomic():
+        stats.delete()
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(DailyBookingStats(
+                agency_id=row['agency_id'], agent_id=row['created_by_id'], day=row['day'],
+                **{field: row[field] or Decimal('0.00') for field in BUCKET_AGGREGATES}
+            ))
+            if len(batch) >= batch_size:
+                DailyBookingStats.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        DailyBookingStats.objects.bulk_create(batch)
+        created += len(batch)
+
+    agency_ids = [agency_id] if agency_id is not None else Agency.objects.values_list('id', flat=True)
+    for pk in agency_ids:
+        bump_agency_version(pk)
+    return created
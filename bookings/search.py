@@ -0,0 +1,56 @@
+"""
+Booking search by client and service name.
+"""
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Greatest
+
+from clients.models import Client
+from services.models import Service
+
+
+def _name_matches(field, term, fuzzy):
+    # icontains compiles to UPPER(col::text) LIKE UPPER(%term%) on PostgreSQL,
+    # which the UPPER(col::text) gin_trgm_ops indexes serve; trigram word
+    # similarity (%>) uses the plain-column trigram indexes
+    matches = Q(**{f'{field}__icontains': term})
+    if fuzzy:
+        matches |= Q(**{f'{field}__trigram_word_similar': term})
+    return matches
+
+
+def search_bookings(queryset, term, fuzzy=False, agency_id=None):
+    """
+    Filter bookings whose client name or service name matches `term`.
+
+    Returns (queryset, ordering). Matching clients and services are found
+    first, each through its own trigram index, and bookings are then
+    selected with `client_id IN (...) OR service_id IN (...)`, so neither
+    the bookings nor the joined tables are scanned. With `fuzzy=True` typos
+    and transliteration variants ("Muhammad" / "Mohammad") also match
+    through trigram word similarity, and results are ranked best match
+    first. `agency_id` narrows the subqueries to the agency's own clients
+    and services. Fuzzy mode is PostgreSQL only; other databases fall back
+    to the substring match.
+    """
+    fuzzy = fuzzy and connections[queryset.db].vendor == 'postgresql'
+    clients = Client.objects.filter(_name_matches('name', term, fuzzy))
+    services = Service.objects.filter(_name_matches('service_name', term, fuzzy))
+    if agency_id is not None:
+        clients = clients.filter(agency_id=agency_id)
+        services = services.filter(agency_id=agency_id)
+
+    queryset = queryset.filter(
+        Q(client_id__in=clients.values('id')) | Q(service_id__in=services.values('id'))
+    )
+    if not fuzzy:
+        return queryset, ['-created_at']
+
+    queryset = queryset.annotate(
+        search_rank=Greatest(
+            TrigramWordSimilarity(term, 'client__name'),
+            TrigramWordSimilarity(term, 'service__service_name'),
+        )
+    )
+    return queryset, ['-search_rank', '-created_at']
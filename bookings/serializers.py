@@ -149,7 +149,10 @@
 
 from rest_framework import serializers
 from decimal import Decimal
-from .models import Booking, BookingNote
+from django.db import transaction
+from .models import Booking, BookingNote, Payment
+from .bulk import BULK_MAX_ITEMS
+from .validation import booking_errors
 from clients.serializers import ClientSerializer
 from services.serializers import ServiceSerializer, ServiceAgentSerializer
 
@@ -163,6 +166,20 @@ class BookingNoteSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_by', 'created_at']
 
 
+class PaymentSerializer(serializers.ModelSerializer):
+    recorded_by_name = serializers.CharField(source='recorded_by.username', read_only=True)
+
+    class Meta:
+        model = Payment
+        fields = ['id', 'booking', 'amount', 'method', 'recorded_by', 'recorded_by_name', 'created_at']
+        read_only_fields = ['id', 'booking', 'recorded_by', 'created_at']
+
+    def validate_amount(self, value):
+        if value == 0:
+            raise serializers.ValidationError('Amount cannot be zero')
+        return value
+
+
 class BookingSerializer(serializers.ModelSerializer):
     client_details = ClientSerializer(source='client', read_only=True)
     service_details = ServiceSerializer(source='service', read_only=True)
@@ -177,16 +194,21 @@ class BookingSerializer(serializers.ModelSerializer):
         model = Booking
         fields = [
             'id', 'agency', 'client', 'client_details', 'service', 'service_details',
+            'unit_base_cost', 'unit_profit',
             'discount', 'booking_status', 'booking_status_display',
             'paid_amount', 'total_amount', 'remaining_amount',
             'payment_status', 'payment_status_display', 'payment_method', 'last_payment_date',
             'departure_date', 'arrival_date', 'notes',
             'created_by', 'created_by_name', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'agency', 'created_by', 'payment_status', 'created_at', 'updated_at']
+        read_only_fields = [
+            'id', 'agency', 'created_by', 'unit_base_cost', 'unit_profit',
+            'paid_amount', 'payment_status', 'created_at', 'updated_at'
+        ]
 
 
 class BookingCreateSerializer(serializers.ModelSerializer):
+    """`paid_amount` is the opening payment, recorded in the ledger by the view"""
     class Meta:
         model = Booking
         fields = [
@@ -198,85 +220,106 @@ class BookingCreateSerializer(serializers.ModelSerializer):
     def validate(self, data):
         """Validate discount rules + travel date logic"""
         service = data.get('service')
-        discount = data.get('discount', Decimal('0.00'))
-
-        # ensure Decimal type
-        if discount is None:
-            discount = Decimal('0.00')
-
-        if service and discount:
-            profit = service.service_profit or Decimal('0.00')
-            max_discount = profit * Decimal('0.50')
-
-            if discount > max_discount:
-                raise serializers.ValidationError({
-                    'discount': f'Discount cannot exceed 50% of profit (max: {max_discount})'
-                })
-
-            total_after_discount = service.service_total_price - discount
-            if total_after_discount < service.service_base_cost:
-                raise serializers.ValidationError({
-                    'discount': 'Discount cannot reduce price below base cost'
-                })
-
-        # ✅ TRAVEL LOGIC: Return date (arrival) must be AFTER travel date (departure)
-        departure_date = data.get('departure_date')
-        arrival_date = data.get('arrival_date')
-        
-        if departure_date and arrival_date:
-            if arrival_date < departure_date:
-                raise serializers.ValidationError({
-                    'arrival_date': 'Return date must be after travel date'
-                })
+        errors = booking_errors(
+            service.service_profit if service else Decimal('0.00'),
+            data.get('discount'),
+            data.get('paid_amount'),
+            data.get('departure_date'),
+            data.get('arrival_date'),
+        )
+        if errors:
+            raise serializers.ValidationError(errors)
+        return data
+
+
+class BookingBulkItemSerializer(BookingCreateSerializer):
+    """
+    One item of a bulk create. Client and service are plain ids, resolved
+    in one query each by bookings.bulk instead of one lookup per item.
+    """
+    client = serializers.IntegerField()
+    service = serializers.IntegerField()
+
+    def validate(self, data):
+        return data
 
+
+class BookingPaymentUpdateSerializer(serializers.Serializer):
+    """update_payment body: an instalment `amount` or the new total `paid_amount`"""
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    paid_amount = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=Decimal('0.00'), required=False
+    )
+    payment_method = serializers.CharField(max_length=100, required=False, allow_blank=True, allow_null=True)
+
+    def validate(self, data):
+        if 'amount' not in data and 'paid_amount' not in data:
+            raise serializers.ValidationError('amount or paid_amount is required')
+        if data.get('amount') == 0:
+            raise serializers.ValidationError({'amount': 'Amount cannot be zero'})
         return data
 
 
+class BookingBulkStatusSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=BULK_MAX_ITEMS)
+    booking_status = serializers.ChoiceField(choices=Booking.BOOKING_STATUS_CHOICES)
+
+
+class BookingBulkPaymentItemSerializer(serializers.Serializer):
+    booking = serializers.IntegerField()
+    # Omit to pay the remaining balance
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True)
+
+
+class BookingBulkPaymentSerializer(serializers.Serializer):
+    payments = BookingBulkPaymentItemSerializer(many=True, allow_empty=False, max_length=BULK_MAX_ITEMS)
+    payment_method = serializers.CharField(max_length=100, required=False, allow_blank=True)
+
+    def validate_payments(self, value):
+        bookings = [item['booking'] for item in value]
+        if len(bookings) != len(set(bookings)):
+            raise serializers.ValidationError('Each booking can only appear once')
+        return value
+
+
 class BookingUpdateSerializer(serializers.ModelSerializer):
+    """
+    Payments are not edited here: they go through the ledger
+    (POST /bookings/{id}/payments/ or update_payment), so paid_amount is refused.
+    """
     class Meta:
         model = Booking
         fields = [
-            'discount', 'booking_status', 'paid_amount', 'payment_method',
+            'discount', 'booking_status', 'payment_method',
             'last_payment_date', 'departure_date', 'arrival_date'
         ]
 
     def validate(self, data):
         """Validate discount rules on update + travel date logic"""
+        if 'paid_amount' in self.initial_data:
+            raise serializers.ValidationError({
+                'paid_amount': 'Record payments through the payments endpoint instead'
+            })
         instance = self.instance
-        service = instance.service
-        discount = data.get('discount', instance.discount)
-
-        # ensure Decimal type
-        if discount is None:
-            discount = Decimal('0.00')
-
-        if discount:
-            profit = service.service_profit or Decimal('0.00')
-            max_discount = profit * Decimal('0.50')
-
-            if discount > max_discount:
-                raise serializers.ValidationError({
-                    'discount': f'Discount cannot exceed 50% of profit (max: {max_discount})'
-                })
-
-            total_after_discount = service.service_total_price - discount
-            if total_after_discount < service.service_base_cost:
-                raise serializers.ValidationError({
-                    'discount': 'Discount cannot reduce price below base cost'
-                })
-
-        # ✅ TRAVEL LOGIC: Return date (arrival) must be AFTER travel date (departure)
-        departure_date = data.get('departure_date', instance.departure_date)
-        arrival_date = data.get('arrival_date', instance.arrival_date)
-        
-        if departure_date and arrival_date:
-            if arrival_date < departure_date:
-                raise serializers.ValidationError({
-                    'arrival_date': 'Return date must be after travel date'
-                })
-
+        # Validate against the booking's price snapshot, not the live service
+        errors = booking_errors(
+            instance.unit_profit,
+            data.get('discount', instance.discount),
+            None,
+            data.get('departure_date', instance.departure_date),
+            data.get('arrival_date', instance.arrival_date),
+        )
+        if errors:
+            raise serializers.ValidationError(errors)
         return data
 
+    def update(self, instance, validated_data):
+        # Write over the locked, current row: a payment recorded since
+        # `instance` was read must not be overwritten by its stale paid_amount
+        with transaction.atomic():
+            locked = Booking.objects.select_for_update().get(pk=instance.pk)
+            return super().update(locked, validated_data)
+
 
 class BookingAgentSerializer(serializers.ModelSerializer):
     """Serializer for agents with limited service details"""
@@ -291,9 +334,10 @@ class BookingAgentSerializer(serializers.ModelSerializer):
         model = Booking
         fields = [
             'id', 'client', 'client_details', 'service', 'service_details',
+            'unit_base_cost', 'unit_profit',
             'discount', 'booking_status', 'booking_status_display',
             'paid_amount', 'total_amount', 'remaining_amount',
             'payment_status', 'payment_status_display', 'payment_method', 'last_payment_date',
             'departure_date', 'arrival_date', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'payment_status', 'created_at', 'updated_at']
\ No newline at end of file
+        read_only_fields = ['id', 'unit_base_cost', 'unit_profit', 'payment_status', 'created_at', 'updated_at']
\ No newline at end of file
@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from clients.models import Client
+from services.models import Service
+
+from . import client_summary, rollups
+from .analytics_cache import bump_agency_version
+from .models import Booking, DailyBookingStats
+
+
+@receiver(pre_save, sender=Booking)
+def load_rollup_state(sender, instance, raw, **kwargs):
+    """Instances not loaded through the ORM don't know what the rollup holds for them"""
+    if raw or instance._state.adding or (
+        getattr(instance, '_rollup_state', None) and getattr(instance, '_client_state', None)
+    ):
+        return
+    stored = Booking.objects.filter(pk=instance.pk).first()
+    instance._rollup_state = stored.rollup_state() if stored else None
+    instance._client_state = stored.client_summary_state() if stored else None
+
+
+@receiver(post_save, sender=Booking)
+def update_daily_stats_on_save(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    new_state = instance.rollup_state()
+    rollups.record_change(None if created else instance._rollup_state, new_state)
+    instance._rollup_state = new_state
+
+
+@receiver(post_save, sender=Booking)
+def update_client_summary_on_save(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    new_state = instance.client_summary_state()
+    client_summary.record_change(None if created else instance._client_state, new_state)
+    instance._client_state = new_state
+
+
+@receiver(post_delete, sender=Booking)
+def update_daily_stats_on_delete(sender, instance, **kwargs):
+    state = getattr(instance, '_rollup_state', None) or instance.rollup_state()
+    rollups.apply_delta(*state, sign=-1)
+
+
+@receiver(post_delete, sender=Booking)
+def update_client_summary_on_delete(sender, instance, **kwargs):
+    client_summary.refresh_clients([instance.client_id])
+
+
+@receiver(pre_delete, sender=get_user_model())
+def remember_agent_stats(sender, instance, **kwargs):
+    instance._stats_days = list(
+        DailyBookingStats.objects.filter(agent=instance).values_list('agency_id', 'day')
+    )
+
+
+@receiver(post_delete, sender=get_user_model())
+def rebucket_agent_stats(sender, instance, **kwargs):
+    """The deleted user's bookings now have no agent; fold them into those buckets"""
+    rollups.refresh_buckets([(agency_id, None, day) for agency_id, day in instance._stats_days])
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def invalidate_analytics_cache(sender, instance, **kwargs):
+    """Bump the agency's analytics version once the write is visible to readers"""
+    agency_id = instance.agency_id
+    if agency_id:
+        transaction.on_commit(lambda: bump_agency_version(agency_id), using=kwargs.get('using'))
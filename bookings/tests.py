@@ -1,3 +1,773 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import statistics
+import threading
+import time
+import tracemalloc
+import zipfile
+from decimal import Decimal
+from unittest import skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import F, Q, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from agencies.models import Agency
+from clients.models import Client, ClientNote
+from services.models import Service
+from users.models import User
+from . import client_summary, rollups
+from .analytics_cache import bump_agency_version, cached_analytics
+from .bulk import bulk_create_bookings, bulk_record_payments
+from .models import Booking, BookingNote, DailyBookingStats, Payment
+from .payments import record_payment
+from .search import search_bookings
+
+
+class BookingTestMixin:
+    """Shared fixtures: one agency with an owner, an agent and a service."""
+
+    def setUp(self):
+        cache.clear()
+        self.agency = Agency.objects.create(name='Test Agency')
+        self.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='pass',
+            agency=self.agency, role='agency_owner'
+        )
+        self.agent = User.objects.create_user(
+            username='agent', email='agent@example.com', password='pass',
+            agency=self.agency, role='agent'
+        )
+        self.service = Service.objects.create(
+            agency=self.agency, service_name='Umrah Package', service_include=[],
+            service_base_cost=Decimal('1000.00'), service_profit=Decimal('200.00'),
+            service_duration='10 days', destination='Makkah'
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.owner)
+
+    def make_booking(self, created_by=None, notes=2, **kwargs):
+        created_by = created_by or self.owner
+        client = Client.objects.create(
+            agency=self.agency, name='Client', phone_number='03001234567', created_by=created_by
+        )
+        for i in range(notes):
+            ClientNote.objects.create(client=client, note=f'client note {i}', created_by=created_by)
+        booking = Booking.objects.create(
+            agency=self.agency, client=client, service=self.service, created_by=created_by, **kwargs
+        )
+        for i in range(notes):
+            BookingNote.objects.create(booking=booking, note=f'booking note {i}', created_by=created_by)
+        return booking
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+
+class BookingQueryBudgetTests(BookingTestMixin, TestCase):
+    def test_list_query_count_is_flat(self):
+        self.make_booking()
+        self.make_booking()
+        small = self.count_queries('/api/bookings/')
+        for _ in range(5):
+            self.make_booking(notes=4)
+        self.assertEqual(self.count_queries('/api/bookings/'), small)
+
+    def test_agent_list_query_count_is_flat(self):
+        self.api.force_authenticate(self.agent)
+        self.make_booking(created_by=self.agent)
+        small = self.count_queries('/api/bookings/')
+        for _ in range(5):
+            self.make_booking(created_by=self.agent, notes=4)
+        self.assertEqual(self.count_queries('/api/bookings/'), small)
+
+    def test_onboard_list_query_count_is_flat(self):
+        self.make_booking(booking_status='confirmed')
+        small = self.count_queries('/api/onboard/')
+        for _ in range(5):
+            self.make_booking(booking_status='confirmed', notes=4)
+        self.assertEqual(self.count_queries('/api/onboard/'), small)
+
+    def test_retrieve_query_count_does_not_depend_on_notes(self):
+        few = self.make_booking(notes=1)
+        many = self.make_booking(notes=10)
+        self.assertEqual(
+            self.count_queries(f'/api/bookings/{many.id}/'),
+            self.count_queries(f'/api/bookings/{few.id}/'),
+        )
+
+    def test_nested_notes_are_serialized(self):
+        booking = self.make_booking(notes=3)
+        data = self.api.get(f'/api/bookings/{booking.id}/').json()
+        self.assertEqual(len(data['notes']), 3)
+        self.assertEqual(len(data['client_details']['notes']), 3)
+        self.assertEqual(data['notes'][0]['created_by_name'], 'owner')
+
+
+class AnalyticsQueryTests(BookingTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(6):
+            self.make_booking(
+                created_by=self.agent if i % 2 else self.owner, notes=0,
+                discount=Decimal(i * 10), paid_amount=Decimal([0, 50, 2000][i % 3]),
+                booking_status=['pending', 'confirmed', 'rejected'][i % 3],
+            )
+
+    def test_analytics_query_count(self):
+        # rollup grouped by agent + distinct clients per agent + distinct clients overall
+        with self.assertNumQueries(3):
+            response = self.api.get('/api/analytics/?range=this_month')
+        data = response.json()
+        self.assertEqual(data['total_bookings'], 6)
+        self.assertEqual(data['total_customers'], 6)
+        self.assertEqual(data['payment_breakdown'], {'paid': 2, 'half_paid': 2, 'pending': 2})
+        self.assertEqual(data['booking_status_breakdown'], {'pending': 2, 'confirmed': 2, 'rejected': 2})
+        self.assertEqual(Decimal(data['amounts']['total_sales']), Decimal('7050'))
+        self.assertEqual(Decimal(data['amounts']['total_received']), Decimal('4100'))
+        self.assertEqual(Decimal(data['amounts']['total_profit']), Decimal('1200'))
+        self.assertCountEqual(data['agent_bookings_tracker'], [
+            {'created_by__username': 'owner', 'count': 3},
+            {'created_by__username': 'agent', 'count': 3},
+        ])
+
+    def test_lifetime_customers_come_from_the_client_summary(self):
+        Client.objects.create(agency=self.agency, name='No bookings yet', phone_number='0300')
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.api.get('/api/analytics/').json()
+        self.assertEqual(data['total_customers'], 6)
+        # rollup grouped by agent, distinct clients per agent, clients with bookings
+        self.assertEqual(len(ctx.captured_queries), 3)
+        self.assertIn('"clients_client"', ctx.captured_queries[-1]['sql'])
+        self.assertNotIn('"bookings_booking"', ctx.captured_queries[-1]['sql'])
+
+    def test_agent_analytics_only_counts_own_bookings(self):
+        self.api.force_authenticate(self.agent)
+        with self.assertNumQueries(2):
+            data = self.api.get('/api/analytics/').json()
+        self.assertEqual(data['total_bookings'], 3)
+        self.assertEqual(data['agent_customers_tracker'], [{'created_by__username': 'agent', 'unique_clients': 3}])
+
+    def test_analytics_is_cached_until_a_write(self):
+        url = '/api/analytics/?range=this_month'
+        self.assertEqual(self.api.get(url)['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.api.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.json()['total_bookings'], 6)
+
+        # Agents get their own entry
+        self.api.force_authenticate(self.agent)
+        self.assertEqual(self.api.get(url)['X-Cache'], 'MISS')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_booking(notes=0)
+        self.api.force_authenticate(self.owner)
+        response = self.api.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['total_bookings'], 7)
+
+        stats = self.api.get('/api/analytics/cache-stats/').json()
+        self.assertEqual(stats, {'hit': 1, 'miss': 3, 'stale': 0})
+
+    @override_settings(ANALYTICS_CACHE_WAIT_SECONDS=0.1, ANALYTICS_CACHE_STALE_SECONDS=30)
+    def test_single_flight_lock_only_released_by_its_owner(self):
+        lock_key = f'analytics:{self.agency.id}:scope:lock'
+        self.assertEqual(cached_analytics(self.agency.id, 'scope', lambda: 1), (1, 'MISS'))
+        self.assertIsNone(cache.get(lock_key))
+
+        # Another request holds the lock: the previous response is served meanwhile
+        bump_agency_version(self.agency.id)
+        cache.set(lock_key, 'other-request', 10)
+        self.assertEqual(cached_analytics(self.agency.id, 'scope', lambda: 2), (1, 'STALE'))
+
+        # Without a stale entry the waiter gives up quickly, computes, and leaves the lock alone
+        cache.set(f'analytics:{self.agency.id}:other:lock', 'other-request', 10)
+        started = time.monotonic()
+        self.assertEqual(cached_analytics(self.agency.id, 'other', lambda: 4), (4, 'MISS'))
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(cache.get(f'analytics:{self.agency.id}:other:lock'), 'other-request')
+
+    def test_dates_summary_is_one_query(self):
+        with self.assertNumQueries(1):
+            data = self.api.get('/api/bookings/dates_summary/').json()
+        self.assertEqual(data, {'missing_any': 6, 'missing_arrival': 6, 'missing_departure': 6})
+
+
+class DailyBookingStatsTests(BookingTestMixin, TestCase):
+    def snapshot(self):
+        return list(DailyBookingStats.objects.order_by('agent_id', 'day').values_list(
+            'agency_id', 'agent_id', 'day', *rollups.BUCKET_AGGREGATES
+        ))
+
+    def test_incremental_rollup_matches_rebuild(self):
+        first = self.make_booking(notes=0)
+        second = self.make_booking(created_by=self.agent, notes=0, discount=Decimal('50.00'))
+        self.make_booking(notes=0, booking_status='confirmed')
+
+        first.paid_amount = Decimal('500.00')
+        first.booking_status = 'confirmed'
+        first.save()
+        self.api.post(f'/api/bookings/{second.id}/update_payment/', {'paid_amount': '1150.00'})
+        second.client.delete()
+
+        incremental = self.snapshot()
+        rollups.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_deleting_agent_moves_stats_to_no_agent_bucket(self):
+        self.make_booking(notes=0)
+        self.make_booking(created_by=self.agent, notes=0)
+        self.make_booking(created_by=self.agent, notes=0)
+        self.agent.delete()
+
+        incremental = self.snapshot()
+        rollups.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+        self.assertEqual(DailyBookingStats.objects.get(agent__isnull=True).bookings_count, 2)
+
+
+class PaymentLedgerTests(BookingTestMixin, TestCase):
+    def test_payments_accumulate_and_are_listed(self):
+        booking = self.make_booking(notes=0)  # total 1200
+        url = f'/api/bookings/{booking.id}/payments/'
+        self.assertEqual(self.api.post(url, {'amount': '500.00', 'method': 'cash'}).status_code, 201)
+        response = self.api.post(f'/api/bookings/{booking.id}/update_payment/', {'amount': '300.00'})
+        self.assertEqual(response.json()['payment_status'], 'HALF_PAID')
+        # Setting the total records the difference
+        response = self.api.post(f'/api/bookings/{booking.id}/update_payment/', {'paid_amount': '1200.00'})
+        self.assertEqual(response.json()['payment_status'], 'PAID')
+
+        booking.refresh_from_db()
+        self.assertEqual(booking.paid_amount, Decimal('1200.00'))
+        amounts = [p['amount'] for p in self.api.get(f'{url}?pagination=cursor').json()['results']]
+        self.assertEqual(amounts, ['400.00', '300.00', '500.00'])
+        self.assertEqual(DailyBookingStats.objects.get().received_total, Decimal('1200.00'))
+
+        response = self.api.post(url, {'amount': '-1300.00'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_update_payment_rejects_amounts_the_ledger_cannot_store(self):
+        booking = self.make_booking(notes=0)
+        url = f'/api/bookings/{booking.id}/update_payment/'
+        for body in [
+            {},
+            {'amount': '0.001'},  # would round to a zero payment
+            {'amount': '0'},
+            {'amount': 'abc'},
+            {'amount': '123456789.00'},
+            {'paid_amount': '-1.00'},
+            {'paid_amount': '1.005'},
+        ]:
+            with self.subTest(body=body):
+                self.assertEqual(self.api.post(url, body).status_code, 400)
+
+        self.api.post(url, {'amount': '99999000.00'})
+        response = self.api.post(url, {'amount': '1000.00'})  # paid total would overflow the column
+        self.assertEqual(response.status_code, 400)
+        booking.refresh_from_db()
+        self.assertEqual(booking.paid_amount, Decimal('99999000.00'))
+        self.assertEqual(booking.payments.count(), 1)
+
+    def test_paid_amount_only_changes_through_the_ledger(self):
+        client = Client.objects.create(agency=self.agency, name='Client', phone_number='0300', created_by=self.owner)
+        response = self.api.post('/api/bookings/', {
+            'client': client.id, 'service': self.service.id, 'paid_amount': '300.00', 'payment_method': 'cash',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        booking = Booking.objects.get()
+        self.assertEqual(list(booking.payments.values_list('amount', 'method')), [(Decimal('300.00'), 'cash')])
+
+        url = f'/api/bookings/{booking.id}/'
+        response = self.api.patch(url, {'paid_amount': '1200.00'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('paid_amount', response.json())
+        self.assertEqual(self.api.patch(url, {'discount': '50.00'}, format='json').status_code, 200)
+
+        booking.refresh_from_db()
+        ledger = booking.payments.aggregate(total=Sum('amount'))['total']
+        self.assertEqual((booking.paid_amount, ledger), (Decimal('300.00'), Decimal('300.00')))
+        self.assertEqual(booking.total_amount, Decimal('1150.00'))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'row locks need a concurrent database')
+class PaymentConcurrencyTests(BookingTestMixin, TransactionTestCase):
+    def test_concurrent_payments_all_count(self):
+        booking = self.make_booking(notes=0)
+        barrier = threading.Barrier(50)
+        errors = []
+
+        def pay():
+            api = APIClient()
+            api.force_authenticate(self.owner)
+            try:
+                barrier.wait()
+                response = api.post(f'/api/bookings/{booking.id}/payments/', {'amount': '10.00'})
+                if response.status_code != 201:
+                    errors.append(response.content)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=pay) for _ in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        booking.refresh_from_db()
+        self.assertEqual(booking.paid_amount, Decimal('500.00'))
+        self.assertEqual(booking.payment_status, 'HALF_PAID')
+        self.assertEqual(Payment.objects.filter(booking=booking).aggregate(total=Sum('amount'))['total'], Decimal('500.00'))
+        self.assertEqual(DailyBookingStats.objects.get().received_total, Decimal('500.00'))
+
+
+class BookingBulkCreateTests(BookingTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.clients = [
+            Client.objects.create(agency=self.agency, name=f'Pilgrim {i}', phone_number='0300', created_by=self.owner)
+            for i in range(3)
+        ]
+
+    def test_bulk_create_is_set_based(self):
+        items = [
+            {'client': self.clients[i % 3].id, 'service': self.service.id, 'paid_amount': '100.00'}
+            for i in range(500)
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.post('/api/bookings/bulk_create/', items, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['created'], 500)
+        # One lookup each for clients and services; the rest are batched writes
+        selects = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 2)
+        self.assertLess(len(ctx.captured_queries), 25)
+
+        self.assertEqual(Booking.objects.filter(payment_status='HALF_PAID', total_amount=1200).count(), 500)
+        self.assertEqual(Payment.objects.count(), 500)
+        stats = DailyBookingStats.objects.get()
+        self.assertEqual((stats.bookings_count, stats.received_total), (500, Decimal('50000.00')))
+
+    def test_errors_are_reported_per_item_and_nothing_is_created(self):
+        other_agency = Agency.objects.create(name='Other')
+        foreign = Client.objects.create(agency=other_agency, name='Foreign', phone_number='0300')
+        items = [
+            {'client': self.clients[0].id, 'service': self.service.id},
+            {'client': foreign.id, 'service': self.service.id, 'discount': '150.00'},
+            {'client': self.clients[1].id, 'service': self.service.id},
+        ]
+        response = self.api.post('/api/bookings/bulk_create/', items, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([set(e) for e in response.json()['errors']], [set(), {'client', 'discount'}, set()])
+        self.assertFalse(Booking.objects.exists())
+
+
+class BookingBulkUpdateTests(BookingTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.own = [self.make_booking(notes=0) for _ in range(3)]
+        self.agents = [self.make_booking(created_by=self.agent, notes=0) for _ in range(2)]
+
+    def assertRollupsMatchRebuild(self):
+        incremental = list(DailyBookingStats.objects.order_by('agent_id').values_list(*rollups.BUCKET_AGGREGATES))
+        rollups.rebuild()
+        self.assertEqual(incremental, list(DailyBookingStats.objects.order_by('agent_id').values_list(*rollups.BUCKET_AGGREGATES)))
+
+    def test_bulk_status_is_scoped_for_agents(self):
+        self.api.force_authenticate(self.agent)
+        ids = [b.id for b in self.own + self.agents]
+        response = self.api.post('/api/bookings/bulk_update_status/', {'ids': ids, 'booking_status': 'confirmed'}, format='json')
+        summary = response.json()
+        self.assertEqual((summary['matched'], summary['updated']), (2, 2))
+        self.assertEqual(summary['not_found'], sorted(b.id for b in self.own))
+        self.assertEqual(Booking.objects.filter(booking_status='confirmed').count(), 2)
+        self.assertRollupsMatchRebuild()
+
+    def test_bulk_payment_recomputes_status_in_sql(self):
+        payments = [
+            {'booking': self.own[0].id, 'amount': '500.00'},
+            {'booking': self.own[1].id},  # settle the balance
+            {'booking': self.agents[0].id, 'amount': '1200.00'},
+        ]
+        response = self.api.post('/api/bookings/bulk_update_payment/', {'payments': payments, 'payment_method': 'bank'}, format='json')
+        summary = response.json()
+        self.assertEqual(summary['updated'], 3)
+        self.assertEqual(Decimal(summary['total_recorded']), Decimal('2900.00'))
+        self.assertEqual(summary['payment_status'], {'HALF_PAID': 1, 'PAID': 2})
+        self.assertEqual(Payment.objects.filter(method='bank').count(), 3)
+        self.assertRollupsMatchRebuild()
+
+        response = self.api.post('/api/bookings/bulk_update_payment/', {
+            'payments': [{'booking': self.own[0].id, 'amount': '-600.00'}, {'booking': 0}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {str(self.own[0].id), '0'})
+
+    def test_bulk_settle_never_refunds_overpaid_bookings(self):
+        overpaid, paid_up = self.own[0], self.own[1]
+        bulk_record_payments(Booking.objects.all(), {overpaid.id: Decimal('1300.00'), paid_up.id: None})
+        summary, errors = bulk_record_payments(Booking.objects.all(), {overpaid.id: None, paid_up.id: None})
+        self.assertEqual(errors, {})
+        self.assertEqual((summary['matched'], summary['updated']), (2, 0))
+        overpaid.refresh_from_db()
+        self.assertEqual(overpaid.paid_amount, Decimal('1300.00'))
+        self.assertFalse(Payment.objects.filter(amount__lt=0).exists())
+
+
+class ClientSummaryTests(BookingTestMixin, TestCase):
+    SUMMARY_FIELDS = ['bookings_count', 'total_billed', 'total_paid', 'outstanding', 'last_booking_at']
+
+    def summaries(self):
+        return list(Client.objects.order_by('id').values_list(*self.SUMMARY_FIELDS))
+
+    def assertSummariesMatchRebuild(self):
+        incremental = self.summaries()
+        client_summary.rebuild()
+        self.assertEqual(incremental, self.summaries())
+
+    def test_booking_and_payment_writes_keep_summary_in_step(self):
+        booking = self.make_booking(notes=0, paid_amount=Decimal('200.00'))
+        client = Client.objects.get(pk=booking.client_id)
+        self.assertEqual(
+            (client.bookings_count, client.total_billed, client.outstanding, client.last_booking_at),
+            (1, Decimal('1200.00'), Decimal('1000.00'), booking.created_at),
+        )
+
+        booking.discount = Decimal('50.00')
+        booking.save()
+        record_payment(booking, amount=Decimal('300.00'))
+        self.assertSummariesMatchRebuild()
+        client.refresh_from_db()
+        self.assertEqual((client.total_paid, client.outstanding), (Decimal('500.00'), Decimal('650.00')))
+
+        # Moving the booking to another client moves its totals
+        other = Client.objects.create(agency=self.agency, name='Other', phone_number='0311')
+        booking.client = other
+        booking.save()
+        self.assertSummariesMatchRebuild()
+        self.assertEqual(Client.objects.get(pk=client.pk).bookings_count, 0)
+
+        booking.delete()
+        self.assertSummariesMatchRebuild()
+        self.assertEqual(Client.objects.get(pk=other.pk).outstanding, Decimal('0.00'))
+
+    def test_bulk_writes_keep_summary_in_step(self):
+        clients = [Client.objects.create(agency=self.agency, name=f'Pilgrim {i}', phone_number='0300') for i in range(2)]
+        bookings, errors = bulk_create_bookings([
+            {'client': clients[i % 2].id, 'service': self.service.id, 'paid_amount': Decimal('100.00')}
+            for i in range(5)
+        ], self.agency, self.owner)
+        self.assertFalse(any(errors))
+        self.assertSummariesMatchRebuild()
+
+        bulk_record_payments(Booking.objects.all(), {booking.id: None for booking in bookings[:3]})
+        self.assertSummariesMatchRebuild()
+        self.assertEqual(
+            [(c.bookings_count, c.outstanding) for c in Client.objects.order_by('id')],
+            [(3, Decimal('1100.00')), (2, Decimal('1100.00'))],
+        )
+
+
+class BookingKeysetPaginationTests(BookingTestMixin, TestCase):
+    def walk(self, url, params):
+        pages = [self.api.get(url, params).json()]
+        while pages[-1]['next']:
+            pages.append(self.api.get(pages[-1]['next']).json())
+        return pages
+
+    def ids(self, page):
+        return [row['id'] for row in page['results']]
+
+    def assertCursorMatchesPageNumbers(self, url, expected, params=None):
+        pages = self.walk(url, {**(params or {}), 'pagination': 'cursor'})
+        self.assertEqual([pk for page in pages for pk in self.ids(page)], expected)
+        numbered = [self.api.get(url, {**(params or {}), 'page': n}).json() for n in range(1, len(pages) + 1)]
+        self.assertEqual([self.ids(page) for page in numbered], [self.ids(page) for page in pages])
+
+        back = self.api.get(pages[-1]['previous']).json()
+        self.assertEqual(self.ids(back), self.ids(pages[-2]))
+
+    def test_booking_list_pages_through_ties(self):
+        bookings = [self.make_booking(notes=0) for _ in range(25)]
+        # Several bookings share each creation time
+        for i, booking in enumerate(bookings):
+            Booking.objects.filter(pk=booking.pk).update(created_at=bookings[i // 5 * 5].created_at)
+        expected = list(Booking.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertCursorMatchesPageNumbers('/api/bookings/', expected)
+
+    def test_onboard_puts_bookings_without_return_date_last(self):
+        for i in range(25):
+            self.make_booking(
+                notes=0, booking_status='confirmed',
+                arrival_date=None if i % 4 == 0 else f'2026-07-{i % 3 + 1:02d}',
+            )
+        expected = list(
+            Booking.objects.order_by(F('arrival_date').asc(nulls_last=True), 'id').values_list('id', flat=True)
+        )
+        self.assertEqual(Booking.objects.filter(pk__in=expected[-7:], arrival_date__isnull=True).count(), 7)
+        self.assertCursorMatchesPageNumbers('/api/onboard/', expected)
+
+
+class BookingExportTests(BookingTestMixin, TestCase):
+    def add_bookings(self, count):
+        client = Client.objects.create(agency=self.agency, name='Exported, "Client"', phone_number='0300', created_by=self.owner)
+        Booking.objects.bulk_create([
+            Booking(agency=self.agency, client=client, service=self.service, created_by=self.owner,
+                    unit_base_cost=1000, unit_profit=200, total_amount=1200, paid_amount=i % 1200,
+                    booking_status='confirmed' if i % 2 else 'pending')
+            for i in range(count)
+        ], batch_size=500)
+
+    def export_peak(self, url):
+        response = self.api.get(url)
+        self.assertEqual(response.status_code, 200)
+        tracemalloc.start()
+        size = sum(len(chunk) for chunk in response.streaming_content)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return size, peak
+
+    def test_csv_export_applies_list_filters(self):
+        self.add_bookings(4)
+        response = self.api.get('/api/bookings/export/?booking_status=confirmed')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0][:3], ['Booking ID', 'Booked At', 'Client'])
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1][2], 'Exported, "Client"')
+
+        response = self.api.get('/api/onboard/export/')
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 3)
+        response = self.api.get('/api/clients/export/?search=Exported')
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 2)
+
+    def test_xlsx_export_is_a_valid_workbook(self):
+        self.add_bookings(3)
+        response = self.api.get('/api/bookings/export/?file_type=xlsx')
+        workbook = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        sheet = workbook.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 4)
+        self.assertIn('<t>Exported, "Client"</t>', sheet)
+
+    def test_csv_quotes_formula_like_text_but_not_phone_numbers(self):
+        for name in ['=HYPERLINK("http://x.test")', '-1+cmd|calc', '+92 300-1234567']:
+            client = Client.objects.create(agency=self.agency, name=name, created_by=self.owner)
+            Booking.objects.create(agency=self.agency, client=client, service=self.service, created_by=self.owner)
+        response = self.api.get('/api/bookings/export/')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertCountEqual(
+            [row[2] for row in rows[1:]],
+            ['\'=HYPERLINK("http://x.test")', "'-1+cmd|calc", '+92 300-1234567'],
+        )
+
+        # Inline strings are never evaluated: XLSX text is kept as entered,
+        # minus control characters XML cannot hold
+        Client.objects.filter(name='+92 300-1234567').update(name='Ali\x01 Khan')
+        response = self.api.get('/api/bookings/export/?file_type=xlsx')
+        workbook = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        sheet = workbook.read('xl/worksheets/sheet1.xml').decode()
+        self.assertIn('<t>=HYPERLINK("http://x.test")</t>', sheet)
+        self.assertIn('<t>Ali Khan</t>', sheet)
+
+    def test_export_memory_does_not_grow_with_rows(self):
+        # Python heap peak while streaming (tracemalloc): it is bounded by the
+        # iterator chunk size, so a 5x larger export needs about the same peak
+        self.add_bookings(4000)
+        small_size, small_peak = self.export_peak('/api/bookings/export/?search=Exported')
+        self.add_bookings(16000)
+        large_size, large_peak = self.export_peak('/api/bookings/export/?search=Exported')
+        self.assertGreater(large_size, 4 * small_size)
+        self.assertLess(large_peak, 1.5 * small_peak)
+
+
+class BookingSearchTests(BookingTestMixin, TestCase):
+    def test_search_matches_client_or_service_name_substrings(self):
+        booking = self.make_booking(notes=0)
+        booking.client.name = 'Bilal Qureshi'
+        booking.client.save()
+        other = Agency.objects.create(name='Other Agency')
+        Booking.objects.create(
+            agency=other, created_by=self.owner, service=self.service,
+            client=Client.objects.create(agency=other, name='Ali Qureshi'),
+        )
+        for term in ['qureSHI', 'umrah pack']:
+            with self.subTest(term=term):
+                response = self.api.get('/api/bookings/', {'search': term})
+                self.assertEqual([row['id'] for row in response.json()['results']], [booking.id])
+        self.assertEqual(self.api.get('/api/bookings/', {'search': 'Makkah'}).json()['results'], [])
+
+
+class BookingPricingSnapshotTests(BookingTestMixin, TestCase):
+    def test_service_price_changes_only_reach_new_bookings(self):
+        booking = self.make_booking(notes=0, discount=Decimal('80.00'))
+        self.service.service_base_cost = Decimal('1500.00')
+        self.service.service_profit = Decimal('100.00')
+        self.service.save()
+
+        # Existing bookings keep their price, and their discount cap (50% of the old profit)
+        booking.booking_status = 'confirmed'
+        booking.save()
+        response = self.api.patch(f'/api/bookings/{booking.id}/', {'discount': '90.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        booking.refresh_from_db()
+        self.assertEqual(
+            (booking.unit_base_cost, booking.unit_profit, booking.total_amount),
+            (Decimal('1000.00'), Decimal('200.00'), Decimal('1110.00')),
+        )
+
+        # New bookings capture the new price and are capped by the new profit
+        response = self.api.post('/api/bookings/', {
+            'client': booking.client_id, 'service': self.service.id, 'discount': '60.00',
+        }, format='json')
+        self.assertEqual(set(response.json()), {'discount'})
+        response = self.api.post('/api/bookings/', {
+            'client': booking.client_id, 'service': self.service.id, 'discount': '50.00',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        created = Booking.objects.latest('id')
+        self.assertEqual(
+            (created.unit_base_cost, created.unit_profit, created.total_amount),
+            (Decimal('1500.00'), Decimal('100.00'), Decimal('1550.00')),
+        )
+
+
+class BookingConstraintTests(BookingTestMixin, TestCase):
+    def test_save_runs_no_validation_selects(self):
+        booking = self.make_booking(notes=0)
+        booking.booking_status = 'confirmed'
+        with CaptureQueriesContext(connection) as ctx:
+            booking.save()
+        # Only the UPDATE itself plus the rollup delta writes
+        self.assertFalse([q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT')])
+
+    def test_database_rejects_invalid_bookings(self):
+        invalid = [
+            {'discount': Decimal('150.00')},  # profit is 200
+            {'paid_amount': Decimal('-1.00')},
+            {'departure_date': '2026-05-10', 'arrival_date': '2026-05-01'},
+        ]
+        for values in invalid:
+            with self.subTest(values=values), self.assertRaises(IntegrityError), transaction.atomic():
+                self.make_booking(notes=0, **values)
+
+    def test_serializer_reports_rule_violations(self):
+        client = Client.objects.create(agency=self.agency, name='Client', phone_number='0300', created_by=self.owner)
+        response = self.api.post('/api/bookings/', {
+            'client': client.id, 'service': self.service.id, 'discount': '150.00',
+            'departure_date': '2026-05-10', 'arrival_date': '2026-05-01',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'discount', 'arrival_date'})
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN plans are PostgreSQL specific')
+class BookingIndexPlanTests(BookingTestMixin, TestCase):
+    """Hot-path queries must stay on the tenant indexes, never a sequential scan."""
+
+    def assertIndexed(self, queryset, table):
+        with connection.cursor() as cursor:
+            # Tiny test tables would otherwise always be scanned sequentially;
+            # with seqscan disabled the planner only picks one if no index fits.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+        self.assertNotIn(f'Seq Scan on {table}', plan, plan)
+
+    def test_booking_hot_paths_use_indexes(self):
+        self.make_booking(notes=0)
+        bookings = Booking.objects.filter(agency=self.agency)
+        queries = [
+            bookings.order_by('-created_at'),
+            bookings.filter(created_by=self.agent).order_by('-created_at'),
+            bookings.filter(booking_status='pending').order_by('-created_at'),
+            bookings.filter(payment_status='PAID').order_by('-created_at'),
+            bookings.filter(booking_status='confirmed').order_by('arrival_date'),
+            bookings.filter(Q(arrival_date__isnull=True) | Q(departure_date__isnull=True)).order_by('-created_at'),
+            bookings.filter(created_at__date__gte='2026-01-01'),
+        ]
+        for queryset in queries:
+            self.assertIndexed(queryset, 'bookings_booking')
+
+    def test_client_and_service_lists_use_indexes(self):
+        self.assertIndexed(Client.objects.filter(agency=self.agency).order_by('-created_at'), 'clients_client')
+        self.assertIndexed(Service.objects.filter(agency=self.agency).order_by('-created_at'), 'services_service')
+
+    def test_name_search_uses_trigram_indexes(self):
+        self.make_booking(notes=0)
+        for fuzzy in [False, True]:
+            queryset, _ = search_bookings(
+                Booking.objects.filter(agency=self.agency), 'qure', fuzzy=fuzzy, agency_id=self.agency.id
+            )
+            for table in ['bookings_booking', 'clients_client', 'services_service']:
+                self.assertIndexed(queryset, table)
+        # The substring match itself is served by the UPPER(...) expression indexes
+        self.assertIn('client_name_upper_trgm_idx', Client.objects.filter(name__icontains='qure').explain())
+        self.assertIn(
+            'service_name_upper_trgm_idx', Service.objects.filter(service_name__icontains='umra').explain()
+        )
+
+
+@skipUnless(os.getenv('RUN_BENCHMARKS'), 'set RUN_BENCHMARKS=1 to run benchmarks')
+class BookingSearchBenchmark(BookingTestMixin, TestCase):
+    """
+    Latency of the first search page on a large agency
+    (BENCHMARK_BOOKINGS rows, 1M by default). Run with:
+    RUN_BENCHMARKS=1 python manage.py test bookings.tests.BookingSearchBenchmark
+    """
+    rows = int(os.getenv('BENCHMARK_BOOKINGS', 1_000_000))
+    first_names = ['Muhammad', 'Ayesha', 'Bilal', 'Fatima', 'Usman', 'Zainab', 'Hamza', 'Khadija']
+    last_names = ['Khan', 'Qureshi', 'Chaudhry', 'Siddiqui', 'Malik', 'Sheikh', 'Butt', 'Raza']
+
+    def setUp(self):
+        super().setUp()
+        clients = Client.objects.bulk_create([
+            Client(agency=self.agency, phone_number=f'0300{i:07d}',
+                   name=f'{self.first_names[i % 8]} {self.last_names[i // 8 % 8]} {i}')
+            for i in range(max(self.rows // 20, 1))
+        ], batch_size=5000)
+        batch = []
+        for i in range(self.rows):
+            batch.append(Booking(
+                agency=self.agency, service=self.service, created_by=self.owner,
+                client=clients[i % len(clients)],
+            ))
+            if len(batch) == 10000:
+                Booking.objects.bulk_create(batch)
+                batch = []
+        Booking.objects.bulk_create(batch)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE bookings_booking, clients_client, services_service')
+
+    def measure(self, term, fuzzy=False, settings_sql=None, repeat=5):
+        timings = []
+        for _ in range(repeat):
+            if settings_sql:
+                with connection.cursor() as cursor:
+                    cursor.execute(settings_sql)
+            queryset, ordering = search_bookings(
+                Booking.objects.filter(agency=self.agency), term, fuzzy, agency_id=self.agency.id
+            )
+            start = time.perf_counter()
+            list(queryset.order_by(*ordering)[:20])
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def test_search_latency(self):
+        print(f'\nBooking search, {self.rows} bookings (median ms, first page)')
+        for term in ['Qureshi', 'Qurashi', 'Chaudry']:
+            if connection.vendor == 'postgresql':
+                unindexed = self.measure(
+                    term, settings_sql='SET LOCAL enable_indexscan = off; SET LOCAL enable_bitmapscan = off'
+                )
+                print(f'  {term!r}: unindexed icontains {unindexed:.1f}')
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_indexscan = on; SET LOCAL enable_bitmapscan = on')
+            print(f'  {term!r}: icontains {self.measure(term):.1f}')
+            print(f'  {term!r}: fuzzy {self.measure(term, fuzzy=True):.1f}')
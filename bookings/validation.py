@@ -0,0 +1,34 @@
+"""
+Booking invariants shared by the serializers, Booking.clean() and bulk paths.
+
+The same rules are enforced by the database (see Booking.Meta.constraints);
+checking them up front only turns a constraint violation into a readable,
+per-field error message.
+"""
+from decimal import Decimal
+
+MAX_DISCOUNT_SHARE = Decimal('0.50')  # of the profit
+
+
+def max_discount(unit_profit):
+    return (unit_profit or Decimal('0.00')) * MAX_DISCOUNT_SHARE
+
+
+def booking_errors(unit_profit, discount, paid_amount=None, departure_date=None, arrival_date=None):
+    """Return {field: message} for every broken rule (empty when valid)."""
+    errors = {}
+    discount = discount or Decimal('0.00')
+
+    if discount < 0:
+        errors['discount'] = 'Discount cannot be negative'
+    elif discount > max_discount(unit_profit):
+        errors['discount'] = f'Discount cannot exceed 50% of profit (max: {max_discount(unit_profit)})'
+
+    if paid_amount is not None and paid_amount < 0:
+        errors['paid_amount'] = 'Paid amount cannot be negative'
+
+    # ✅ TRAVEL LOGIC: Return date (arrival) must be AFTER travel date (departure)
+    if departure_date and arrival_date and arrival_date < departure_date:
+        errors['arrival_date'] = 'Return date must be after travel date'
+
+    return errors
@@ -2,16 +2,27 @@ from rest_framework import viewsets, status, views
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q, Sum, Count, F, DecimalField, ExpressionWrapper
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Prefetch
 from django.utils import timezone
 from decimal import Decimal
 
-from .models import Booking, BookingNote
+from .analytics import summarize_daily_stats, summarize_missing_dates
+from .analytics_cache import cache_stats, cached_analytics
+from .bulk import BULK_MAX_ITEMS, bulk_create_bookings, bulk_record_payments, bulk_set_status
+from .models import Booking, BookingNote, DailyBookingStats, Payment
+from .payments import PaymentError, opening_payments, record_payment
+from .search import search_bookings
+from clients.models import Client, ClientNote
 from .serializers import (
     BookingSerializer, BookingCreateSerializer, BookingUpdateSerializer,
-    BookingNoteSerializer, BookingAgentSerializer
+    BookingNoteSerializer, BookingAgentSerializer, PaymentSerializer, BookingBulkItemSerializer,
+    BookingBulkStatusSerializer, BookingBulkPaymentSerializer, BookingPaymentUpdateSerializer
 )
 from users.permissions import CanAccessBookings, CanAccessAnalytics, AgencyDataIsolation
+from travel_agency_saas.exports import export_response
+from travel_agency_saas.pagination import KeysetPagination, keyset_order_by
 
 
 # class BookingViewSet(viewsets.ModelViewSet):
@@ -162,6 +173,52 @@ from users.permissions import CanAccessBookings, CanAccessAnalytics, AgencyDataI
 
 
 
+def with_nested_relations(queryset, include_booking_notes=True):
+    """
+    Load everything BookingSerializer / BookingAgentSerializer nest
+    (client, client notes, booking notes and their authors) in a fixed
+    number of queries, independent of page size.
+    """
+    queryset = queryset.select_related('client', 'client__created_by', 'service', 'created_by')
+    prefetches = [
+        Prefetch('client__notes', queryset=ClientNote.objects.select_related('created_by')),
+    ]
+    if include_booking_notes:
+        notes = BookingNote.objects.select_related('created_by')
+        limit = getattr(settings, 'BOOKING_NOTES_PREFETCH_LIMIT', None)
+        if limit:
+            # Sliced prefetch => one windowed query, latest N notes per booking
+            notes = notes.order_by('-created_at')[:limit]
+        prefetches.append(Prefetch('notes', queryset=notes))
+    return queryset.prefetch_related(*prefetches)
+
+
+# (values() field, column header) of booking exports
+BOOKING_EXPORT_COLUMNS = [
+    ('id', 'Booking ID'),
+    ('created_at', 'Booked At'),
+    ('client__name', 'Client'),
+    ('client__phone_number', 'Phone'),
+    ('client__passport_number', 'Passport'),
+    ('service__service_name', 'Service'),
+    ('booking_status', 'Booking Status'),
+    ('payment_status', 'Payment Status'),
+    ('total_amount', 'Total'),
+    ('discount', 'Discount'),
+    ('paid_amount', 'Paid'),
+    ('remaining', 'Remaining'),
+    ('payment_method', 'Payment Method'),
+    ('departure_date', 'Travel Date'),
+    ('arrival_date', 'Return Date'),
+    ('created_by__username', 'Created By'),
+]
+
+
+def export_bookings(request, queryset, filename):
+    queryset = queryset.annotate(remaining=F('total_amount') - F('paid_amount'))
+    return export_response(request, queryset, BOOKING_EXPORT_COLUMNS, filename)
+
+
 class BookingViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing bookings.
@@ -169,6 +226,11 @@ class BookingViewSet(viewsets.ModelViewSet):
     """
     queryset = Booking.objects.all()
     permission_classes = [IsAuthenticated, CanAccessBookings, AgencyDataIsolation]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-id')
+
+    # Actions that respond with the nested booking representation
+    nested_actions = ['list', 'retrieve', 'update_payment']
 
     def get_serializer_class(self):
         user = self.request.user
@@ -184,16 +246,26 @@ class BookingViewSet(viewsets.ModelViewSet):
             return BookingUpdateSerializer
         return BookingSerializer
 
+    def get_agency_bookings(self):
+        """Bookings the user may act on: own agency, and own bookings for agents"""
+        user = self.request.user
+        queryset = Booking.objects.filter(agency=user.agency)
+
+        # ✅ Agent can only see his own bookings
+        if user.role == 'agent':
+            queryset = queryset.filter(created_by=user)
+        return queryset
+
     def get_queryset(self):
         """Filter bookings by agency and support search"""
         user = self.request.user
-        queryset = Booking.objects.filter(agency=user.agency).select_related(
+        queryset = self.get_agency_bookings().select_related(
             'client', 'service', 'created_by'
         )
 
-        # ✅ Agent can only see his own bookings
-        if user.role == 'agent':
-            queryset = queryset.filter(created_by=user)
+        if self.action in self.nested_actions:
+            # Agent serializer has no booking notes
+            queryset = with_nested_relations(queryset, include_booking_notes=user.role != 'agent')
 
         # ✅ FIXED: Add booking_id filter here
         booking_id = self.request.query_params.get('booking_id', None)
@@ -207,12 +279,17 @@ class BookingViewSet(viewsets.ModelViewSet):
                 return Booking.objects.none()
 
         # Search functionality (general search - name, service)
+        # search_mode=fuzzy => typo-tolerant, ranked trigram search (PostgreSQL)
+        # Same order as cursor mode, ties broken by id so pages never overlap
+        ordering = keyset_order_by(self.keyset_ordering)
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(client__name__icontains=search) |
-                Q(service__service_name__icontains=search)
+            queryset, ordering = search_bookings(
+                queryset, search,
+                fuzzy=self.request.query_params.get('search_mode') == 'fuzzy',
+                agency_id=user.agency_id,
             )
+            ordering = [*ordering, '-id']
 
         # Filter by booking status
         booking_status = self.request.query_params.get('booking_status', None)
@@ -238,49 +315,133 @@ class BookingViewSet(viewsets.ModelViewSet):
                 departure_date__isnull=False
             )
 
-        return queryset.order_by('-created_at')
+        # Filter by booking date range
+        start_date = self.request.query_params.get('start_date', None)
+        end_date = self.request.query_params.get('end_date', None)
+        if start_date:
+            queryset = queryset.filter(created_at__date__gte=start_date)
+        if end_date:
+            queryset = queryset.filter(created_at__date__lte=end_date)
+
+        return queryset.order_by(*ordering)
 
     def perform_create(self, serializer):
         """Automatically set agency and created_by when creating booking"""
-        serializer.save(
-            agency=self.request.user.agency,
-            created_by=self.request.user
+        with transaction.atomic():
+            booking = serializer.save(
+                agency=self.request.user.agency,
+                created_by=self.request.user
+            )
+            # The opening paid_amount goes into the ledger, as in bulk_create
+            Payment.objects.bulk_create(opening_payments([booking], self.request.user))
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream bookings as CSV / XLSX (?file_type=xlsx).
+        Accepts the same filters as the list endpoint.
+        """
+        return export_bookings(request, self.get_queryset(), 'bookings')
+
+    @action(detail=False, methods=['post'])
+    def bulk_create(self, request):
+        """
+        Create many bookings at once (group tours).
+        Body: a list of booking objects. All-or-nothing: on any error nothing
+        is created and `errors` lists one entry per item, in request order.
+        """
+        serializer = BookingBulkItemSerializer(data=request.data, many=True, max_length=BULK_MAX_ITEMS)
+        if not serializer.is_valid():
+            return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        bookings, errors = bulk_create_bookings(
+            serializer.validated_data, request.user.agency, request.user
         )
+        if any(errors):
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            {'created': len(bookings), 'ids': [booking.id for booking in bookings]},
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=['post'])
+    def bulk_update_status(self, request):
+        """Confirm / reject many bookings at once: {"ids": [...], "booking_status": "confirmed"}"""
+        serializer = BookingBulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        summary = bulk_set_status(
+            self.get_agency_bookings(),
+            serializer.validated_data['ids'],
+            serializer.validated_data['booking_status'],
+        )
+        return Response(summary)
+
+    @action(detail=False, methods=['post'])
+    def bulk_update_payment(self, request):
+        """
+        Record payments on many bookings at once (e.g. a bank deposit):
+        {"payments": [{"booking": 1, "amount": "500.00"}, {"booking": 2}], "payment_method": "bank"}
+        A payment without amount settles the remaining balance, if any. All-or-nothing.
+        """
+        serializer = BookingBulkPaymentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        summary, errors = bulk_record_payments(
+            self.get_agency_bookings(),
+            {item['booking']: item.get('amount') for item in serializer.validated_data['payments']},
+            method=serializer.validated_data.get('payment_method') or None,
+            user=request.user,
+        )
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary)
 
     @action(detail=True, methods=['post'])
     def update_payment(self, request, pk=None):
-        """Update payment information for a booking"""
+        """
+        Update payment information for a booking.
+        `amount` records an instalment; `paid_amount` sets the total paid
+        (the difference is recorded as a payment).
+        """
+        booking = self.get_object()
+        serializer = BookingPaymentUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        try:
+            record_payment(
+                booking, amount=data.get('amount'), paid_amount=data.get('paid_amount'),
+                method=data.get('payment_method'), recorded_by=request.user
+            )
+        except PaymentError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = self.get_serializer(booking)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get', 'post'])
+    def payments(self, request, pk=None):
+        """Payment history of a booking (newest first), or record a payment"""
         booking = self.get_object()
-        paid_amount = request.data.get('paid_amount')
-        payment_method = request.data.get('payment_method')
 
-        if paid_amount is not None:
+        if request.method == 'POST':
+            serializer = PaymentSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
             try:
-                paid_amount = Decimal(str(paid_amount))
-                if paid_amount < 0:
-                    return Response(
-                        {'error': 'Paid amount cannot be negative'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-                booking.paid_amount = paid_amount
-                if payment_method:
-                    booking.payment_method = payment_method
-                booking.last_payment_date = timezone.now()
-                booking.save()
-
-                serializer = self.get_serializer(booking)
-                return Response(serializer.data)
-            except Exception as e:
-                return Response(
-                    {'error': str(e)},
-                    status=status.HTTP_400_BAD_REQUEST
+                payment = record_payment(
+                    booking, amount=serializer.validated_data['amount'],
+                    method=serializer.validated_data.get('method'), recorded_by=request.user
                 )
+            except PaymentError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(PaymentSerializer(payment).data, status=status.HTTP_201_CREATED)
 
-        return Response(
-            {'error': 'paid_amount is required'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
+        payments = booking.payments.select_related('recorded_by')
+        page = self.paginate_queryset(payments)
+        return self.get_paginated_response(PaymentSerializer(page, many=True).data)
 
     @action(detail=True, methods=['post'])
     def add_note(self, request, pk=None):
@@ -308,15 +469,7 @@ class BookingViewSet(viewsets.ModelViewSet):
         if user.role == 'agent':
             qs = qs.filter(created_by=user)
 
-        missing_any = qs.filter(Q(arrival_date__isnull=True) | Q(departure_date__isnull=True)).count()
-        missing_arrival = qs.filter(arrival_date__isnull=True).count()
-        missing_departure = qs.filter(departure_date__isnull=True).count()
-
-        return Response({
-            "missing_any": missing_any,
-            "missing_arrival": missing_arrival,
-            "missing_departure": missing_departure,
-        })
+        return Response(summarize_missing_dates(qs))
     
 class OnboardViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -326,6 +479,8 @@ class OnboardViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Booking.objects.filter(booking_status='confirmed')
     serializer_class = BookingSerializer
     permission_classes = [IsAuthenticated, CanAccessBookings, AgencyDataIsolation]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('arrival_date', 'id')
 
     def get_queryset(self):
         """Filter confirmed bookings by agency"""
@@ -333,7 +488,9 @@ class OnboardViewSet(viewsets.ReadOnlyModelViewSet):
         queryset = Booking.objects.filter(
             agency=user.agency,
             booking_status='confirmed'
-        ).select_related('client', 'service', 'created_by')
+        )
+        if self.action != 'export':
+            queryset = with_nested_relations(queryset)
 
         # ✅ Agent can only see his own confirmed bookings
         if user.role == 'agent':
@@ -353,7 +510,13 @@ class OnboardViewSet(viewsets.ReadOnlyModelViewSet):
         if payment_status:
             queryset = queryset.filter(payment_status=payment_status)
 
-        return queryset.order_by('arrival_date')
+        # Bookings without a return date last, as in cursor mode
+        return queryset.order_by(*keyset_order_by(self.keyset_ordering))
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream confirmed bookings as CSV / XLSX, same filters as the list"""
+        return export_bookings(request, self.get_queryset(), 'onboard')
 
 
 class AnalyticsView(views.APIView):
@@ -367,12 +530,14 @@ class AnalyticsView(views.APIView):
     def get(self, request):
         user = request.user
 
-        # Get all bookings for the agency
+        # Get all bookings (and their daily rollups) for the agency
         bookings = Booking.objects.filter(agency=user.agency)
+        stats = DailyBookingStats.objects.filter(agency=user.agency)
 
         # ✅ Agent: only his own analytics
         if user.role == 'agent':
             bookings = bookings.filter(created_by=user)
+            stats = stats.filter(agent=user)
 
         # ✅ NEW: Date Range Filters (lifetime/this_week/this_month/last_month/custom)
         range_filter = request.query_params.get('range', 'lifetime')
@@ -380,88 +545,57 @@ class AnalyticsView(views.APIView):
         end_date = request.query_params.get('end_date', None)
 
         today = timezone.localdate()
+        start = end = None
 
         if range_filter == 'this_week':
             start = today - timezone.timedelta(days=today.weekday())
             end = start + timezone.timedelta(days=6)
-            bookings = bookings.filter(created_at__date__gte=start, created_at__date__lte=end)
 
         elif range_filter == 'this_month':
             start = today.replace(day=1)
-            bookings = bookings.filter(created_at__date__gte=start, created_at__date__lte=today)
+            end = today
 
         elif range_filter == 'last_month':
             first_this_month = today.replace(day=1)
-            last_month_end = first_this_month - timezone.timedelta(days=1)
-            last_month_start = last_month_end.replace(day=1)
-            bookings = bookings.filter(created_at__date__gte=last_month_start, created_at__date__lte=last_month_end)
+            end = first_this_month - timezone.timedelta(days=1)
+            start = end.replace(day=1)
 
         elif range_filter == 'custom':
             if start_date and end_date:
-                bookings = bookings.filter(created_at__date__gte=start_date, created_at__date__lte=end_date)
-
-        # ✅ Calculate discount-adjusted total sales (DB level)
-        total_sales_after_discount = bookings.aggregate(
-            total=Sum(
-                ExpressionWrapper(
-                    (F('service__service_base_cost') + F('service__service_profit')) - F('discount'),
-                    output_field=DecimalField(max_digits=12, decimal_places=2)
-                )
-            )
-        )['total'] or Decimal('0.00')
-
-        total_received = bookings.aggregate(
-            total=Sum('paid_amount')
-        )['total'] or Decimal('0.00')
-
-        total_remaining = total_sales_after_discount - total_received
-
-        # ✅ NEW: Total Profit
-        total_profit = bookings.aggregate(
-            total=Sum('service__service_profit')
-        )['total'] or Decimal('0.00')
-
-        # Payment breakdown
-        payment_breakdown = {
-            'paid': bookings.filter(payment_status='PAID').count(),
-            'half_paid': bookings.filter(payment_status='HALF_PAID').count(),
-            'pending': bookings.filter(payment_status='PENDING').count(),
-        }
-
-        # Agent trackers
-        agent_bookings = bookings.values('created_by__username').annotate(
-            count=Count('id')
-        ).order_by('-count')
-
-        agent_customers = bookings.values('created_by__username').annotate(
-            unique_clients=Count('client', distinct=True)
-        ).order_by('-unique_clients')
-
-        # Total trackers
-        total_bookings = bookings.count()
-        total_customers = bookings.values('client').distinct().count()
-
-        # Booking status breakdown
-        booking_status_breakdown = {
-            'pending': bookings.filter(booking_status='pending').count(),
-            'confirmed': bookings.filter(booking_status='confirmed').count(),
-            'rejected': bookings.filter(booking_status='rejected').count(),
-        }
-
-        return Response({
-            'amounts': {
-                'total_sales': str(total_sales_after_discount),
-                'total_received': str(total_received),
-                'total_remaining': str(total_remaining),
-                'total_profit': str(total_profit),
-            },
-            'payment_breakdown': payment_breakdown,
-            'booking_status_breakdown': booking_status_breakdown,
-            'agent_bookings_tracker': list(agent_bookings),
-            'agent_customers_tracker': list(agent_customers),
-            'total_bookings': total_bookings,
-            'total_customers': total_customers,
-        })
+                start, end = start_date, end_date
+
+        # Ranges are whole days, so the daily rollups answer them exactly
+        if start is not None:
+            bookings = bookings.filter(created_at__date__gte=start, created_at__date__lte=end)
+            stats = stats.filter(day__gte=start, day__lte=end)
+
+        # Same agency + scope + resolved dates => same response
+        scope = ':'.join([
+            f'agent={user.id}' if user.role == 'agent' else 'agent=all',
+            range_filter, str(start), str(end),
+        ])
+        # Agency lifetime: distinct customers from the client summary columns
+        clients = None
+        if start is None and user.role != 'agent':
+            clients = Client.objects.filter(agency=user.agency)
+        data, outcome = cached_analytics(
+            user.agency_id, scope, lambda: summarize_daily_stats(stats, bookings, clients)
+        )
+        return Response(data, headers={'X-Cache': outcome})
+
+
+class AnalyticsCacheStatsView(views.APIView):
+    """
+    Hit / miss counters of the analytics response cache.
+    Owner, Manager, and Accountant can access.
+    """
+    permission_classes = [IsAuthenticated, CanAccessAnalytics]
+
+    def get(self, request):
+        if request.user.role == 'agent':
+            return Response({'error': 'Only owner, manager or accountant can view cache stats.'},
+                            status=status.HTTP_403_FORBIDDEN)
+        return Response(cache_stats())
 
 
 class BookingNoteViewSet(viewsets.ModelViewSet):
@@ -471,6 +605,8 @@ class BookingNoteViewSet(viewsets.ModelViewSet):
     queryset = BookingNote.objects.all()
     serializer_class = BookingNoteSerializer
     permission_classes = [IsAuthenticated, CanAccessBookings]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         """Filter notes by agency"""
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Client, ClientNote
+from .models import Client, ClientMergeRecord, ClientNote, DuplicateClientSuggestion
 
 
 class ClientNoteInline(admin.TabularInline):
@@ -10,10 +10,13 @@ class ClientNoteInline(admin.TabularInline):
 
 @admin.register(Client)
 class ClientAdmin(admin.ModelAdmin):
-    list_display = ['name', 'agency', 'phone_number', 'email', 'created_at']
+    list_display = ['name', 'agency', 'phone_number', 'email', 'outstanding', 'created_at']
     list_filter = ['agency', 'created_at']
     search_fields = ['name', 'phone_number', 'email', 'passport_number', 'cnic']
-    readonly_fields = ['created_at', 'updated_at', 'created_by']
+    readonly_fields = [
+        'created_at', 'updated_at', 'created_by',
+        'bookings_count', 'total_billed', 'total_paid', 'outstanding', 'last_booking_at',
+    ]
     inlines = [ClientNoteInline]
     
     fieldsets = (
@@ -26,6 +29,9 @@ class ClientAdmin(admin.ModelAdmin):
         ('Identification', {
             'fields': ('passport_number', 'cnic')
         }),
+        ('Bookings Summary', {
+            'fields': ('bookings_count', 'total_billed', 'total_paid', 'outstanding', 'last_booking_at')
+        }),
         ('Metadata', {
             'fields': ('created_by', 'created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -39,3 +45,17 @@ class ClientNoteAdmin(admin.ModelAdmin):
     list_filter = ['created_at']
     search_fields = ['client__name', 'note']
     readonly_fields = ['created_at']
+
+
+@admin.register(ClientMergeRecord)
+class ClientMergeRecordAdmin(admin.ModelAdmin):
+    list_display = ['survivor', 'agency', 'merged_client_ids', 'bookings_moved', 'merged_by', 'created_at']
+    list_filter = ['created_at']
+    readonly_fields = [field.name for field in ClientMergeRecord._meta.fields]
+
+
+@admin.register(DuplicateClientSuggestion)
+class DuplicateClientSuggestionAdmin(admin.ModelAdmin):
+    list_display = ['client', 'duplicate', 'agency', 'score', 'reasons', 'status', 'created_at']
+    list_filter = ['status', 'agency']
+    raw_id_fields = ['client', 'duplicate']
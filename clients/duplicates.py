@@ -0,0 +1,85 @@
+"""
+Duplicate-client detection job.
+
+Loads an agency's clients once, groups them into blocks (see
+clients.similarity), scores the blocks on a process pool and replaces the
+agency's pending DuplicateClientSuggestion rows with the ranked result.
+Dismissed suggestions are kept and never suggested again.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.db import transaction
+
+from .models import Client, DuplicateClientSuggestion
+from .similarity import DEFAULT_MIN_SCORE, build_blocks, prepare, score_blocks
+
+# Candidate comparisons per pool task
+TASK_COMPARISONS = 50_000
+SUGGESTION_BATCH_SIZE = 5000
+
+
+def load_clients(agency_id):
+    return list(
+        Client.objects.filter(agency_id=agency_id).order_by().values_list(
+            'id', 'name', 'phone_normalized', 'cnic_normalized'
+        ).iterator(chunk_size=SUGGESTION_BATCH_SIZE)
+    )
+
+
+def _tasks(blocks):
+    """Group blocks into pool tasks of roughly TASK_COMPARISONS comparisons"""
+    task, size = [], 0
+    for (kind, _), members in blocks.items():
+        task.append((kind, members))
+        size += len(members) * (len(members) - 1) // 2
+        if size >= TASK_COMPARISONS:
+            yield task
+            task, size = [], 0
+    if task:
+        yield task
+
+
+def find_duplicates(clients, min_score=DEFAULT_MIN_SCORE, workers=None):
+    """
+    Likely duplicate pairs among `clients`, best first:
+    [(lower id, higher id, score, [blocking kinds]), ...].
+    `workers=1` scores in this process.
+    """
+    tasks = list(_tasks(build_blocks(prepare(clients))))
+    score = partial(score_blocks, min_score=min_score)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) == 1:
+        results = map(score, tasks)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(score, tasks))
+
+    pairs = {}
+    for found in results:
+        for low, high, pair_score, kind in found:
+            entry = pairs.setdefault((low, high), [pair_score, set()])
+            entry[0] = max(entry[0], pair_score)
+            entry[1].add(kind)
+    ranked = [(low, high, pair_score, sorted(kinds)) for (low, high), (pair_score, kinds) in pairs.items()]
+    ranked.sort(key=lambda pair: (-pair[2], pair[0], pair[1]))
+    return ranked
+
+
+def refresh_suggestions(agency, min_score=DEFAULT_MIN_SCORE, workers=None):
+    """Recompute the agency's pending suggestions. Returns how many were stored."""
+    pairs = find_duplicates(load_clients(agency.id), min_score, workers)
+    pending = DuplicateClientSuggestion.objects.filter(
+        agency=agency, status=DuplicateClientSuggestion.STATUS_PENDING
+    )
+    with transaction.atomic():
+        pending.delete()
+        # Pairs that were dismissed before hit the unique constraint and are skipped
+        DuplicateClientSuggestion.objects.bulk_create([
+            DuplicateClientSuggestion(
+                agency=agency, client_id=low, duplicate_id=high, score=score, reasons=kinds
+            )
+            for low, high, score, kinds in pairs
+        ], batch_size=SUGGESTION_BATCH_SIZE, ignore_conflicts=True)
+    return pending.count()
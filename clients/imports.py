@@ -0,0 +1,191 @@
+"""
+Streaming client import from CSV or NDJSON files.
+
+Rows are read lazily, validated and written one chunk at a time (one
+transaction per chunk), so memory stays flat regardless of the file size.
+A row is matched to an existing client of the agency - or to an earlier row
+of the same file - by normalized phone number, passport or CNIC (indexed
+shadow columns); matches are updated with the row's non-empty values instead
+of creating a duplicate.
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Q
+
+from agencies import counters
+from bookings.analytics_cache import bump_agency_version
+
+from .models import Client
+from .normalize import normalize_cnic, normalize_document, normalize_phone
+from .serializers import ClientCreateSerializer
+
+IMPORT_FIELDS = [
+    'name', 'phone_number', 'alternative_number',
+    'email', 'passport_number', 'cnic', 'address',
+]
+NORMALIZED_FIELDS = ['phone_normalized', 'passport_normalized', 'cnic_normalized']
+IMPORT_FILE_TYPES = ['csv', 'ndjson']
+IMPORT_CHUNK_SIZE = 1000
+# Per-row errors kept for the report; the failed count keeps counting past it
+MAX_REPORTED_ERRORS = 1000
+
+
+def detect_file_type(filename, file_type=None):
+    file_type = file_type or (filename or '').rsplit('.', 1)[-1].lower()
+    if file_type in ['jsonl', 'json']:
+        file_type = 'ndjson'
+    if file_type not in IMPORT_FILE_TYPES:
+        raise ValueError('file_type must be csv or ndjson')
+    return file_type
+
+
+def read_rows(fileobj, file_type):
+    """Yield (row number, dict or None) from a binary file, one row at a time."""
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    try:
+        if file_type == 'csv':
+            # Row 1 is the header
+            yield from enumerate(csv.DictReader(text), start=2)
+            return
+
+        for number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield number, row if isinstance(row, dict) else None
+    finally:
+        # Leave `fileobj` open for the caller
+        text.detach()
+
+
+def count_rows(fileobj, file_type, limit):
+    """Rows in the file, counting no further than `limit` + 1. Rewinds `fileobj`."""
+    rows = read_rows(fileobj, file_type)
+    try:
+        count = sum(1 for _ in islice(rows, limit + 1))
+    finally:
+        rows.close()
+    fileobj.seek(0)
+    return count
+
+
+def identity_keys(values):
+    """Normalized identifiers a client can be matched on"""
+    keys = []
+    if phone := normalize_phone(values.get('phone_number')):
+        keys.append(('phone_normalized', phone))
+    if passport := normalize_document(values.get('passport_number')):
+        keys.append(('passport_normalized', passport))
+    if cnic := normalize_cnic(values.get('cnic')):
+        keys.append(('cnic_normalized', cnic))
+    return keys
+
+
+def find_existing(agency, rows):
+    """Existing clients matching any identifier of `rows`, indexed by identity key (one query)."""
+    wanted = {}
+    for values in rows:
+        for field, value in identity_keys(values):
+            wanted.setdefault(field, set()).add(value)
+    if not wanted:
+        return {}
+
+    matches = Q()
+    for field, values in wanted.items():
+        matches |= Q(**{f'{field}__in': values})
+
+    index = {}
+    for client in Client.objects.filter(matches, agency=agency).order_by('id'):
+        for key in identity_keys(client.__dict__):
+            index.setdefault(key, client)
+    return index
+
+
+class ClientImporter:
+    """
+    Import rows into `agency`. Iterate `run(rows)` to get a progress dict
+    after each chunk; `summary()` holds the totals and per-row errors.
+    """
+
+    def __init__(self, agency, user=None, chunk_size=IMPORT_CHUNK_SIZE):
+        self.agency = agency
+        self.user = user
+        self.chunk_size = chunk_size
+        self.counts = {'processed': 0, 'created': 0, 'updated': 0, 'merged': 0, 'failed': 0}
+        self.errors = []
+
+    def run(self, rows):
+        rows = iter(rows)
+        while chunk := list(islice(rows, self.chunk_size)):
+            self.import_chunk(chunk)
+            yield dict(self.counts)
+
+    def summary(self):
+        return {
+            **self.counts,
+            'errors': self.errors,
+            'errors_truncated': self.counts['failed'] > len(self.errors),
+        }
+
+    def fail(self, number, errors):
+        self.counts['failed'] += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': number, 'errors': errors})
+
+    def import_chunk(self, chunk):
+        valid = []
+        for number, row in chunk:
+            self.counts['processed'] += 1
+            if row is None:
+                self.fail(number, {'non_field_errors': ['Row is not a JSON object']})
+                continue
+            data = {
+                field: str(row[field]).strip() for field in IMPORT_FIELDS
+                if row.get(field) not in (None, '')
+            }
+            serializer = ClientCreateSerializer(data=data)
+            if not serializer.is_valid():
+                self.fail(number, serializer.errors)
+                continue
+            valid.append(serializer.validated_data)
+
+        existing = find_existing(self.agency, valid)
+        seen = {}     # identity key => client of this chunk
+        pending = {}  # id(client) => client to write
+        for values in valid:
+            keys = identity_keys(values)
+            client = next((seen.get(key) or existing.get(key) for key in keys if key in seen or key in existing), None)
+
+            if client is None:
+                client = Client(agency=self.agency, created_by=self.user, **values)
+                self.counts['created'] += 1
+            else:
+                for field, value in values.items():
+                    setattr(client, field, value)
+                self.counts['updated' if client.pk else 'merged'] += 1
+
+            client.normalize_identifiers()
+            for key in identity_keys(client.__dict__):
+                seen[key] = client
+            pending[id(client)] = client
+
+        if not pending:
+            return
+        created = sum(client.pk is None for client in pending.values())
+        with transaction.atomic():
+            Client.objects.bulk_create(
+                pending.values(),
+                update_conflicts=True,
+                unique_fields=['id'],
+                update_fields=IMPORT_FIELDS + NORMALIZED_FIELDS + ['updated_at'],
+            )
+            agency_id = self.agency.id
+            counters.apply_delta(agency_id, 'clients_count', created)
+            transaction.on_commit(lambda: bump_agency_version(agency_id))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from clients.models import Client
+
+NORMALIZED_FIELDS = ['phone_normalized', 'passport_normalized', 'cnic_normalized']
+
+
+class Command(BaseCommand):
+    help = 'Fill the normalized phone / passport / CNIC columns of existing clients, in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--agency', type=int, help='Only backfill this agency id')
+
+    def handle(self, *args, **options):
+        clients = Client.objects.order_by('id').only('id', 'phone_number', 'passport_number', 'cnic')
+        if options['agency']:
+            clients = clients.filter(agency_id=options['agency'])
+
+        last_id, updated = 0, 0
+        while batch := list(clients.filter(id__gt=last_id)[:options['batch_size']]):
+            for client in batch:
+                client.normalize_identifiers()
+            # One short transaction per batch keeps row locks brief
+            with transaction.atomic():
+                Client.objects.bulk_update(batch, NORMALIZED_FIELDS)
+            last_id = batch[-1].id
+            updated += len(batch)
+            self.stdout.write(f'{updated} clients normalized')
+
+        self.stdout.write(self.style.SUCCESS(f'Backfilled {updated} clients'))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from agencies.models import Agency
+from clients.duplicates import refresh_suggestions
+from clients.similarity import DEFAULT_MIN_SCORE
+
+
+class Command(BaseCommand):
+    help = 'Find likely duplicate clients per agency and store ranked suggestions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--agency', type=int, help='Only scan this agency id')
+        parser.add_argument('--min-score', type=float, default=DEFAULT_MIN_SCORE)
+        parser.add_argument('--workers', type=int, help='Scoring processes (defaults to the CPU count)')
+
+    def handle(self, *args, **options):
+        agencies = Agency.objects.order_by('id')
+        if options['agency']:
+            agencies = agencies.filter(pk=options['agency'])
+            if not agencies.exists():
+                raise CommandError(f"Agency {options['agency']} not found")
+
+        for agency in agencies:
+            start = time.perf_counter()
+            stored = refresh_suggestions(agency, options['min_score'], options['workers'])
+            self.stdout.write(f'{agency.name}: {stored} suggestions in {time.perf_counter() - start:.1f}s')
+        self.stdout.write(self.style.SUCCESS('Duplicate scan finished'))
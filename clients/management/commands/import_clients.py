@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from agencies.models import Agency
+from clients.imports import IMPORT_CHUNK_SIZE, ClientImporter, detect_file_type, read_rows
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Import clients into an agency from a CSV or NDJSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--agency', type=int, required=True, help='Agency id to import into')
+        parser.add_argument('--created-by', type=int, help='User id recorded as creator of new clients')
+        parser.add_argument('--file-type', choices=['csv', 'ndjson'], help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            agency = Agency.objects.get(pk=options['agency'])
+            user = User.objects.get(pk=options['created_by']) if options['created_by'] else None
+            file_type = detect_file_type(options['path'], options['file_type'])
+        except (Agency.DoesNotExist, User.DoesNotExist, ValueError) as e:
+            raise CommandError(e)
+
+        importer = ClientImporter(agency, user, chunk_size=options['chunk_size'])
+        with open(options['path'], 'rb') as fileobj:
+            for counts in importer.run(read_rows(fileobj, file_type)):
+                self.stdout.write(
+                    '{processed} rows: {created} created, {updated} updated, '
+                    '{merged} merged, {failed} failed'.format(**counts)
+                )
+
+        for error in importer.summary()['errors']:
+            self.stderr.write(f"row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(f"Imported {importer.counts['processed']} rows"))
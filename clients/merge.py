@@ -0,0 +1,127 @@
+"""
+Merging duplicate client records into a surviving client.
+
+Bookings and notes of the duplicates are re-pointed with set-based UPDATEs
+and the duplicates are deleted, all in one transaction that locks only the
+rows involved. Booking rows are locked before client rows (the order used
+by booking and payment writes, see bookings.client_summary), then the
+client rows in id order. Every merge leaves a ClientMergeRecord.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.forms.models import model_to_dict
+from django.utils import timezone
+
+from bookings import client_summary
+from bookings.analytics_cache import bump_agency_version
+from bookings.models import Booking
+
+from .models import Client, ClientMergeRecord, ClientNote
+
+# Survivor fields filled from a duplicate when the survivor has no value
+FILLABLE_FIELDS = ['alternative_number', 'email', 'passport_number', 'cnic', 'address']
+MERGE_MAX_PAIRS = 1000
+
+
+class MergeError(ValueError):
+    pass
+
+
+def merge_clients(agency, survivor_id, duplicate_ids, user=None):
+    """
+    Merge the clients `duplicate_ids` of `agency` into `survivor_id`.
+    Returns the ClientMergeRecord; raises MergeError for invalid input.
+    """
+    duplicate_ids = sorted(set(duplicate_ids) - {survivor_id})
+    if not duplicate_ids:
+        raise MergeError('No duplicates to merge')
+
+    clients = Client.objects.filter(agency=agency, pk__in=[survivor_id, *duplicate_ids])
+    # Ownership first (clients never change agency), so foreign ids lock nothing
+    owned = set(clients.values_list('pk', flat=True))
+    if survivor_id not in owned:
+        raise MergeError(f'Client {survivor_id} not found')
+    missing = [pk for pk in duplicate_ids if pk not in owned]
+    if missing:
+        raise MergeError(f'Clients not found: {missing}')
+
+    with transaction.atomic():
+        bookings = Booking.objects.filter(client_id__in=duplicate_ids)
+        list(bookings.select_for_update().order_by('pk').values_list('pk', flat=True))
+        locked = {client.pk: client for client in clients.select_for_update().order_by('pk')}
+        if len(locked) != len(owned):
+            raise MergeError('Clients changed during the merge, please retry')
+
+        survivor = locked[survivor_id]
+        duplicates = [locked[pk] for pk in duplicate_ids]
+        filled = []
+        for field in FILLABLE_FIELDS:
+            if getattr(survivor, field):
+                continue
+            value = next((getattr(dup, field) for dup in duplicates if getattr(dup, field)), None)
+            if value:
+                setattr(survivor, field, value)
+                filled.append(field)
+
+        now = timezone.now()
+        # Re-evaluated under the client locks: also catches bookings added since
+        bookings_moved = bookings.update(client_id=survivor_id, updated_at=now)
+        notes_moved = ClientNote.objects.filter(client_id__in=duplicate_ids).update(client_id=survivor_id)
+
+        record = ClientMergeRecord.objects.create(
+            agency=agency,
+            survivor=survivor,
+            merged_client_ids=duplicate_ids,
+            merged_clients=[
+                model_to_dict(dup, fields=['id', 'name', 'phone_number', *FILLABLE_FIELDS])
+                | {'created_at': dup.created_at.isoformat()}
+                for dup in duplicates
+            ],
+            filled_fields=filled,
+            bookings_moved=bookings_moved,
+            notes_moved=notes_moved,
+            merged_by=user,
+        )
+        Client.objects.filter(pk__in=duplicate_ids).delete()
+        survivor.save(update_fields=[*filled, 'updated_at'])
+        client_summary.refresh_clients([survivor_id])
+
+        agency_id = agency.id
+        transaction.on_commit(lambda: bump_agency_version(agency_id))
+    return record
+
+
+def merge_pairs(agency, pairs, user=None):
+    """
+    Merge confirmed (survivor id, duplicate id) pairs in short transactions,
+    one per surviving client, so no lock is held for the whole batch.
+    Chains (A <- B, B <- C) end up in A. Returns a summary dict.
+    """
+    merged_into = {}
+
+    def resolve(pk):
+        while pk in merged_into:
+            pk = merged_into[pk]
+        return pk
+
+    groups = defaultdict(set)
+    for survivor_id, duplicate_id in pairs:
+        survivor_id, duplicate_id = resolve(survivor_id), resolve(duplicate_id)
+        if survivor_id == duplicate_id:
+            continue
+        merged_into[duplicate_id] = survivor_id
+        groups[survivor_id].add(duplicate_id)
+        # The duplicate's own group (if any) now belongs to the survivor
+        groups[survivor_id] |= groups.pop(duplicate_id, set())
+
+    summary = {'merged': 0, 'records': [], 'errors': []}
+    for survivor_id, duplicate_ids in groups.items():
+        try:
+            record = merge_clients(agency, survivor_id, duplicate_ids, user)
+        except MergeError as e:
+            summary['errors'].append({'survivor': survivor_id, 'duplicates': sorted(duplicate_ids), 'error': str(e)})
+            continue
+        summary['merged'] += len(record.merged_client_ids)
+        summary['records'].append(record.id)
+    return summary
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.10 on 2026-10-18 06:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+from travel_agency_saas.db import AddIndexConcurrentlyIfSupported
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('agencies', '0003_agency_address_agency_description_agency_email_and_more'),
+        ('clients', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfSupported(
+            model_name='client',
+            index=models.Index(fields=['agency', '-created_at'], name='client_agency_created_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+from travel_agency_saas.db import AddPostgresIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('clients', '0003_tenant_indexes'),
+    ]
+
+    operations = [
+        # No-op on databases other than PostgreSQL
+        TrigramExtension(),
+        AddPostgresIndexConcurrently(
+            model_name='client',
+            name='client_name_trgm_idx',
+            columns='name gin_trgm_ops',
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.10 on 2026-10-18 06:32
+
+import django.contrib.postgres.search
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+from travel_agency_saas.db import (
+    AddIndexConcurrentlyIfSupported, AddPostgresIndexConcurrently, RunSQLIfPostgres
+)
+
+BACKFILL_BATCH_SIZE = 5000
+
+SEARCH_DOCUMENT_TRIGGER = """
+CREATE OR REPLACE FUNCTION clients_client_search_document() RETURNS trigger AS $$
+BEGIN
+    NEW.search_document :=
+        setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('simple', concat_ws(' ', NEW.passport_number, NEW.cnic, NEW.phone_number)), 'B') ||
+        setweight(to_tsvector('simple', coalesce(NEW.email, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER clients_client_search_document_trg
+BEFORE INSERT OR UPDATE OF name, phone_number, email, passport_number, cnic, search_document
+ON clients_client
+FOR EACH ROW EXECUTE FUNCTION clients_client_search_document();
+"""
+
+DROP_SEARCH_DOCUMENT_TRIGGER = """
+DROP TRIGGER IF EXISTS clients_client_search_document_trg ON clients_client;
+DROP FUNCTION IF EXISTS clients_client_search_document();
+"""
+
+
+def backfill_search_document(apps, schema_editor):
+    """Fire the trigger for existing rows, one id range per statement."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Client = apps.get_model('clients', 'Client')
+    bounds = Client.objects.aggregate(low=models.Min('id'), high=models.Max('id'))
+    if bounds['low'] is None:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for start in range(bounds['low'], bounds['high'] + 1, BACKFILL_BATCH_SIZE):
+            cursor.execute(
+                'UPDATE clients_client SET name = name WHERE id >= %s AND id < %s',
+                [start, start + BACKFILL_BATCH_SIZE]
+            )
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('agencies', '0003_agency_address_agency_description_agency_email_and_more'),
+        ('clients', '0004_client_name_trigram'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='search_document',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        RunSQLIfPostgres(SEARCH_DOCUMENT_TRIGGER, DROP_SEARCH_DOCUMENT_TRIGGER),
+        migrations.RunPython(backfill_search_document, migrations.RunPython.noop),
+        AddPostgresIndexConcurrently(
+            model_name='client',
+            name='client_search_document_idx',
+            columns='search_document',
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='client',
+            index=models.Index(models.F('agency'), django.db.models.functions.text.Upper('passport_number'), name='client_agency_passport_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='client',
+            index=models.Index(fields=['agency', 'cnic'], name='client_agency_cnic_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='client',
+            index=models.Index(fields=['agency', 'phone_number'], name='client_agency_phone_idx'),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.10 on 2026-10-18 06:52
+
+from django.db import migrations, models, transaction
+
+from clients.normalize import normalize_cnic, normalize_document, normalize_phone
+from travel_agency_saas.db import AddIndexConcurrentlyIfSupported
+
+BACKFILL_BATCH_SIZE = 2000
+
+
+def backfill_normalized_identifiers(apps, schema_editor):
+    """
+    Fill the new columns for existing clients, one short transaction per id
+    batch, before the lookups, search and imports start relying on them.
+    (`manage.py backfill_client_identifiers` does the same on demand.)
+    """
+    Client = apps.get_model('clients', 'Client')
+    clients = Client.objects.order_by('id').only('id', 'phone_number', 'passport_number', 'cnic')
+    last_id = 0
+    while batch := list(clients.filter(id__gt=last_id)[:BACKFILL_BATCH_SIZE]):
+        for client in batch:
+            client.phone_normalized = normalize_phone(client.phone_number)
+            client.passport_normalized = normalize_document(client.passport_number)
+            client.cnic_normalized = normalize_cnic(client.cnic)
+        with transaction.atomic():
+            Client.objects.bulk_update(batch, ['phone_normalized', 'passport_normalized', 'cnic_normalized'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction, and the
+    # backfill commits batch by batch
+    atomic = False
+
+    dependencies = [
+        ('clients', '0005_client_search_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='cnic_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=50, null=True),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='passport_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=50, null=True),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='phone_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=20, null=True),
+        ),
+        migrations.RunPython(backfill_normalized_identifiers, migrations.RunPython.noop),
+        AddIndexConcurrentlyIfSupported(
+            model_name='client',
+            index=models.Index(fields=['agency', 'phone_normalized'], name='client_agency_phone_nrm_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='client',
+            index=models.Index(fields=['agency', 'passport_normalized'], name='client_agency_passport_nrm_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='client',
+            index=models.Index(fields=['agency', 'cnic_normalized'], name='client_agency_cnic_nrm_idx'),
+        ),
+        # Superseded by the normalized identifier indexes, dropped only once
+        # the backfill above has filled them
+        migrations.RemoveIndex(
+            model_name='client',
+            name='client_agency_passport_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='client',
+            name='client_agency_cnic_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='client',
+            name='client_agency_phone_idx',
+        ),
+    ]
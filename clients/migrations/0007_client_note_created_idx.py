@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-18 06:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+from travel_agency_saas.db import AddIndexConcurrentlyIfSupported
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('clients', '0006_client_normalized_identifiers'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfSupported(
+            model_name='clientnote',
+            index=models.Index(fields=['client', '-created_at'], name='client_note_created_idx'),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.10 on 2026-10-18 06:57
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models, transaction
+
+from travel_agency_saas.db import AddIndexConcurrentlyIfSupported
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def backfill_client_summaries(apps, schema_editor):
+    """Fill the summary columns from existing bookings, one short transaction per batch."""
+    Client = apps.get_model('clients', 'Client')
+    Booking = apps.get_model('bookings', 'Booking')
+    last_id = 0
+    while batch := list(
+        Client.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:BACKFILL_BATCH_SIZE]
+    ):
+        rows = Booking.objects.filter(client_id__in=batch).order_by().values('client_id').annotate(
+            bookings_count=models.Count('id'),
+            total_billed=models.Sum('total_amount'),
+            total_paid=models.Sum('paid_amount'),
+            last_booking_at=models.Max('created_at'),
+        )
+        with transaction.atomic():
+            for row in rows:
+                billed, paid = row['total_billed'] or Decimal('0.00'), row['total_paid'] or Decimal('0.00')
+                Client.objects.filter(pk=row['client_id']).update(
+                    bookings_count=row['bookings_count'], total_billed=billed, total_paid=paid,
+                    outstanding=billed - paid, last_booking_at=row['last_booking_at'],
+                )
+        last_id = batch[-1]
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('agencies', '0003_agency_address_agency_description_agency_email_and_more'),
+        ('bookings', '0008_payment'),
+        ('clients', '0007_client_note_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='bookings_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='last_booking_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='outstanding',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='total_billed',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='total_paid',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=12),
+        ),
+        migrations.RunPython(backfill_client_summaries, migrations.RunPython.noop),
+        AddIndexConcurrentlyIfSupported(
+            model_name='client',
+            index=models.Index(fields=['agency', '-outstanding'], name='client_agency_outstanding_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='client',
+            index=models.Index(fields=['agency', '-total_billed'], name='client_agency_billed_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='client',
+            index=models.Index(fields=['agency', '-last_booking_at'], name='client_agency_last_booking_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.10 on 2026-10-18 06:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0003_agency_address_agency_description_agency_email_and_more'),
+        ('clients', '0008_client_financial_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientMergeRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('merged_client_ids', models.JSONField(default=list)),
+                ('merged_clients', models.JSONField(default=list)),
+                ('filled_fields', models.JSONField(blank=True, default=list)),
+                ('bookings_moved', models.PositiveIntegerField(default=0)),
+                ('notes_moved', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('agency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='client_merges', to='agencies.agency')),
+                ('merged_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='client_merges', to=settings.AUTH_USER_MODEL)),
+                ('survivor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='merge_records', to='clients.client')),
+            ],
+            options={
+                'verbose_name': 'Client Merge Record',
+                'verbose_name_plural': 'Client Merge Records',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['agency', '-created_at'], name='client_merge_agency_idx')],
+            },
+        ),
+    ]
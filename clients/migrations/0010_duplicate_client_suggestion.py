@@ -0,0 +1,35 @@
+# Generated by Django 5.2.10 on 2026-10-18 07:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0003_agency_address_agency_description_agency_email_and_more'),
+        ('clients', '0009_client_merge_record'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DuplicateClientSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('reasons', models.JSONField(default=list)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('dismissed', 'Dismissed')], default='pending', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('agency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicate_client_suggestions', to='agencies.agency')),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicate_suggestions', to='clients.client')),
+                ('duplicate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='clients.client')),
+            ],
+            options={
+                'verbose_name': 'Duplicate Client Suggestion',
+                'verbose_name_plural': 'Duplicate Client Suggestions',
+                'ordering': ['-score', '-id'],
+                'indexes': [models.Index(fields=['agency', 'status', '-score'], name='dup_suggestion_ranked_idx')],
+                'constraints': [models.UniqueConstraint(fields=('client', 'duplicate'), name='dup_suggestion_pair_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+from travel_agency_saas.db import AddPostgresIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('clients', '0010_duplicate_client_suggestion'),
+    ]
+
+    operations = [
+        # icontains compiles to UPPER(name::text) LIKE UPPER(...) on PostgreSQL;
+        # only an index on that expression serves it. client_name_trgm_idx
+        # stays for trigram word similarity (fuzzy booking search).
+        AddPostgresIndexConcurrently(
+            model_name='client',
+            name='client_name_upper_trgm_idx',
+            columns='(UPPER(name::text)) gin_trgm_ops',
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+from travel_agency_saas.db import AddPostgresIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('clients', '0011_client_name_upper_trigram'),
+    ]
+
+    # Substring search (clients.search.substring_q) next to the full-text
+    # document: email icontains, and parts of normalized identifiers
+    operations = [
+        AddPostgresIndexConcurrently(
+            model_name='client',
+            name='client_email_upper_trgm_idx',
+            columns='(UPPER(email::text)) gin_trgm_ops',
+        ),
+        AddPostgresIndexConcurrently(
+            model_name='client',
+            name='client_phone_norm_trgm_idx',
+            columns='phone_normalized gin_trgm_ops',
+        ),
+        AddPostgresIndexConcurrently(
+            model_name='client',
+            name='client_cnic_norm_trgm_idx',
+            columns='cnic_normalized gin_trgm_ops',
+        ),
+        AddPostgresIndexConcurrently(
+            model_name='client',
+            name='client_passport_norm_trgm_idx',
+            columns='passport_normalized gin_trgm_ops',
+        ),
+    ]
@@ -1,4 +1,8 @@
-from django.db import models
+from decimal import Decimal
+
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from .normalize import normalize_cnic, normalize_document, normalize_phone
 
 
 class Client(models.Model):
@@ -25,15 +29,59 @@ class Client(models.Model):
         null=True,
         related_name='created_clients'
     )
+
+    # Full-text search document, maintained by a PostgreSQL trigger on
+    # insert/update (covers save(), queryset.update() and bulk_create()).
+    search_document = SearchVectorField(null=True, editable=False)
+
+    # Canonical identifiers for exact lookups and de-duplication, kept in
+    # sync by save() (bulk writers call normalize_identifiers() themselves).
+    phone_normalized = models.CharField(max_length=20, blank=True, null=True, editable=False)
+    passport_normalized = models.CharField(max_length=50, blank=True, null=True, editable=False)
+    cnic_normalized = models.CharField(max_length=50, blank=True, null=True, editable=False)
+
+    # Financial summary of the client's bookings, maintained transactionally
+    # by booking and payment writes (see bookings.client_summary)
+    bookings_count = models.PositiveIntegerField(default=0, editable=False)
+    total_billed = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), editable=False)
+    total_paid = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), editable=False)
+    outstanding = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), editable=False)
+    last_booking_at = models.DateTimeField(blank=True, null=True, editable=False)
     
     class Meta:
         verbose_name = 'Client'
         verbose_name_plural = 'Clients'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['agency', '-created_at'], name='client_agency_created_idx'),
+            # Identifier lookups / identifier-like searches. Not unique:
+            # agencies already hold duplicate clients (see the merge tools)
+            models.Index(fields=['agency', 'phone_normalized'], name='client_agency_phone_nrm_idx'),
+            models.Index(fields=['agency', 'passport_normalized'], name='client_agency_passport_nrm_idx'),
+            models.Index(fields=['agency', 'cnic_normalized'], name='client_agency_cnic_nrm_idx'),
+            # ?has_balance= / ?ordering= on the financial summary
+            models.Index(fields=['agency', '-outstanding'], name='client_agency_outstanding_idx'),
+            models.Index(fields=['agency', '-total_billed'], name='client_agency_billed_idx'),
+            models.Index(fields=['agency', '-last_booking_at'], name='client_agency_last_booking_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.phone_number}"
 
+    def normalize_identifiers(self):
+        self.phone_normalized = normalize_phone(self.phone_number)
+        self.passport_normalized = normalize_document(self.passport_number)
+        self.cnic_normalized = normalize_cnic(self.cnic)
+
+    def save(self, *args, **kwargs):
+        self.normalize_identifiers()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'phone_normalized', 'passport_normalized', 'cnic_normalized'}
+        # Atomic so the agency counter update (post_save signal) commits with the client
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
 
 class ClientNote(models.Model):
     """
@@ -56,6 +104,99 @@ class ClientNote(models.Model):
         verbose_name = 'Client Note'
         verbose_name_plural = 'Client Notes'
         ordering = ['-created_at']
+        indexes = [
+            # Per-client note page, count and latest-note lookups
+            models.Index(fields=['client', '-created_at'], name='client_note_created_idx'),
+        ]
     
     def __str__(self):
         return f"Note for {self.client.name} - {self.created_at.strftime('%Y-%m-%d')}"
+
+
+class ClientMergeRecord(models.Model):
+    """
+    Audit record of duplicate clients merged into a surviving client
+    (see clients.merge). Keeps a snapshot of the deleted duplicates.
+    """
+    agency = models.ForeignKey(
+        'agencies.Agency',
+        on_delete=models.CASCADE,
+        related_name='client_merges'
+    )
+    survivor = models.ForeignKey(
+        Client,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='merge_records'
+    )
+    merged_client_ids = models.JSONField(default=list)
+    merged_clients = models.JSONField(default=list)
+    filled_fields = models.JSONField(default=list, blank=True)
+    bookings_moved = models.PositiveIntegerField(default=0)
+    notes_moved = models.PositiveIntegerField(default=0)
+    merged_by = models.ForeignKey(
+        'users.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='client_merges'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Client Merge Record'
+        verbose_name_plural = 'Client Merge Records'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['agency', '-created_at'], name='client_merge_agency_idx'),
+        ]
+
+    def __str__(self):
+        return f"Merged {self.merged_client_ids} into client #{self.survivor_id}"
+
+
+class DuplicateClientSuggestion(models.Model):
+    """
+    A likely duplicate pair of clients found by the detection job
+    (clients.duplicates). `client` is the lower id of the pair.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_DISMISSED = 'dismissed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_DISMISSED, 'Dismissed'),
+    ]
+
+    agency = models.ForeignKey(
+        'agencies.Agency',
+        on_delete=models.CASCADE,
+        related_name='duplicate_client_suggestions'
+    )
+    client = models.ForeignKey(
+        Client,
+        on_delete=models.CASCADE,
+        related_name='duplicate_suggestions'
+    )
+    duplicate = models.ForeignKey(
+        Client,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    score = models.FloatField()
+    # Blocking keys the pair shared: phone / name / cnic
+    reasons = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Duplicate Client Suggestion'
+        verbose_name_plural = 'Duplicate Client Suggestions'
+        ordering = ['-score', '-id']
+        indexes = [
+            models.Index(fields=['agency', 'status', '-score'], name='dup_suggestion_ranked_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['client', 'duplicate'], name='dup_suggestion_pair_unique'),
+        ]
+
+    def __str__(self):
+        return f"Client #{self.client_id} ~ #{self.duplicate_id} ({self.score:.2f})"
@@ -0,0 +1,32 @@
+"""
+Canonical forms of client identifiers, used to match the same person across
+different spellings ("+92 300-1234567" / "03001234567", "ab1234567" / "AB1234567").
+"""
+import re
+
+NON_DIGITS_RE = re.compile(r'\D+')
+NON_ALNUM_RE = re.compile(r'[^0-9A-Za-z]+')
+
+DEFAULT_COUNTRY_CODE = '92'
+
+
+def normalize_phone(value):
+    """E.164-style digits (no '+'); local Pakistani numbers get the 92 prefix"""
+    digits = NON_DIGITS_RE.sub('', value or '')
+    if digits.startswith('00'):
+        digits = digits[2:]
+    elif digits.startswith('0') and len(digits) == 11:
+        digits = DEFAULT_COUNTRY_CODE + digits[1:]
+    elif digits.startswith('3') and len(digits) == 10:
+        digits = DEFAULT_COUNTRY_CODE + digits
+    return digits or None
+
+
+def normalize_document(value):
+    """Passport / CNIC: upper-case letters and digits only"""
+    return NON_ALNUM_RE.sub('', value or '').upper() or None
+
+
+def normalize_cnic(value):
+    """CNIC digits only ("35202-1234567-1" => "3520212345671")"""
+    return NON_DIGITS_RE.sub('', value or '') or None
@@ -0,0 +1,82 @@
+"""
+Client search: exact identifier shortcuts, ranked full-text search and
+substring matches on names, emails and identifiers.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, Q
+
+from .normalize import NON_DIGITS_RE, normalize_cnic, normalize_document, normalize_phone
+
+# Passport / CNIC / phone-like input: mostly digits, optional short letter prefix
+IDENTIFIER_RE = re.compile(r'^[A-Za-z]{0,3}[\d\s+\-]{5,}$')
+TOKEN_RE = re.compile(r'\w+')
+# Trigram indexes only serve patterns of at least three characters
+MIN_SUBSTRING_LENGTH = 3
+
+
+def identifier_q(term):
+    """Match a raw phone / passport / CNIC against the normalized identifier columns"""
+    q = Q(pk__in=[])
+    for field, value in [
+        ('phone_normalized', normalize_phone(term)),
+        ('passport_normalized', normalize_document(term)),
+        ('cnic_normalized', normalize_cnic(term)),
+    ]:
+        if value:
+            q |= Q(**{field: value})
+    return q
+
+
+def substring_q(term):
+    """
+    Case-insensitive substring match on name and email, plus part of a phone,
+    CNIC or passport number in any formatting ("1234567" finds
+    "+92 300-1234567", "1234567" the middle of a CNIC). Each predicate is
+    served by a trigram index on PostgreSQL (clients migrations 0011, 0012).
+    """
+    q = Q(name__icontains=term) | Q(email__icontains=term)
+    digits = NON_DIGITS_RE.sub('', term)
+    if len(digits) >= MIN_SUBSTRING_LENGTH:
+        # Stored phones carry the country code instead of the local leading 0
+        phone = normalize_phone(digits)
+        q |= Q(phone_normalized__contains=phone[1:] if phone.startswith('0') else phone)
+        q |= Q(cnic_normalized__contains=digits)
+    document = normalize_document(term)
+    if document and len(document) >= MIN_SUBSTRING_LENGTH:
+        q |= Q(passport_normalized__contains=document)
+    return q
+
+
+def search_clients(queryset, term):
+    """
+    Filter clients matching `term`. Returns (queryset, ordering).
+
+    Identifier-like input (passport, CNIC, phone) is first tried as an exact,
+    index-backed match on the normalized identifier columns. Otherwise
+    clients match on a substring of their name, email or identifiers; on
+    PostgreSQL also every word of `term` as a prefix of the trigger-maintained
+    `search_document` (GIN indexed), with full-text matches ranked first.
+    """
+    term = term.strip()
+    ordering = ['-created_at']
+
+    if IDENTIFIER_RE.match(term):
+        exact = queryset.filter(identifier_q(term))
+        if exact.exists():
+            return exact, ordering
+
+    tokens = TOKEN_RE.findall(term)
+    if connections[queryset.db].vendor != 'postgresql' or not tokens:
+        return queryset.filter(substring_q(term)), ordering
+
+    # Every word must match as a prefix ("ali kh" => ali:* & kh:*)
+    query = SearchQuery(
+        ' & '.join(f'{token}:*' for token in tokens), search_type='raw', config='simple'
+    )
+    queryset = queryset.filter(Q(search_document=query) | substring_q(term)).annotate(
+        search_rank=SearchRank(F('search_document'), query)
+    )
+    return queryset, ['-search_rank', '-created_at']
@@ -1,5 +1,9 @@
 from rest_framework import serializers
-from .models import Client, ClientNote
+from .merge import MERGE_MAX_PAIRS
+from .models import Client, ClientMergeRecord, ClientNote, DuplicateClientSuggestion
+
+# Maintained financial summary of the client's bookings
+SUMMARY_FIELDS = ['bookings_count', 'total_billed', 'total_paid', 'outstanding', 'last_booking_at']
 
 
 class ClientNoteSerializer(serializers.ModelSerializer):
@@ -22,9 +26,31 @@ class ClientSerializer(serializers.ModelSerializer):
             'id', 'agency', 'name', 'phone_number', 'alternative_number',
             'email', 'passport_number', 'cnic', 'address',
             'created_by', 'created_by_name', 'notes',
+            *SUMMARY_FIELDS,
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'agency', 'created_by', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'agency', 'created_by', 'created_at', 'updated_at', *SUMMARY_FIELDS]
+
+
+class ClientListSerializer(serializers.ModelSerializer):
+    """
+    List representation: note totals instead of the nested notes
+    (`notes_count` / `last_note_at` are annotated by the view).
+    """
+    created_by_name = serializers.CharField(source='created_by.username', read_only=True)
+    notes_count = serializers.IntegerField(read_only=True)
+    last_note_at = serializers.DateTimeField(read_only=True)
+
+    class Meta:
+        model = Client
+        fields = [
+            'id', 'agency', 'name', 'phone_number', 'alternative_number',
+            'email', 'passport_number', 'cnic', 'address',
+            'created_by', 'created_by_name', 'notes_count', 'last_note_at',
+            *SUMMARY_FIELDS,
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
 
 
 class ClientCreateSerializer(serializers.ModelSerializer):
@@ -34,3 +60,48 @@ class ClientCreateSerializer(serializers.ModelSerializer):
             'name', 'phone_number', 'alternative_number',
             'email', 'passport_number', 'cnic', 'address'
         ]
+
+
+class ClientMergeSerializer(serializers.Serializer):
+    duplicates = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=MERGE_MAX_PAIRS)
+
+
+class ClientMergePairSerializer(serializers.Serializer):
+    survivor = serializers.IntegerField()
+    duplicate = serializers.IntegerField()
+
+
+class ClientMergeBatchSerializer(serializers.Serializer):
+    pairs = ClientMergePairSerializer(many=True, allow_empty=False, max_length=MERGE_MAX_PAIRS)
+
+
+class ClientMergeRecordSerializer(serializers.ModelSerializer):
+    merged_by_name = serializers.CharField(source='merged_by.username', read_only=True, default=None)
+
+    class Meta:
+        model = ClientMergeRecord
+        fields = [
+            'id', 'survivor', 'merged_client_ids', 'merged_clients', 'filled_fields',
+            'bookings_moved', 'notes_moved', 'merged_by', 'merged_by_name', 'created_at'
+        ]
+        read_only_fields = fields
+
+
+class ClientBriefSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Client
+        fields = [
+            'id', 'name', 'phone_number', 'email', 'passport_number', 'cnic',
+            'bookings_count', 'created_at'
+        ]
+        read_only_fields = fields
+
+
+class DuplicateClientSuggestionSerializer(serializers.ModelSerializer):
+    client = ClientBriefSerializer(read_only=True)
+    duplicate = ClientBriefSerializer(read_only=True)
+
+    class Meta:
+        model = DuplicateClientSuggestion
+        fields = ['id', 'client', 'duplicate', 'score', 'reasons', 'status', 'created_at']
+        read_only_fields = fields
@@ -0,0 +1,138 @@
+"""
+Fuzzy duplicate-client matching: blocking keys and pair scoring.
+
+Plain Python with no Django imports, so `score_blocks` can run in worker
+processes (see clients.duplicates). A client is a tuple
+(id, name, phone_normalized, cnic_normalized); `prepare` normalizes the
+names before blocking and scoring.
+
+Only clients sharing a blocking key are compared: the last digits of the
+phone number, a phonetic key of the name (tolerant to transliteration:
+"Muhammad Hussain" / "Mohammed Husain") or a CNIC prefix. Oversized blocks
+are compared within a sliding window instead of pairwise.
+"""
+import re
+from difflib import SequenceMatcher
+from itertools import combinations
+
+PHONE_SUFFIX_LENGTH = 7
+CNIC_PREFIX_LENGTH = 9
+# Blocks larger than this are compared within a window of sorted neighbours
+MAX_BLOCK_SIZE = 100
+WINDOW_SIZE = 20
+
+NAME_WEIGHT = 0.6
+NUMBER_WEIGHT = 0.4
+DEFAULT_MIN_SCORE = 0.75
+# Numbers less alike than this are treated as different numbers
+MIN_NUMBER_SIMILARITY = 0.8
+
+NAME_TOKEN_RE = re.compile(r'[a-z]+')
+# Romanised Urdu spelling variants that sound alike
+TRANSLITERATIONS = [('kh', 'k'), ('gh', 'g'), ('ph', 'f'), ('sh', 's'), ('th', 't'), ('dh', 'd'), ('q', 'k'), ('w', 'v')]
+# Dropped after the first letter, like Soundex ("Sara" == "Sarah", "Ahmed" == "Ahmad")
+VOWELS_RE = re.compile(r'[aeiouyh]+')
+REPEATS_RE = re.compile(r'(.)\1+')
+
+
+def normalize_name(name):
+    return ' '.join(NAME_TOKEN_RE.findall((name or '').lower()))
+
+
+def phonetic_token(token):
+    """First letter, then the consonants (digraphs folded, repeats collapsed)"""
+    for source, target in TRANSLITERATIONS:
+        token = token.replace(source, target)
+    token = REPEATS_RE.sub(r'\1', token)
+    return token[:1] + VOWELS_RE.sub('', token[1:])
+
+
+def name_key(name):
+    """Order-insensitive phonetic key of a name ("Ali Khan" == "Khan Aly")"""
+    return ' '.join(sorted(phonetic_token(token) for token in normalize_name(name).split()))
+
+
+def prepare(clients):
+    """Normalize the names once: [(id, normalized name, phone, cnic), ...]"""
+    return [(pk, normalize_name(name), phone, cnic) for pk, name, phone, cnic in clients]
+
+
+def blocking_keys(client):
+    _, name, phone, cnic = client
+    keys = []
+    if phone and len(phone) >= PHONE_SUFFIX_LENGTH:
+        keys.append(('phone', phone[-PHONE_SUFFIX_LENGTH:]))
+    if key := name_key(name):
+        keys.append(('name', key))
+    if cnic and len(cnic) >= CNIC_PREFIX_LENGTH:
+        keys.append(('cnic', cnic[:CNIC_PREFIX_LENGTH]))
+    return keys
+
+
+def build_blocks(clients):
+    """{(kind, key): [client, ...]} for blocks of two or more prepared clients"""
+    blocks = {}
+    for client in clients:
+        for key in blocking_keys(client):
+            blocks.setdefault(key, []).append(client)
+    return {key: members for key, members in blocks.items() if len(members) > 1}
+
+
+def number_similarity(a, b):
+    """
+    Similarity of two phone / CNIC numbers, counted only when they look like
+    the same number with a typo: digit-wise for equal lengths (a swapped or
+    mistyped digit), difflib otherwise (a missing or extra digit). Unrelated
+    numbers score 0 however many digits they happen to share.
+    """
+    if not a or not b:
+        return 0.0
+    if len(a) == len(b):
+        similarity = sum(x == y for x, y in zip(a, b)) / len(a)
+    elif abs(len(a) - len(b)) == 1:
+        similarity = SequenceMatcher(None, a, b).ratio()
+    else:
+        return 0.0
+    return similarity if similarity >= MIN_NUMBER_SIMILARITY else 0.0
+
+
+def score_pair(a, b, min_score=DEFAULT_MIN_SCORE):
+    """Similarity in [0, 1] of two prepared clients, or None below `min_score`"""
+    names = SequenceMatcher(None, a[1], b[1])
+    # Cheapest bounds first: the name length ratio with a perfect number match
+    if NAME_WEIGHT * names.real_quick_ratio() + NUMBER_WEIGHT < min_score:
+        return None
+    number = max(number_similarity(a[2], b[2]), number_similarity(a[3], b[3]))
+    for bound in (names.real_quick_ratio, names.quick_ratio, names.ratio):
+        score = NAME_WEIGHT * bound() + NUMBER_WEIGHT * number
+        if score < min_score:
+            return None
+    return round(score, 3)
+
+
+def _candidate_pairs(members):
+    if len(members) <= MAX_BLOCK_SIZE:
+        return combinations(members, 2)
+    members = sorted(members, key=lambda client: client[1])
+    return (
+        (client, other)
+        for index, client in enumerate(members)
+        for other in members[index + 1:index + WINDOW_SIZE]
+    )
+
+
+def score_blocks(blocks, min_score=DEFAULT_MIN_SCORE):
+    """
+    Score the candidate pairs of `blocks` ([(kind, members), ...]).
+    Returns [(lower id, higher id, score, kind), ...] above `min_score`.
+    """
+    found = []
+    for kind, members in blocks:
+        for a, b in _candidate_pairs(members):
+            if a[0] == b[0]:
+                continue
+            score = score_pair(a, b, min_score)
+            if score is not None:
+                low, high = sorted([a[0], b[0]])
+                found.append((low, high, score, kind))
+    return found
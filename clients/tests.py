@@ -1,3 +1,463 @@
-from django.test import TestCase
+import base64
+import importlib
+import io
+import json
+import os
+import random
+import time
+from decimal import Decimal
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from agencies.models import Agency
+from bookings.models import Booking
+from services.models import Service
+from users.models import User
+from .duplicates import find_duplicates, refresh_suggestions
+from .imports import ClientImporter, read_rows
+from .models import Client, ClientMergeRecord, ClientNote, DuplicateClientSuggestion
+from .search import search_clients
+from .similarity import build_blocks, name_key
+
+
+class ClientTestMixin:
+    """Shared fixtures: one agency with an owner."""
+
+    def setUp(self):
+        cache.clear()
+        self.agency = Agency.objects.create(name='Test Agency')
+        self.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='pass',
+            agency=self.agency, role='agency_owner'
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.owner)
+
+
+class ClientImportTests(ClientTestMixin, TestCase):
+    def upload(self, name, content, **params):
+        query = '&'.join(f'{key}={value}' for key, value in params.items())
+        return self.api.post(
+            f'/api/clients/import/?{query}',
+            {'file': SimpleUploadedFile(name, content.encode())},
+            format='multipart',
+        )
+
+    def test_csv_import_matches_normalized_identifiers(self):
+        existing = Client.objects.create(agency=self.agency, name='Ali', phone_number='+92 300-1234567')
+        by_passport = Client.objects.create(agency=self.agency, name='Sara', phone_number='0311', passport_number='AB1234567')
+        csv_file = (
+            'name,phone_number,passport_number,cnic,email\n'
+            'Ali Khan,03001234567,,,ali@example.com\n'
+            'Sara B,0322 0000000,ab1234567,,\n'
+            'New Client,0333 1111111,,35202-1234567-1,\n'
+            'New Client again,+92 333 1111111,,3520212345671,\n'
+            ',0344,,,\n'
+        )
+        response = self.upload('clients.csv', csv_file)
+        summary = response.json()
+        self.assertEqual(
+            {key: summary[key] for key in ['processed', 'created', 'updated', 'merged', 'failed']},
+            {'processed': 5, 'created': 1, 'updated': 2, 'merged': 1, 'failed': 1},
+        )
+        self.assertEqual(summary['errors'][0]['row'], 6)
+        self.assertIn('name', summary['errors'][0]['errors'])
+
+        existing.refresh_from_db()
+        by_passport.refresh_from_db()
+        self.assertEqual((existing.name, existing.email), ('Ali Khan', 'ali@example.com'))
+        self.assertEqual(by_passport.phone_number, '0322 0000000')
+        self.assertEqual(Client.objects.get(cnic='3520212345671').name, 'New Client again')
+        self.assertEqual(Client.objects.count(), 3)
+
+    def test_ndjson_import_streams_progress_per_chunk(self):
+        lines = [json.dumps({'name': f'Client {i}', 'phone_number': f'0300{i:07d}'}) for i in range(25)]
+        lines.append('not json')
+        importer = ClientImporter(self.agency, self.owner, chunk_size=10)
+        progress = list(importer.run(read_rows(SimpleUploadedFile('c.ndjson', '\n'.join(lines).encode()), 'ndjson')))
+        self.assertEqual([counts['processed'] for counts in progress], [10, 20, 26])
+        self.assertEqual(importer.summary()['failed'], 1)
+
+        # Re-importing the same file updates instead of duplicating
+        response = self.upload('clients.ndjson', '\n'.join(lines[:25]), stream=1)
+        report = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(report[-1]['updated'], 25)
+        self.assertEqual(Client.objects.count(), 25)
+
+
+    @override_settings(IMPORT_MAX_SYNC_ROWS=3)
+    def test_large_files_are_sent_to_the_management_command(self):
+        lines = '\n'.join(json.dumps({'name': f'Client {i}'}) for i in range(4))
+        response = self.upload('clients.ndjson', lines)
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('import_clients', response.json()['error'])
+        self.assertEqual(Client.objects.count(), 0)
+
+        response = self.upload('clients.csv', 'name,phone_number\nA,0300\nB,0311\nC,0322\n')
+        self.assertEqual(response.json()['created'], 3)
+
+
+class ClientIdentifierTests(ClientTestMixin, TestCase):
+    def test_identifiers_are_normalized_on_save(self):
+        client = Client.objects.create(
+            agency=self.agency, name='Ali', phone_number='+92 300-1234567',
+            passport_number='ab 123 4567', cnic='35202-1234567-1'
+        )
+        self.assertEqual(
+            (client.phone_normalized, client.passport_normalized, client.cnic_normalized),
+            ('923001234567', 'AB1234567', '3520212345671'),
+        )
+
+    def test_lookup_resolves_any_spelling_in_one_query(self):
+        client = Client.objects.create(agency=self.agency, name='Ali', phone_number='0300 1234567', cnic='3520212345671')
+        Client.objects.create(agency=Agency.objects.create(name='Other'), name='Ali', phone_number='03001234567')
+        for term in ['+923001234567', '0300-1234567', '35202-1234567-1']:
+            with self.subTest(term=term), self.assertNumQueries(2):  # clients + their notes
+                results = self.api.get('/api/clients/lookup/', {'q': term}).json()['results']
+            self.assertEqual([row['id'] for row in results], [client.id])
+        self.assertEqual(self.api.get('/api/clients/lookup/', {'q': '0311'}).json()['results'], [])
+
+    def test_backfill_command(self):
+        client = Client.objects.create(agency=self.agency, name='Ali', phone_number='03001234567')
+        Client.objects.filter(pk=client.pk).update(phone_normalized=None)
+        call_command('backfill_client_identifiers', batch_size=1, stdout=io.StringIO())
+        client.refresh_from_db()
+        self.assertEqual(client.phone_normalized, '923001234567')
+
+    def test_migration_backfills_existing_clients(self):
+        migration = importlib.import_module('clients.migrations.0006_client_normalized_identifiers')
+        client = Client.objects.create(agency=self.agency, name='Ali', phone_number='0300 1234567', cnic='35202-1234567-1')
+        Client.objects.filter(pk=client.pk).update(phone_normalized=None, cnic_normalized=None)
+        migration.backfill_normalized_identifiers(apps, None)
+        client.refresh_from_db()
+        self.assertEqual((client.phone_normalized, client.cnic_normalized), ('923001234567', '3520212345671'))
+
+
+class ClientSearchTests(ClientTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client_row = Client.objects.create(
+            agency=self.agency, name='Bilal Qureshi', phone_number='+92 300-1234567',
+            email='bilal.q@gmail.com', passport_number='AB1234567', cnic='35202-7654321-1'
+        )
+        Client.objects.create(agency=self.agency, name='Ayesha Khan', phone_number='03217654000')
+
+    def search(self, term):
+        return [row['id'] for row in self.api.get('/api/clients/', {'search': term}).json()['results']]
+
+    def test_name_words_and_substrings(self):
+        terms = ['bilal', 'ureshi', 'l Qu']
+        if connection.vendor == 'postgresql':
+            terms.append('Bil Qur')  # word prefixes, full-text only
+        for term in terms:
+            with self.subTest(term=term):
+                self.assertEqual(self.search(term), [self.client_row.id])
+
+    def test_identifier_and_email_substrings(self):
+        # Exact identifiers, then parts of them in any formatting, then an email domain
+        for term in ['0300 1234567', 'AB1234567', '1234567', '300-123', '7654321', 'b12345', 'gmail']:
+            with self.subTest(term=term):
+                self.assertEqual(self.search(term), [self.client_row.id])
+        self.assertEqual(self.search('99999'), [])
+
+
+class ClientNotesTests(ClientTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.clients = [Client.objects.create(agency=self.agency, name=f'Client {i}', phone_number=f'0300{i:07d}') for i in range(5)]
+        for client in self.clients:
+            for i in range(3):
+                ClientNote.objects.create(client=client, note=f'Note {i}', created_by=self.owner)
+
+    def test_list_returns_note_totals_in_constant_queries(self):
+        with self.assertNumQueries(2):  # count + page
+            results = self.api.get('/api/clients/').json()['results']
+        self.assertEqual(len(results), 5)
+        self.assertNotIn('notes', results[0])
+        self.assertEqual(results[0]['notes_count'], 3)
+        self.assertIsNotNone(results[0]['last_note_at'])
+
+    def test_retrieve_and_notes_sub_resource(self):
+        client = self.clients[0]
+        with self.assertNumQueries(2):  # client + notes with their authors
+            data = self.api.get(f'/api/clients/{client.id}/').json()
+        self.assertEqual([note['created_by_name'] for note in data['notes']], ['owner'] * 3)
+
+        response = self.api.post(f'/api/clients/{client.id}/notes/', {'note': 'Called back'})
+        self.assertEqual(response.status_code, 201)
+        page = self.api.get(f'/api/clients/{client.id}/notes/', {'pagination': 'cursor'}).json()
+        self.assertEqual([note['note'] for note in page['results']], ['Called back', 'Note 2', 'Note 1', 'Note 0'])
+        self.assertIsNone(page['next'])
+
+
+class ClientSummaryFilterTests(ClientTestMixin, TestCase):
+    def test_has_balance_and_ordering(self):
+        for i in range(25):
+            client = Client.objects.create(agency=self.agency, name=f'Client {i}', phone_number='0300')
+            Client.objects.filter(pk=client.pk).update(outstanding=Decimal(i * 10))
+
+        results = self.api.get('/api/clients/', {'has_balance': 1, 'ordering': '-outstanding'}).json()['results']
+        self.assertEqual([row['outstanding'] for row in results[:2]], ['240.00', '230.00'])
+        settled = self.api.get('/api/clients/', {'has_balance': 0}).json()['results']
+        self.assertEqual([row['name'] for row in settled], ['Client 0'])
+
+        # Cursor pages follow the requested ordering
+        page = self.api.get('/api/clients/', {'ordering': '-outstanding', 'pagination': 'cursor'}).json()
+        rest = self.api.get(page['next']).json()['results']
+        self.assertEqual(
+            [Decimal(row['outstanding']) for row in page['results'] + rest],
+            [Decimal(i * 10) for i in reversed(range(25))],
+        )
+
+
+class ClientKeysetPaginationTests(ClientTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # Three outstanding values shared by many clients: pages split inside ties
+        for i in range(45):
+            client = Client.objects.create(agency=self.agency, name=f'Client {i}', phone_number='0300')
+            Client.objects.filter(pk=client.pk).update(outstanding=Decimal(i % 3 * 10))
+        self.expected = list(Client.objects.order_by('-outstanding', '-id').values_list('id', flat=True))
+
+    def ids(self, page):
+        return [row['id'] for row in page['results']]
+
+    def cursor(self, value, pk=1):
+        token = json.dumps({'v': value, 'id': pk, 'r': False}).encode()
+        return base64.urlsafe_b64encode(token).decode()
+
+    def test_forward_and_backward_paging_through_ties(self):
+        pages = [self.api.get('/api/clients/', {'ordering': '-outstanding', 'pagination': 'cursor'}).json()]
+        while pages[-1]['next']:
+            pages.append(self.api.get(pages[-1]['next']).json())
+        self.assertEqual([len(page['results']) for page in pages], [20, 20, 5])
+        self.assertEqual([pk for page in pages for pk in self.ids(page)], self.expected)
+        self.assertIsNone(pages[0]['previous'])
+
+        # Following `previous` from the last page walks back over the same pages
+        back = self.api.get(pages[2]['previous']).json()
+        self.assertEqual(self.ids(back), self.ids(pages[1]))
+        back = self.api.get(back['previous']).json()
+        self.assertEqual(self.ids(back), self.ids(pages[0]))
+        self.assertIsNone(back['previous'])
+
+    def test_page_numbers_and_cursors_agree_on_null_keys(self):
+        # Clients without bookings have no last_booking_at: listed last in both modes
+        booked = self.expected[::3]
+        for pk in booked:
+            Client.objects.filter(pk=pk).update(last_booking_at=timezone.now())
+        params = {'ordering': '-last_booking_at'}
+        numbered = [
+            pk for n in (1, 2, 3)
+            for pk in self.ids(self.api.get('/api/clients/', {**params, 'page': n}).json())
+        ]
+        cursor = self.api.get('/api/clients/', {**params, 'pagination': 'cursor'}).json()
+        cursor_ids = self.ids(cursor)
+        while cursor['next']:
+            cursor = self.api.get(cursor['next']).json()
+            cursor_ids += self.ids(cursor)
+        self.assertEqual(numbered, cursor_ids)
+        self.assertCountEqual(numbered[:len(booked)], booked)
+
+    def test_invalid_cursor_is_not_found(self):
+        for params in [
+            {'cursor': 'not-a-cursor'},
+            {'cursor': self.cursor('yesterday')},
+            {'cursor': self.cursor('lots'), 'ordering': '-outstanding'},
+            {'cursor': self.cursor(['10.00']), 'ordering': '-outstanding'},
+        ]:
+            with self.subTest(params=params):
+                self.assertEqual(self.api.get('/api/clients/', params).status_code, 404)
+
+    def test_notes_ignore_the_client_list_ordering(self):
+        client = Client.objects.get(pk=self.expected[0])
+        ClientNote.objects.create(client=client, note='Called', created_by=self.owner)
+        response = self.api.get(
+            f'/api/clients/{client.id}/notes/', {'ordering': '-outstanding', 'pagination': 'cursor'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([note['note'] for note in response.json()['results']], ['Called'])
+
+
+class ClientMergeTests(ClientTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.service = Service.objects.create(
+            agency=self.agency, service_name='Umrah Package', service_include=[],
+            service_base_cost=Decimal('1000.00'), service_profit=Decimal('200.00'),
+            service_duration='10 days', destination='Makkah'
+        )
+        self.clients = [
+            Client.objects.create(agency=self.agency, name=f'Ali {i}', phone_number='03001234567') for i in range(4)
+        ]
+        for client in self.clients:
+            Booking.objects.create(agency=self.agency, client=client, service=self.service, paid_amount=Decimal('200.00'))
+            ClientNote.objects.create(client=client, note='Called', created_by=self.owner)
+
+    def test_merge_moves_history_and_keeps_audit_record(self):
+        survivor, *duplicates = self.clients[:3]
+        duplicates[0].email = 'ali@example.com'
+        duplicates[0].save()
+
+        response = self.api.post(f'/api/clients/{survivor.id}/merge/', {'duplicates': [d.id for d in duplicates]}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        record = ClientMergeRecord.objects.get()
+        self.assertEqual((record.bookings_moved, record.notes_moved, record.filled_fields), (2, 2, ['email']))
+        self.assertEqual([c['id'] for c in record.merged_clients], [d.id for d in duplicates])
+
+        survivor.refresh_from_db()
+        self.assertEqual((survivor.email, survivor.bookings_count, survivor.outstanding), ('ali@example.com', 3, Decimal('3000.00')))
+        self.assertEqual(survivor.notes.count(), 3)
+        self.assertFalse(Client.objects.filter(pk__in=[d.id for d in duplicates]).exists())
+
+        foreign = Client.objects.create(agency=Agency.objects.create(name='Other'), name='Ali', phone_number='0300')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.post(f'/api/clients/{survivor.id}/merge/', {'duplicates': [foreign.id]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        # Refused before another agency's bookings are read, let alone locked
+        self.assertFalse([q for q in ctx.captured_queries if '"bookings_booking"' in q['sql']])
+
+    def test_batch_merges_chains_in_short_transactions(self):
+        a, b, c, d = self.clients
+        pairs = [{'survivor': a.id, 'duplicate': b.id}, {'survivor': b.id, 'duplicate': c.id}, {'survivor': d.id, 'duplicate': 0}]
+        summary = self.api.post('/api/clients/merge_batch/', {'pairs': pairs}, format='json').json()
+        self.assertEqual(summary['merged'], 2)
+        self.assertEqual([error['survivor'] for error in summary['errors']], [d.id])
+        self.assertEqual(Booking.objects.filter(client=a).count(), 3)
+        self.assertEqual(self.api.get('/api/clients/merge_history/').json()['count'], 1)
+
+    def test_agents_cannot_merge(self):
+        agent = User.objects.create_user(username='agent', password='pass', agency=self.agency, role='agent')
+        self.api.force_authenticate(agent)
+        response = self.api.post(f'/api/clients/{self.clients[0].id}/merge/', {'duplicates': [self.clients[1].id]}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class DuplicateDetectionTests(ClientTestMixin, TestCase):
+    def make(self, name, phone='', cnic=''):
+        return Client.objects.create(agency=self.agency, name=name, phone_number=phone, cnic=cnic or None)
+
+    def test_phonetic_name_key_tolerates_transliteration(self):
+        self.assertEqual(name_key('Muhammad Hussain'), name_key('Mohammad Husain'))
+        self.assertEqual(name_key('Ali Khan'), name_key('khan aly'))
+        self.assertNotEqual(name_key('Ali Khan'), name_key('Bilal Khan'))
+
+    def test_job_ranks_likely_duplicates(self):
+        ali = self.make('Muhammad Ali Khan', '03001234567')
+        ali_typo = self.make('Mohammad Aly Khan', '03001234576')
+        sara = self.make('Sara Ahmed', '03111111111', '3520212345671')
+        sarah = self.make('Sarah Ahmad', '03229999999', '3520212345617')
+        self.make('Bilal Qureshi', '03001234567')  # same phone, different person
+        self.make('Zainab Malik', '03450000000')
+
+        self.assertEqual(refresh_suggestions(self.agency, workers=1), 2)
+        pairs = {(s.client_id, s.duplicate_id): s.reasons for s in DuplicateClientSuggestion.objects.all()}
+        self.assertEqual(set(pairs), {(ali.id, ali_typo.id), (sara.id, sarah.id)})
+        self.assertEqual(pairs[sara.id, sarah.id], ['cnic', 'name'])
+
+        # Dismissed pairs are not suggested again
+        suggestion = DuplicateClientSuggestion.objects.get(client=ali)
+        self.api.post(f'/api/client-duplicates/{suggestion.id}/dismiss/')
+        self.assertEqual(refresh_suggestions(self.agency, workers=1), 1)
+        results = self.api.get('/api/client-duplicates/').json()['results']
+        self.assertEqual([(row['client']['id'], row['duplicate']['id']) for row in results], [(sara.id, sarah.id)])
+
+        response = self.api.post(f"/api/client-duplicates/{results[0]['id']}/merge/", {'survivor': sarah.id}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertFalse(Client.objects.filter(pk=sara.id).exists())
+        self.assertFalse(DuplicateClientSuggestion.objects.filter(status='pending').exists())
+
+    def test_process_pool_matches_inline_scoring(self):
+        clients = [(i, f'Client {i % 50}', f'92300{i % 500:07d}', None) for i in range(2000)]
+        self.assertEqual(find_duplicates(clients, workers=2), find_duplicates(clients, workers=1))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN plans are PostgreSQL specific')
+class ClientSearchPlanTests(ClientTestMixin, TestCase):
+    def plan(self, term):
+        Client.objects.create(agency=self.agency, name='Bilal Qureshi', phone_number='03001234567')
+        with connection.cursor() as cursor:
+            # Tiny test tables would otherwise always be scanned sequentially
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        queryset, _ = search_clients(Client.objects.all(), term)
+        return queryset.explain()
+
+    def test_word_and_substring_search_use_indexes(self):
+        for term, index in [('bilal', 'client_search_document_idx'), ('1234567', 'client_phone_norm_trgm_idx')]:
+            with self.subTest(term=term):
+                plan = self.plan(term)
+                self.assertNotIn('Seq Scan on clients_client', plan, plan)
+                self.assertIn(index, plan)
+
+
+@skipUnless(os.getenv('RUN_BENCHMARKS'), 'set RUN_BENCHMARKS=1 to run benchmarks')
+class ClientSearchBenchmark(ClientTestMixin, TestCase):
+    """
+    Search latency on one agency with BENCHMARK_CLIENTS clients (500k by
+    default); fails on PostgreSQL when a median exceeds 20 ms. Run with:
+    RUN_BENCHMARKS=1 python manage.py test clients.tests.ClientSearchBenchmark
+    """
+    rows = int(os.getenv('BENCHMARK_CLIENTS', 500_000))
+    target_ms = 20
+
+    def test_search_latency(self):
+        rng = random.Random(0)
+        names = ['Muhammad', 'Ayesha', 'Bilal', 'Fatima', 'Usman', 'Zainab', 'Hamza', 'Khadija', 'Qureshi', 'Malik']
+        for start in range(0, self.rows, 10_000):
+            Client.objects.bulk_create([
+                Client(
+                    agency=self.agency, name=f'{rng.choice(names)} {rng.choice(names)} {i}',
+                    phone_number=f'0300{i:07d}', email=f'client{i}@example.com',
+                    phone_normalized=f'92300{i:07d}',
+                )
+                for i in range(start, min(start + 10_000, self.rows))
+            ])
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE clients_client')
+
+        print(f'\nClient search, {self.rows} clients (median ms, first page)')
+        for term in ['Bilal Qur', '03001234567', '1234567', 'client4242@']:
+            timings = []
+            for _ in range(5):
+                queryset, ordering = search_clients(Client.objects.filter(agency=self.agency), term)
+                start = time.perf_counter()
+                list(queryset.order_by(*ordering)[:20])
+                timings.append((time.perf_counter() - start) * 1000)
+            median = sorted(timings)[2]
+            print(f'  {term!r}: {median:.1f}')
+            if connection.vendor == 'postgresql':
+                self.assertLess(median, self.target_ms, term)
+
+
+@skipUnless(os.getenv('RUN_BENCHMARKS'), 'set RUN_BENCHMARKS=1 to run benchmarks')
+class DuplicateDetectionBenchmark(SimpleTestCase):
+    """
+    Scoring time for BENCHMARK_CLIENTS synthetic clients (500k by default). Run with:
+    RUN_BENCHMARKS=1 python manage.py test clients.tests.DuplicateDetectionBenchmark
+    """
+    rows = int(os.getenv('BENCHMARK_CLIENTS', 500_000))
+    first_names = ['Muhammad', 'Ayesha', 'Bilal', 'Fatima', 'Usman', 'Zainab', 'Hamza', 'Khadija']
+    last_names = ['Khan', 'Qureshi', 'Chaudhry', 'Siddiqui', 'Malik', 'Sheikh', 'Butt', 'Raza']
+
+    def test_scan(self):
+        rng = random.Random(0)
+        clients = [
+            (i, f'{rng.choice(self.first_names)} {rng.choice(self.last_names)} {rng.randrange(10_000)}',
+             f'923{rng.randrange(10 ** 9):09d}', f'{rng.randrange(10 ** 13):013d}')
+            for i in range(self.rows)
+        ]
+        start = time.perf_counter()
+        pairs = find_duplicates(clients)
+        print(f'\n{self.rows} clients, {len(build_blocks(clients))} blocks: '
+              f'{len(pairs)} pairs in {time.perf_counter() - start:.1f}s')
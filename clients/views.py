@@ -1,11 +1,65 @@
+import json
+
+from django.conf import settings
+from django.db.models import Count, IntegerField, Max, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q
-from .models import Client, ClientNote
-from .serializers import ClientSerializer, ClientCreateSerializer, ClientNoteSerializer
+from .imports import ClientImporter, count_rows, detect_file_type, read_rows
+from .merge import MergeError, merge_clients, merge_pairs
+from .models import Client, ClientMergeRecord, ClientNote, DuplicateClientSuggestion
+from .search import identifier_q, search_clients
+from .serializers import (
+    ClientSerializer, ClientCreateSerializer, ClientListSerializer, ClientNoteSerializer,
+    ClientMergeSerializer, ClientMergeBatchSerializer, ClientMergeRecordSerializer,
+    DuplicateClientSuggestionSerializer,
+)
 from users.permissions import CanAccessClients, AgencyDataIsolation
+from travel_agency_saas.exports import export_response
+from travel_agency_saas.pagination import KeysetPagination, keyset_order_by
+
+# Max clients returned for one identifier (duplicates can share it)
+CLIENT_LOOKUP_LIMIT = 10
+
+# (values() field, column header) of client exports
+CLIENT_EXPORT_COLUMNS = [
+    ('id', 'Client ID'),
+    ('name', 'Name'),
+    ('phone_number', 'Phone'),
+    ('alternative_number', 'Alternative Number'),
+    ('email', 'Email'),
+    ('passport_number', 'Passport'),
+    ('cnic', 'CNIC'),
+    ('address', 'Address'),
+    ('bookings_count', 'Bookings'),
+    ('total_billed', 'Total Billed'),
+    ('total_paid', 'Total Paid'),
+    ('outstanding', 'Outstanding'),
+    ('last_booking_at', 'Last Booking'),
+    ('created_at', 'Created At'),
+    ('created_by__username', 'Created By'),
+]
+
+# ?ordering= values, each backed by an (agency, field) index
+CLIENT_ORDERINGS = ['created_at', 'outstanding', 'total_billed', 'last_booking_at']
+
+
+def with_note_totals(queryset):
+    """
+    Annotate `notes_count` and `last_note_at` with correlated subqueries
+    (one index range scan per client row, no GROUP BY over client columns).
+    """
+    notes = ClientNote.objects.filter(client=OuterRef('pk')).order_by().values('client')
+    return queryset.annotate(
+        notes_count=Coalesce(
+            Subquery(notes.annotate(total=Count('pk')).values('total'), output_field=IntegerField()),
+            Value(0),
+        ),
+        last_note_at=Subquery(notes.annotate(latest=Max('created_at')).values('latest')),
+    )
 
 
 class ClientViewSet(viewsets.ModelViewSet):
@@ -15,10 +69,14 @@ class ClientViewSet(viewsets.ModelViewSet):
     """
     queryset = Client.objects.all()
     permission_classes = [IsAuthenticated, CanAccessClients, AgencyDataIsolation]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-id')
 
     def get_serializer_class(self):
         if self.action == 'create':
             return ClientCreateSerializer
+        if self.action == 'list':
+            return ClientListSerializer
         return ClientSerializer
 
     def get_queryset(self):
@@ -26,17 +84,42 @@ class ClientViewSet(viewsets.ModelViewSet):
         user = self.request.user
         queryset = Client.objects.filter(agency=user.agency)
 
+        # Same order as cursor mode, ties broken by id so pages never overlap
+        ordering = keyset_order_by(self.keyset_ordering)
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) |
-                Q(phone_number__icontains=search) |
-                Q(email__icontains=search) |
-                Q(passport_number__icontains=search) |
-                Q(cnic__icontains=search)
+            queryset, ordering = search_clients(queryset, search)
+            ordering = [*ordering, '-id']
+
+        # Filter by creation date range
+        start_date = self.request.query_params.get('start_date', None)
+        end_date = self.request.query_params.get('end_date', None)
+        if start_date:
+            queryset = queryset.filter(created_at__date__gte=start_date)
+        if end_date:
+            queryset = queryset.filter(created_at__date__lte=end_date)
+
+        # has_balance=1 => still owes money, has_balance=0 => settled
+        has_balance = self.request.query_params.get('has_balance', None)
+        if has_balance in ['1', 'true', 'True']:
+            queryset = queryset.filter(outstanding__gt=0)
+        elif has_balance in ['0', 'false', 'False']:
+            queryset = queryset.filter(outstanding__lte=0)
+
+        # ordering=-outstanding => biggest debtors first, -total_billed => top clients
+        order = self.request.query_params.get('ordering', None)
+        if order and order.lstrip('-') in CLIENT_ORDERINGS:
+            self.keyset_ordering = (order, '-id' if order.startswith('-') else 'id')
+            ordering = keyset_order_by(self.keyset_ordering)
+
+        if self.action == 'list':
+            queryset = with_note_totals(queryset).select_related('created_by')
+        elif self.action in ['retrieve', 'update', 'partial_update']:
+            queryset = queryset.select_related('created_by').prefetch_related(
+                Prefetch('notes', queryset=ClientNote.objects.select_related('created_by'))
             )
 
-        return queryset.order_by('-created_at')
+        return queryset.order_by(*ordering)
 
     def perform_create(self, serializer):
         """Automatically set agency and created_by when creating client"""
@@ -45,6 +128,130 @@ class ClientViewSet(viewsets.ModelViewSet):
             created_by=self.request.user
         )
 
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream clients as CSV / XLSX (?file_type=xlsx).
+        Accepts the same filters as the list endpoint.
+        """
+        return export_response(request, self.get_queryset(), CLIENT_EXPORT_COLUMNS, 'clients')
+
+    @action(detail=False, methods=['get'], url_path='lookup')
+    def lookup_identifier(self, request):
+        """
+        Resolve a raw phone number, passport or CNIC (?q=) to the agency's
+        matching clients with one indexed query on the normalized columns.
+        """
+        term = request.query_params.get('q', '').strip()
+        if not term:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        clients = Client.objects.filter(identifier_q(term), agency=request.user.agency).select_related(
+            'created_by'
+        ).prefetch_related(
+            Prefetch('notes', queryset=ClientNote.objects.select_related('created_by'))
+        ).order_by('-created_at')[:CLIENT_LOOKUP_LIMIT]
+        return Response({'results': ClientSerializer(clients, many=True).data})
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_file(self, request):
+        """
+        Import clients from an uploaded CSV / NDJSON `file` (?file_type= to
+        override the extension). Rows matching an existing client by phone,
+        passport or CNIC update it. With ?stream=1 the response is NDJSON:
+        one progress line per chunk, then the summary. Files over
+        IMPORT_MAX_SYNC_ROWS rows are refused (413); import those with the
+        import_clients management command.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            file_type = detect_file_type(upload.name, request.query_params.get('file_type'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_rows = settings.IMPORT_MAX_SYNC_ROWS
+        if count_rows(upload, file_type, max_rows) > max_rows:
+            return Response({
+                'error': f'File has more than {max_rows} rows. Import it with '
+                         f'`python manage.py import_clients <file> --agency {request.user.agency_id}`.'
+            }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        importer = ClientImporter(request.user.agency, request.user)
+        progress = importer.run(read_rows(upload, file_type))
+
+        if request.query_params.get('stream') in ['1', 'true', 'True']:
+            def lines():
+                for counts in progress:
+                    yield json.dumps(counts) + '\n'
+                yield json.dumps(importer.summary()) + '\n'
+            return StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+
+        for _ in progress:
+            pass
+        return Response(importer.summary())
+
+    @action(detail=True, methods=['post'])
+    def merge(self, request, pk=None):
+        """
+        Merge duplicate clients into this one: {"duplicates": [12, 15]}.
+        Their bookings and notes move here and the duplicates are deleted.
+        """
+        if request.user.role == 'agent':
+            return Response({'error': 'Only owner or manager can merge clients.'},
+                            status=status.HTTP_403_FORBIDDEN)
+        survivor = self.get_object()
+        serializer = ClientMergeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            record = merge_clients(
+                request.user.agency, survivor.id, serializer.validated_data['duplicates'], request.user
+            )
+        except MergeError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(ClientMergeRecordSerializer(record).data)
+
+    @action(detail=False, methods=['post'])
+    def merge_batch(self, request):
+        """
+        Merge confirmed duplicate pairs:
+        {"pairs": [{"survivor": 1, "duplicate": 2}, ...]}
+        Each surviving client is merged in its own short transaction;
+        failures are reported per group and do not stop the batch.
+        """
+        if request.user.role == 'agent':
+            return Response({'error': 'Only owner or manager can merge clients.'},
+                            status=status.HTTP_403_FORBIDDEN)
+        serializer = ClientMergeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        summary = merge_pairs(
+            request.user.agency,
+            [(pair['survivor'], pair['duplicate']) for pair in serializer.validated_data['pairs']],
+            request.user,
+        )
+        return Response(summary)
+
+    @action(detail=False, methods=['get'])
+    def merge_history(self, request):
+        """Merge audit records of the agency (newest first)"""
+        records = ClientMergeRecord.objects.filter(agency=request.user.agency).select_related('merged_by')
+        page = self.paginate_queryset(records)
+        return self.get_paginated_response(ClientMergeRecordSerializer(page, many=True).data)
+
+    @action(detail=True, methods=['get', 'post'])
+    def notes(self, request, pk=None):
+        """Notes of a client (newest first, paginated), or add a note"""
+        if request.method == 'POST':
+            return self.add_note(request, pk)
+
+        client = self.get_object()
+        notes = client.notes.select_related('created_by')
+        # Not the client list's ?ordering, which names Client fields
+        self.keyset_ordering = ('-created_at', '-id')
+        page = self.paginate_queryset(notes)
+        return self.get_paginated_response(ClientNoteSerializer(page, many=True).data)
+
     @action(detail=True, methods=['post'])
     def add_note(self, request, pk=None):
         """Add a note to a client"""
@@ -67,6 +274,8 @@ class ClientNoteViewSet(viewsets.ModelViewSet):
     queryset = ClientNote.objects.all()
     serializer_class = ClientNoteSerializer
     permission_classes = [IsAuthenticated, CanAccessClients]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         """Filter notes by agency"""
@@ -76,3 +285,51 @@ class ClientNoteViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         """Automatically set created_by when creating note"""
         serializer.save(created_by=self.request.user)
+
+
+class DuplicateClientSuggestionViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Likely duplicate clients found by the `find_duplicate_clients` job,
+    best match first. ?status=dismissed lists dismissed pairs.
+    """
+    serializer_class = DuplicateClientSuggestionSerializer
+    permission_classes = [IsAuthenticated, CanAccessClients, AgencyDataIsolation]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-score', '-id')
+
+    def get_queryset(self):
+        suggestion_status = self.request.query_params.get('status', DuplicateClientSuggestion.STATUS_PENDING)
+        return DuplicateClientSuggestion.objects.filter(
+            agency=self.request.user.agency, status=suggestion_status
+        ).select_related('client', 'duplicate').order_by('-score', '-id')
+
+    @action(detail=True, methods=['post'])
+    def dismiss(self, request, pk=None):
+        """Not a duplicate: hide the pair from future runs"""
+        suggestion = self.get_object()
+        suggestion.status = DuplicateClientSuggestion.STATUS_DISMISSED
+        suggestion.save(update_fields=['status'])
+        return Response(self.get_serializer(suggestion).data)
+
+    @action(detail=True, methods=['post'])
+    def merge(self, request, pk=None):
+        """
+        Confirm the pair and merge it. The older client survives unless
+        {"survivor": <id>} picks the other one.
+        """
+        if request.user.role == 'agent':
+            return Response({'error': 'Only owner or manager can merge clients.'},
+                            status=status.HTTP_403_FORBIDDEN)
+        suggestion = self.get_object()
+        pair = [suggestion.client_id, suggestion.duplicate_id]
+        try:
+            survivor_id = int(request.data.get('survivor', suggestion.client_id))
+        except (TypeError, ValueError):
+            survivor_id = None
+        if survivor_id not in pair:
+            return Response({'error': 'survivor must be one of the pair'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            record = merge_clients(request.user.agency, survivor_id, pair, request.user)
+        except MergeError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(ClientMergeRecordSerializer(record).data)
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.10 on 2026-10-18 06:30
+
+from django.db import migrations, models
+
+from travel_agency_saas.db import AddIndexConcurrentlyIfSupported
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('agencies', '0003_agency_address_agency_description_agency_email_and_more'),
+        ('services', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfSupported(
+            model_name='service',
+            index=models.Index(fields=['agency', '-created_at'], name='service_agency_created_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from travel_agency_saas.db import AddPostgresIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('services', '0003_service_name_trigram'),
+    ]
+
+    operations = [
+        # icontains compiles to UPPER(service_name::text) LIKE UPPER(...) on
+        # PostgreSQL; service_name_trgm_idx stays for trigram word similarity.
+        AddPostgresIndexConcurrently(
+            model_name='service',
+            name='service_name_upper_trgm_idx',
+            columns='(UPPER(service_name::text)) gin_trgm_ops',
+        ),
+    ]
@@ -39,6 +39,9 @@ class Service(models.Model):
         verbose_name = 'Service'
         verbose_name_plural = 'Services'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['agency', '-created_at'], name='service_agency_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.service_name} - {self.destination}"
@@ -0,0 +1,151 @@
+"""
+Database helpers shared across apps.
+"""
+import json
+
+from django.db import connections
+from django.db.migrations.operations import AddConstraint, AddIndex, RunSQL
+from django.db.migrations.operations.base import Operation
+
+
+# Below this many (estimated) rows an exact COUNT(*) is cheap enough
+EXACT_COUNT_THRESHOLD = 10000
+
+
+def estimate_count(queryset):
+    """
+    Fast row count for a queryset.
+
+    On PostgreSQL the planner's row estimate is used (no scan at all); small
+    results are then counted exactly. Other databases always count exactly.
+    Returns (count, is_estimate).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count(), False
+
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    estimate = int(plan[0]['Plan']['Plan Rows'])
+
+    if estimate < EXACT_COUNT_THRESHOLD:
+        return queryset.count(), False
+    return estimate, True
+
+
+class AddIndexConcurrentlyIfSupported(AddIndex):
+    """
+    AddIndex that builds the index with CREATE INDEX CONCURRENTLY on
+    PostgreSQL, so large tables stay writable while it is built. Other
+    databases get a plain CREATE INDEX. Migrations using it must set
+    `atomic = False`.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, **self._concurrently(schema_editor))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, **self._concurrently(schema_editor))
+
+    def describe(self):
+        return f'Concurrently create index {self.index.name} on {self.model_name}'
+
+    @staticmethod
+    def _concurrently(schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            return {'concurrently': True}
+        return {}
+
+
+class AddCheckConstraintNotValidFirst(AddConstraint):
+    """
+    AddConstraint that, on PostgreSQL, adds a CHECK constraint as NOT VALID
+    (brief lock, existing rows not scanned) and then validates it separately,
+    which scans the table without blocking writes. If validation fails the
+    constraint stays NOT VALID and a retry only validates it. Other databases
+    get a plain ADD CONSTRAINT. Migrations using it must set `atomic = False`.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            table = schema_editor.quote_name(model._meta.db_table)
+            name = schema_editor.quote_name(self.constraint.name)
+            # Left NOT VALID by an earlier run whose validation failed: only validate
+            if not self._exists(schema_editor, model):
+                schema_editor.execute(f'{self.constraint.create_sql(model, schema_editor)} NOT VALID')
+            schema_editor.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {name}')
+
+    def _exists(self, schema_editor, model):
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT 1 FROM pg_constraint WHERE conname = %s AND conrelid = %s::regclass',
+                [self.constraint.name, model._meta.db_table],
+            )
+            return cursor.fetchone() is not None
+
+    def describe(self):
+        return f'Create and validate constraint {self.constraint.name} on {self.model_name}'
+
+
+class AddPostgresIndexConcurrently(Operation):
+    """
+    Create a PostgreSQL-only index (GIN trigram, tsvector, ...) that has no
+    portable Meta.indexes equivalent. It is built CONCURRENTLY and skipped on
+    other databases, which fall back to unindexed lookups. Migrations using
+    it must set `atomic = False`.
+    """
+    reversible = True
+
+    def __init__(self, model_name, name, columns, method='gin'):
+        self.model_name = model_name
+        self.name = name
+        self.columns = columns
+        self.method = method
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self._applies(schema_editor, model):
+            schema_editor.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {self.name} '
+                f'ON {schema_editor.quote_name(model._meta.db_table)} USING {self.method} ({self.columns})'
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self._applies(schema_editor, model):
+            schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {self.name}')
+
+    def describe(self):
+        return f'Create PostgreSQL {self.method} index {self.name} on {self.model_name}'
+
+    def _applies(self, schema_editor, model):
+        return (
+            schema_editor.connection.vendor == 'postgresql'
+            and self.allow_migrate_model(schema_editor.connection.alias, model)
+        )
+
+
+class RunSQLIfPostgres(RunSQL):
+    """RunSQL that only runs on PostgreSQL (triggers, tsvector maintenance, ...)."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
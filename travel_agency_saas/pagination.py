@@ -0,0 +1,162 @@
+"""
+Pagination classes shared by the list endpoints.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .db import estimate_count
+
+
+def keyset_order_by(ordering, reverse=False):
+    """
+    ORDER BY for a keyset ordering such as ('-created_at', '-id'). NULL keys
+    sort after every non-NULL key (before them with `reverse`), whatever the
+    database's default; views ordering by a nullable key in page-number mode
+    use it too, so both modes list rows in the same order.
+    """
+    descending = ordering[0].startswith('-') != reverse
+    nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+    key = F(ordering[0].lstrip('-'))
+    key = key.desc(**nulls) if descending else key.asc(**nulls)
+    return [key, '-pk' if descending else 'pk']
+
+
+class KeysetPagination(PageNumberPagination):
+    """
+    Page-number pagination by default, with an opt-in keyset (cursor) mode.
+
+    Cursor mode is enabled with ?pagination=cursor (or by following a
+    `next`/`previous` link, which carries ?cursor=...). Rows are ordered by
+    the view's `keyset_ordering`, e.g. ('-created_at', '-id'), and each page
+    is fetched with a `WHERE (key, id) > (last_key, last_id)` style filter,
+    so page cost does not grow with depth and no COUNT(*) is run.
+
+    Add ?with_count=1 for a total; it may be a planner estimate on large
+    result sets (flagged by `count_is_estimate`).
+    """
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    count_query_param = 'with_count'
+    default_keyset_ordering = ('-created_at', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.use_cursor = (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.ordering = getattr(view, 'keyset_ordering', self.default_keyset_ordering)
+        self.page_size = self.get_page_size(request)
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ['1', 'true', 'True']:
+            self.count = estimate_count(queryset)
+
+        cursor = self.decode_cursor(request, queryset.model)
+        reverse = bool(cursor and cursor['r'])
+        if cursor:
+            queryset = queryset.filter(self._after(queryset.model, cursor['v'], cursor['id'], reverse))
+
+        rows = list(queryset.order_by(*keyset_order_by(self.ordering, reverse))[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # Going forward there is a previous page whenever we came from a cursor;
+        # going backward there is always a next page (the one we came from).
+        self.has_next = has_more if not reverse else True
+        self.has_previous = bool(cursor) if not reverse else has_more
+        self.page_rows = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+
+        payload = OrderedDict()
+        if self.count is not None:
+            payload['count'], payload['count_is_estimate'] = self.count
+        payload['next'] = self.get_next_link()
+        payload['previous'] = self.get_previous_link()
+        payload['results'] = data
+        return Response(payload)
+
+    def get_next_link(self):
+        if not self.use_cursor:
+            return super().get_next_link()
+        if not self.has_next or not self.page_rows:
+            return None
+        return self._link(self.page_rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.use_cursor:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page_rows:
+            return None
+        return self._link(self.page_rows[0], reverse=True)
+
+    # ----- cursor helpers -----
+
+    @property
+    def _key_field(self):
+        return self.ordering[0].lstrip('-')
+
+    @property
+    def _descending(self):
+        return self.ordering[0].startswith('-')
+
+    def _after(self, model, value, pk, reverse):
+        """Rows strictly after (value, pk) in the requested direction."""
+        field = self._key_field
+        op = 'lt' if self._descending != reverse else 'gt'
+        nullable = model._meta.get_field(field).null
+
+        if value is None:
+            same_key = Q(**{f'{field}__isnull': True, f'pk__{op}': pk})
+            # Backwards from a NULL key, all non-NULL keys are still ahead
+            return same_key | Q(**{f'{field}__isnull': False}) if reverse else same_key
+
+        condition = Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'pk__{op}': pk})
+        if nullable and not reverse:
+            condition |= Q(**{f'{field}__isnull': True})
+        return condition
+
+    def _link(self, row, reverse):
+        value = getattr(row, self._key_field)
+        if value is not None:
+            # Dates / datetimes, or decimals and other keys as text
+            value = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+        token = json.dumps({
+            'v': value,
+            'id': row.pk,
+            'r': reverse,
+        }, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(token.encode()).decode()
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request, model):
+        """The cursor of the request with its key converted to a `model` value, or None"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            value = cursor['v']
+            if value is not None:
+                value = model._meta.get_field(self._key_field).to_python(value)
+            return {'v': value, 'id': int(cursor['id']), 'r': bool(cursor.get('r'))}
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound('Invalid cursor')
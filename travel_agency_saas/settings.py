@@ -5,6 +5,7 @@ Django settings for travel_agency_saas project.
 import dj_database_url
 from pathlib import Path
 import os
+import sys
 from datetime import timedelta
 from dotenv import load_dotenv
 
@@ -13,6 +14,9 @@ load_dotenv()
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# `manage.py test`: background workers stay off, tests drive them directly
+TESTING = sys.argv[1:2] == ['test']
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.0/howto/deployment/checklist/
@@ -42,6 +46,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third party apps
     'rest_framework',
@@ -103,6 +108,22 @@ DATABASES = {
 }
 
 
+# Cache
+# Per-process memory by default; set REDIS_URL to share the cache across workers
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+if os.getenv("REDIS_URL"):
+    CACHES["default"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("REDIS_URL"),
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -156,7 +177,7 @@ AUTH_USER_MODEL = 'users.User'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.TenantJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -165,13 +186,54 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20,
 }
 
+# In-process cache of authenticated users / agencies (users.auth_cache).
+# Changes made through another worker process apply within AUTH_CACHE_TTL seconds.
+AUTH_CACHE_TTL = int(os.getenv('AUTH_CACHE_TTL', 60))
+AUTH_CACHE_MAX_ENTRIES = 10000
+
+# Agency statuses checked on every API request (agencies.status_cache), in
+# the default cache. Saving an agency refreshes the entry at once. With
+# REDIS_URL set the cache is shared, so every worker refuses a suspended
+# agency on its next request. With the per-process LocMem cache, only the
+# worker that saved the change knows about it; the others keep accepting
+# requests for up to this many seconds. That bounded staleness is why the
+# LocMem default is short: it costs one primary-key query per agency per
+# worker each period.
+AGENCY_STATUS_CACHE_TIMEOUT = int(os.getenv('AGENCY_STATUS_CACHE_TIMEOUT', 60 if os.getenv('REDIS_URL') else 5))
+
+# Pending last-login / last-seen timestamps are flushed every N seconds (users.last_seen).
+# 0 disables the background flush (the default under `manage.py test`, where
+# tests call users.last_seen.flush() themselves).
+LAST_SEEN_FLUSH_INTERVAL = int(os.getenv('LAST_SEEN_FLUSH_INTERVAL', 0 if TESTING else 30))
+
+# Largest file (in rows) the client import API processes inside the request;
+# bigger files go through `manage.py import_clients`
+IMPORT_MAX_SYNC_ROWS = int(os.getenv('IMPORT_MAX_SYNC_ROWS', 20000))
+
+# Cap nested booking notes per booking in list/detail responses (None = all notes)
+BOOKING_NOTES_PREFETCH_LIMIT = None
+
+# Analytics response cache (seconds). A write bumps the agency's version in
+# the default cache. With REDIS_URL that invalidates every worker's entries
+# at once. With the per-process LocMem cache only the writing worker sees
+# the bump; other workers serve their entry until it expires, so the
+# defaults are short there. The stale window lets concurrent requests reuse
+# the previous response while one of them recomputes (0 = always wait for
+# the fresh response). Waiters poll for at most ANALYTICS_CACHE_WAIT_SECONDS,
+# then compute it themselves.
+ANALYTICS_CACHE_TIMEOUT = int(os.getenv("ANALYTICS_CACHE_TIMEOUT", "300" if os.getenv("REDIS_URL") else "5"))
+ANALYTICS_CACHE_STALE_SECONDS = int(os.getenv("ANALYTICS_CACHE_STALE_SECONDS", "30" if os.getenv("REDIS_URL") else "5"))
+ANALYTICS_CACHE_LOCK_TIMEOUT = 10
+ANALYTICS_CACHE_WAIT_SECONDS = 2
+
 # JWT Configuration
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=5),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'ROTATE_REFRESH_TOKENS': False,
     'BLACKLIST_AFTER_ROTATION': True,
-    'UPDATE_LAST_LOGIN': True,
+    # last_login is written in batches by users.last_seen instead
+    'UPDATE_LAST_LOGIN': False,
     'ALGORITHM': 'HS256',
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
@@ -11,9 +11,9 @@ from rest_framework_simplejwt.views import TokenRefreshView
 from users.views import LoginView, UserProfileView, UserViewSet
 from agencies.views import AgencyPublicView, AgencyDetailView, CheckAgencyStatusView
 from services.views import ServiceViewSet
-from clients.views import ClientViewSet, ClientNoteViewSet
+from clients.views import ClientViewSet, ClientNoteViewSet, DuplicateClientSuggestionViewSet
 from bookings.views import (
-    BookingViewSet, OnboardViewSet, AnalyticsView, BookingNoteViewSet
+    BookingViewSet, OnboardViewSet, AnalyticsView, AnalyticsCacheStatsView, BookingNoteViewSet
 )
 
 # Create router for ViewSets
@@ -22,6 +22,7 @@ router.register(r'users', UserViewSet, basename='user')
 router.register(r'services', ServiceViewSet, basename='service')
 router.register(r'clients', ClientViewSet, basename='client')
 router.register(r'client-notes', ClientNoteViewSet, basename='client-note')
+router.register(r'client-duplicates', DuplicateClientSuggestionViewSet, basename='client-duplicate')
 router.register(r'bookings', BookingViewSet, basename='booking')
 router.register(r'booking-notes', BookingNoteViewSet, basename='booking-note')
 router.register(r'onboard', OnboardViewSet, basename='onboard')
@@ -41,6 +42,7 @@ urlpatterns = [
     
     # ✅ ANALYTICS ENDPOINT
     path('api/analytics/', AnalyticsView.as_view(), name='analytics'),
+    path('api/analytics/cache-stats/', AnalyticsCacheStatsView.as_view(), name='analytics-cache-stats'),
     
     # ✅ ROUTER URLS
     path('api/', include(router.urls)),
@@ -5,7 +5,7 @@ from .models import User
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
-    list_display = ['username', 'email', 'agency', 'role', 'is_active', 'created_at']
+    list_display = ['username', 'email', 'agency', 'role', 'is_active', 'last_seen_at', 'created_at']
     list_filter = ['role', 'is_active', 'agency', 'created_at']
     search_fields = ['username', 'email', 'first_name', 'last_name']
     
@@ -14,10 +14,10 @@ class UserAdmin(BaseUserAdmin):
         ('Personal info', {'fields': ('first_name', 'last_name', 'email', 'phone_number')}),
         ('Agency & Role', {'fields': ('agency', 'role')}),
         ('Permissions', {'fields': ('is_active', 'is_staff', 'is_superuser', 'groups', 'user_permissions')}),
-        ('Important dates', {'fields': ('last_login', 'date_joined', 'created_at', 'updated_at')}),
+        ('Important dates', {'fields': ('last_login', 'last_seen_at', 'date_joined', 'created_at', 'updated_at')}),
     )
     
-    readonly_fields = ['last_login', 'date_joined', 'created_at', 'updated_at']
+    readonly_fields = ['last_login', 'last_seen_at', 'date_joined', 'created_at', 'updated_at']
     
     add_fieldsets = (
         (None, {
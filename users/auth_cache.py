@@ -0,0 +1,113 @@
+"""
+In-process cache of the user and agency rows behind authenticated requests.
+
+TenantJWTAuthentication resolves the token's user here, so steady-state
+requests run no authentication queries. Entries expire after
+AUTH_CACHE_TTL seconds (the most another worker process can lag behind a
+change) and are evicted in this process as soon as a user or agency is
+saved or deleted (see users.signals). The agency counter columns are
+updated without save(), so the counts embedded in a cached user's agency
+may also lag by up to AUTH_CACHE_TTL seconds. Every request gets its own model
+instances rebuilt from the cached row values, never a shared object.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from agencies.models import Agency
+
+from .models import User
+
+
+class TTLCache:
+    """Thread-safe LRU mapping whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_users = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL)
+_agencies = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL)
+
+
+def _snapshot(instance):
+    return tuple(getattr(instance, field.attname) for field in instance._meta.concrete_fields)
+
+
+def _restore(model, values):
+    return model.from_db(DEFAULT_DB_ALIAS, [field.attname for field in model._meta.concrete_fields], values)
+
+
+def get_agency(agency_id):
+    values = _agencies.get(str(agency_id))
+    if values is not None:
+        return _restore(Agency, values)
+    agency = Agency.objects.filter(pk=agency_id).first()
+    if agency is not None:
+        _agencies.set(str(agency_id), _snapshot(agency))
+    return agency
+
+
+def get_user(user_id):
+    """The user with its agency attached, or None when it does not exist."""
+    # Token claims may carry the id as a string: key both caches by str(pk)
+    values = _users.get(str(user_id))
+    if values is None:
+        user = User.objects.select_related('agency').filter(pk=user_id).first()
+        if user is None:
+            return None
+        _users.set(str(user_id), _snapshot(user))
+        if user.agency is not None:
+            _agencies.set(str(user.agency_id), _snapshot(user.agency))
+        return user
+
+    user = _restore(User, values)
+    if user.agency_id is not None:
+        user.agency = get_agency(user.agency_id)
+    return user
+
+
+def evict_user(user_id):
+    _users.delete(str(user_id))
+
+
+def evict_agency(agency_id):
+    _agencies.delete(str(agency_id))
+
+
+def clear():
+    _users.clear()
+    _agencies.clear()
@@ -0,0 +1,62 @@
+"""
+JWT authentication with tenant claims.
+
+Access tokens carry the user's role, agency_id and the agency's
+status_version. Requests resolve the user (and agency) through
+users.auth_cache instead of the database, and a token is refused once
+the claims no longer match the account: the user changed role or agency,
+or the agency's status changed since the token was issued (as seen by
+this process's auth cache). Requests from users of an agency that is not
+active are refused with 403 by agencies.status_cache, which is shared
+between workers when REDIS_URL is set. Views marked
+`agency_status_exempt` skip this check.
+"""
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from agencies.status_cache import check_agency_status
+
+from . import auth_cache, last_seen
+
+AGENCY_STATUS_VERSION_CLAIM = 'agency_status_version'
+
+
+def tenant_claims(user):
+    agency = user.agency
+    return {
+        'role': user.role,
+        'agency_id': user.agency_id,
+        AGENCY_STATUS_VERSION_CLAIM: agency.status_version if agency is not None else None,
+    }
+
+
+class TenantJWTAuthentication(JWTAuthentication):
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            check_agency_status(result[0], request.parser_context.get('view'))
+        return result
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        user = auth_cache.get_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        # Tokens issued before the claims were introduced carry none of them
+        if 'agency_id' in validated_token:
+            claims = tenant_claims(user)
+            if validated_token['agency_id'] != claims['agency_id'] or validated_token.get('role') != claims['role']:
+                raise AuthenticationFailed(_('Account changed, please log in again.'), code='account_changed')
+            if validated_token.get(AGENCY_STATUS_VERSION_CLAIM) != claims[AGENCY_STATUS_VERSION_CLAIM]:
+                raise AuthenticationFailed(_('Agency status changed, please log in again.'), code='agency_status_changed')
+        last_seen.touch(user.pk)
+        return user
@@ -0,0 +1,101 @@
+"""
+Coalesced last-login / last-seen tracking.
+
+Logins and authenticated requests only record a timestamp in memory; a
+daemon thread flushes the pending timestamps every
+LAST_SEEN_FLUSH_INTERVAL seconds in a single UPDATE. However many requests
+a user makes, they cost at most one write per flush interval, and no
+request waits on it. Timestamps still pending when a process dies are lost,
+which is acceptable for an activity hint.
+
+The UPDATE bypasses save() and signals, so the users.auth_cache entries
+are not evicted for it: a cached user may show a last_seen_at up to
+AUTH_CACHE_TTL seconds old.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+
+class LastSeenTracker:
+    def __init__(self, interval):
+        self.interval = interval
+        self._pending = {}  # user id => [last seen, logged in at or None]
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def touch(self, user_id, login=False):
+        now = timezone.now()
+        with self._lock:
+            entry = self._pending.setdefault(user_id, [now, None])
+            entry[0] = now
+            if login:
+                entry[1] = now
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        # Started lazily, and again in a worker forked from a preloaded parent
+        if self.interval <= 0 or (self._thread is not None and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='last-seen-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Flushing last-seen timestamps failed')
+
+    def flush(self):
+        """Write the pending timestamps in one UPDATE. Returns how many users were updated."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        seen = [When(pk=user_id, then=Value(last_seen)) for user_id, (last_seen, _) in pending.items()]
+        logins = [When(pk=user_id, then=Value(login)) for user_id, (_, login) in pending.items() if login]
+        changes = {'last_seen_at': Case(*seen, output_field=User._meta.get_field('last_seen_at'))}
+        if logins:
+            changes['last_login'] = Case(
+                *logins, default=F('last_login'), output_field=User._meta.get_field('last_login')
+            )
+        try:
+            return User.objects.filter(pk__in=pending).update(**changes)
+        except Exception:
+            self._requeue(pending)
+            raise
+
+    def _requeue(self, pending):
+        """Put back timestamps that failed to flush, keeping any newer ones"""
+        with self._lock:
+            for user_id, (last_seen, login) in pending.items():
+                entry = self._pending.setdefault(user_id, [last_seen, login])
+                entry[1] = entry[1] or login
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+
+
+tracker = LastSeenTracker(settings.LAST_SEEN_FLUSH_INTERVAL)
+touch = tracker.touch
+flush = tracker.flush
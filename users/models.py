@@ -1,5 +1,11 @@
-from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.contrib.auth.models import AbstractUser, UserManager as BaseUserManager
+from django.db import models, transaction
+
+
+class UserManager(BaseUserManager):
+    def get_by_natural_key(self, username):
+        # Login checks the agency status right after authenticating
+        return self.select_related('agency').get(**{self.model.USERNAME_FIELD: username})
 
 
 class User(AbstractUser):
@@ -27,9 +33,13 @@ class User(AbstractUser):
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='agent')
     phone_number = models.CharField(max_length=20, blank=True, null=True)
     is_active = models.BooleanField(default=True)
+    # Written in batches by users.last_seen, not on every request
+    last_seen_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = UserManager()
+
     # ✅ Use email for authentication
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
@@ -42,6 +52,18 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.email} - {self.get_role_display()}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Moving a user to another agency moves it between agency counters
+        instance._loaded_agency_id = instance.__dict__.get('agency_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Atomic so the agency counter update (post_save signal) commits with the user
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
     @property
     def is_super_user_role(self):
         return self.role == 'super_user'
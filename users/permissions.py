@@ -95,7 +95,7 @@ class AgencyDataIsolation(permissions.BasePermission):
     Ensure users can only access data from their own agency.
     """
     def has_permission(self, request, view):
-        return request.user and request.user.is_authenticated and bool(request.user.agency)
+        return request.user and request.user.is_authenticated and request.user.agency_id is not None
 
     def has_object_permission(self, request, view, obj):
         # Super users can access everything
@@ -103,7 +103,8 @@ class AgencyDataIsolation(permissions.BasePermission):
             return True
 
         # Check if object has agency attribute
-        if hasattr(obj, 'agency'):
-            return obj.agency == request.user.agency
+        # Compare ids: no query for either agency
+        if hasattr(obj, 'agency_id'):
+            return obj.agency_id == request.user.agency_id
 
         return False
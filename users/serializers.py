@@ -1,6 +1,8 @@
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenObtainSerializer
 
+from . import last_seen
+from .authentication import tenant_claims
 from .models import User
 from agencies.serializers import AgencySerializer
 
@@ -14,9 +16,9 @@ class UserSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'username', 'email', 'first_name', 'last_name',
             'phone_number', 'agency', 'agency_details', 'role', 'role_display',
-            'is_active', 'created_at', 'updated_at'
+            'is_active', 'last_login', 'last_seen_at', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'last_login', 'last_seen_at', 'created_at', 'updated_at']
         extra_kwargs = {
             'password': {'write_only': True}
         }
@@ -54,4 +56,23 @@ class PasswordChangeSerializer(serializers.Serializer):
 
 # ✅ NEW: JWT serializer for Email + Password login
 class EmailTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    is_valid() only authenticates (one password hash) and sets `self.user`;
+    the view checks the agency and then calls issue_tokens().
+    """
     username_field = 'email'
+
+    def validate(self, attrs):
+        return TokenObtainSerializer.validate(self, attrs)
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for claim, value in tenant_claims(user).items():
+            token[claim] = value
+        return token
+
+    def issue_tokens(self):
+        refresh = self.get_token(self.user)
+        last_seen.touch(self.user.pk, login=True)
+        return {'refresh': str(refresh), 'access': str(refresh.access_token)}
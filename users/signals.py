@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from agencies.models import Agency
+
+from . import auth_cache
+from .models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def evict_cached_user(sender, instance, **kwargs):
+    """Deactivations, role and agency changes apply to the next request"""
+    auth_cache.evict_user(instance.pk)
+
+
+@receiver(post_save, sender=Agency)
+@receiver(post_delete, sender=Agency)
+def evict_cached_agency(sender, instance, **kwargs):
+    auth_cache.evict_agency(instance.pk)
@@ -1,3 +1,193 @@
-from django.test import TestCase
+import os
+import threading
+import time
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.cache import cache
+from django.db import connections
+from django.test import TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+
+from agencies.models import Agency
+from . import auth_cache, last_seen
+from .models import User
+
+
+class LoginTestMixin:
+    """Shared fixtures: one active agency with an agent."""
+
+    def setUp(self):
+        cache.clear()
+        auth_cache.clear()
+        last_seen.tracker.clear()
+        self.agency = Agency.objects.create(name='Test Agency', status='active')
+        self.user = User.objects.create_user(
+            username='agent', email='agent@example.com', password='pass',
+            agency=self.agency, role='agent'
+        )
+        self.api = APIClient()
+
+    def login(self, password='pass'):
+        return self.api.post('/api/auth/login/', {'email': 'agent@example.com', 'password': password})
+
+
+class LoginTests(LoginTestMixin, TestCase):
+    def test_login_hashes_the_password_once(self):
+        verify = PBKDF2PasswordHasher.verify
+        with mock.patch.object(PBKDF2PasswordHasher, 'verify', autospec=True, side_effect=verify) as hashed:
+            with self.assertNumQueries(1):  # user with agency; last_login is deferred
+                response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {'access', 'refresh'})
+        self.assertEqual(hashed.call_count, 1)
+        last_seen.flush()
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+    def test_inactive_agency_is_refused_without_tokens(self):
+        self.agency.status = 'suspended'
+        self.agency.save()
+        response = self.login()
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()['agency_status'], 'suspended')
+        self.assertNotIn('access', response.json())
+        last_seen.flush()
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_login)
+
+    def test_wrong_password_and_missing_agency(self):
+        self.assertEqual(self.login('wrong').status_code, 401)
+        self.user.agency = None
+        self.user.save()
+        response = self.login()
+        self.assertEqual((response.status_code, response.json()['status']), (403, 'no_agency'))
+
+
+class TenantAuthenticationTests(LoginTestMixin, TestCase):
+    def authenticate(self):
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {self.login().json()['access']}")
+
+    def test_token_claims_and_zero_auth_queries_when_cached(self):
+        response = self.login()
+        from rest_framework_simplejwt.tokens import AccessToken
+        token = AccessToken(response.json()['access'])
+        self.assertEqual(
+            (token['role'], token['agency_id'], token['agency_status_version']), ('agent', self.agency.id, 0)
+        )
+        self.authenticate()
+        self.api.get('/api/agency/public/')
+        with self.assertNumQueries(0):
+            response = self.api.get('/api/agency/public/')
+        self.assertEqual(response.json()['name'], 'Test Agency')
+
+    def test_deactivation_and_role_change_apply_immediately(self):
+        self.authenticate()
+        self.assertEqual(self.api.get('/api/agency/public/').status_code, 200)
+        self.user.role = 'manager'
+        self.user.save()
+        response = self.api.get('/api/agency/public/')
+        self.assertEqual((response.status_code, response.json()['code']), (401, 'account_changed'))
+
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.api.get('/api/agency/public/').status_code, 401)
+
+    def test_agency_status_change_revokes_tokens(self):
+        self.authenticate()
+        self.assertEqual(self.api.get('/api/agency/public/').status_code, 200)
+        self.agency.status = 'suspended'
+        self.agency.save()
+        self.agency.refresh_from_db()
+        self.assertEqual(self.agency.status_version, 1)
+        response = self.api.get('/api/agency/public/')
+        self.assertEqual((response.status_code, response.json()['code']), (401, 'agency_status_changed'))
+
+    def test_profile_updates_write_a_fresh_row(self):
+        self.authenticate()
+        self.api.get('/api/auth/profile/')
+        # Changed outside this process's cache: must not be overwritten
+        User.objects.filter(pk=self.user.pk).update(phone_number='0300')
+        response = self.api.patch('/api/auth/profile/', {'first_name': 'Ali'})
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.first_name, self.user.phone_number), ('Ali', '0300'))
+
+
+class LastSeenTests(LoginTestMixin, TestCase):
+    def test_requests_are_coalesced_into_one_update_per_flush(self):
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {self.login().json()['access']}")
+        for _ in range(3):
+            self.api.get('/api/agency/public/')
+        # No background flush under test: only the explicit flush() below writes
+        self.assertIsNone(last_seen.tracker._thread)
+        with self.assertNumQueries(1):
+            self.assertEqual(last_seen.flush(), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(last_seen.flush(), 0)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+        self.assertGreaterEqual(self.user.last_seen_at, self.user.last_login)
+
+        # A later request moves last_seen_at but not last_login
+        last_login = self.user.last_login
+        self.api.get('/api/agency/public/')
+        last_seen.flush()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_login, last_login)
+
+    def test_staff_list_orders_by_last_seen(self):
+        owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='pass',
+            agency=self.agency, role='agency_owner'
+        )
+        User.objects.create_user(
+            username='new', email='new@example.com', password='pass', agency=self.agency, role='agent'
+        )
+        last_seen.touch(self.user.pk)
+        last_seen.flush()
+        self.api.force_authenticate(owner)
+        response = self.api.get('/api/users/', {'ordering': '-last_seen_at'})
+        emails = [row['email'] for row in response.json()['results']]
+        # Users never seen sort last, by id
+        self.assertEqual(emails, ['agent@example.com', 'owner@example.com', 'new@example.com'])
+        self.assertIsNotNone(response.json()['results'][0]['last_seen_at'])
+
+
+@skipUnless(os.getenv('RUN_BENCHMARKS'), 'set RUN_BENCHMARKS=1 to run benchmarks')
+class LoginThroughputBenchmark(LoginTestMixin, TransactionTestCase):
+    """
+    Successful logins per second with BENCHMARK_LOGIN_THREADS concurrent
+    clients (8 by default). Run with:
+    RUN_BENCHMARKS=1 python manage.py test users.tests.LoginThroughputBenchmark
+    """
+    threads = int(os.getenv('BENCHMARK_LOGIN_THREADS', 8))
+    logins_per_thread = 10
+
+    def test_concurrent_logins(self):
+        barrier = threading.Barrier(self.threads)
+        failures = []
+
+        def run():
+            api = APIClient()
+            try:
+                barrier.wait()
+                for _ in range(self.logins_per_thread):
+                    response = api.post('/api/auth/login/', {'email': 'agent@example.com', 'password': 'pass'})
+                    if response.status_code != 200:
+                        failures.append(response.status_code)
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=run) for _ in range(self.threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(failures, [])
+        total = self.threads * self.logins_per_thread
+        print(f'\n{total} logins on {self.threads} threads: {total / elapsed:.1f} logins/s')
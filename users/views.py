@@ -1,9 +1,10 @@
+from django.db.models import F
 from rest_framework import viewsets, status, generics
 from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, SAFE_METHODS
 from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.exceptions import AuthenticationFailed
 
 from .models import User
 from .serializers import (
@@ -12,6 +13,9 @@ from .serializers import (
 )
 from .permissions import IsAgencyOwnerOrManager, AgencyDataIsolation
 
+# ?ordering= values of the staff list; users never seen sort last either way
+USER_ORDERINGS = ['last_seen_at', 'last_login', 'created_at']
+
 
 class LoginView(TokenObtainPairView):
     """
@@ -23,13 +27,13 @@ class LoginView(TokenObtainPairView):
     
     def post(self, request, *args, **kwargs):
         try:
-            # First, try to authenticate user
+            # Authenticate once; the tokens are issued from this same result
             serializer = self.get_serializer(data=request.data)
             serializer.is_valid(raise_exception=True)
-            user = serializer.user
-            
+            user = serializer.user  # agency is loaded with the user
+
             # Check if user has an agency
-            if not hasattr(user, 'agency'):
+            if user.agency is None:
                 return Response({
                     'detail': 'No agency associated with this user account.',
                     'status': 'no_agency'
@@ -64,8 +68,7 @@ class LoginView(TokenObtainPairView):
                 }, status=status.HTTP_403_FORBIDDEN)
             
             # If agency is active, proceed with token generation
-            response = super().post(request, *args, **kwargs)
-            return response
+            return Response(serializer.issue_tokens(), status=status.HTTP_200_OK)
             
         except AuthenticationFailed as e:
             # Handle authentication failures
@@ -88,7 +91,10 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        if self.request.method in SAFE_METHODS:
+            return self.request.user
+        # request.user is rebuilt from the auth cache; write to a fresh row
+        return User.objects.select_related('agency').get(pk=self.request.user.pk)
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -109,8 +115,18 @@ class UserViewSet(viewsets.ModelViewSet):
         """Filter users by agency"""
         user = self.request.user
         if user.is_superuser or user.role == 'super_user':
-            return User.objects.all()
-        return User.objects.filter(agency=user.agency).exclude(role='super_user')
+            queryset = User.objects.all()
+        else:
+            queryset = User.objects.filter(agency_id=user.agency_id).exclude(role='super_user')
+        queryset = queryset.select_related('agency')
+
+        # ordering=-last_seen_at => most recently active staff first
+        order = self.request.query_params.get('ordering', None)
+        if order and order.lstrip('-') in USER_ORDERINGS:
+            field = F(order.lstrip('-'))
+            field = field.desc(nulls_last=True) if order.startswith('-') else field.asc(nulls_last=True)
+            queryset = queryset.order_by(field, 'id')
+        return queryset
 
     def perform_create(self, serializer):
         """Automatically set agency when creating user"""
@@ -145,7 +161,7 @@ class UserViewSet(viewsets.ModelViewSet):
         """Change user password"""
         serializer = PasswordChangeSerializer(data=request.data)
         if serializer.is_valid():
-            user = request.user
+            user = User.objects.get(pk=request.user.pk)
             if user.check_password(serializer.validated_data['old_password']):
                 user.set_password(serializer.validated_data['new_password'])
                 user.save()